@@ -0,0 +1,120 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Benchmark quantized tool embeddings against the exact index.
+
+Embeds every tool of the explored MCP servers, uses each tool description as a
+query, and reports memory, recall@k and query latency of int8 and product
+quantization, with and without full-precision re-ranking. As in the indexing
+service, re-ranking reads the full-precision vectors of the candidates from the
+on-disk embedding cache, so the bytes reported for the quantized indexes are
+all they keep in memory.
+
+Usage:
+    python benchmarks/quantization.py [--servers assets/explored-mcp-server.json]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from onemcp.discovery.embedding import CachedEmbeddingFunction, EmbeddingConfig
+from onemcp.discovery.quantization import QuantizedIndex, recall_at_k
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_servers(path: Path) -> list[dict[str, Any]]:
+    """Load a file of concatenated (or listed) server JSON objects."""
+    text = path.read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    servers: list[dict[str, Any]] = []
+    idx = 0
+    while idx < len(text):
+        if text[idx].isspace():
+            idx += 1
+            continue
+        obj, idx = decoder.raw_decode(text, idx)
+        servers.extend(obj if isinstance(obj, list) else [obj])
+    return servers
+
+
+def tool_documents(servers: list[dict[str, Any]]) -> tuple[list[str], list[str]]:
+    """Build the indexed document and the query text of every tool."""
+    documents, queries = [], []
+    for server in servers:
+        summary = server.get("description") or server.get("repository_url", "")
+        for tool in server.get("tools") or []:
+            description = tool.get("description") or tool["name"]
+            documents.append(
+                f"Tool Name: {tool['name']}\n"
+                f"Tool Description: {description}\n"
+                f"Context: {summary}"
+            )
+            queries.append(f"Description: {description}")
+    return documents, queries
+
+
+def exact_search(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[list[int]]:
+    """Exact cosine top-k, used as ground truth."""
+    scores = queries @ vectors.T
+    return [list(np.argsort(-row)[:k]) for row in scores]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--servers", default=str(ROOT / "assets" / "explored-mcp-server.json")
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--subspaces", type=int, default=8)
+    parser.add_argument(
+        "--cache", default=str(ROOT / "benchmarks" / "embedding-cache.sqlite3")
+    )
+    args = parser.parse_args()
+
+    documents, query_texts = tool_documents(load_servers(Path(args.servers)))
+    embed = CachedEmbeddingFunction(EmbeddingConfig.from_env(cache_path=args.cache))
+    start = time.perf_counter()
+    vectors = np.asarray(embed(documents), dtype=np.float32)
+    queries = np.asarray(embed(query_texts), dtype=np.float32)
+    print(
+        f"Embedded {len(documents)} tools of dimension {vectors.shape[1]}"
+        f" in {time.perf_counter() - start:.2f}s"
+    )
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    ids = [str(i) for i in range(len(documents))]
+    exact = [[str(i) for i in row] for row in exact_search(vectors, queries, args.k)]
+
+    def fetch(selected: list[str]) -> np.ndarray:
+        return np.asarray(embed([documents[int(i)] for i in selected]))
+
+    print(f"\n{'index':<16}{'bytes':>10}{'recall@' + str(args.k):>12}{'us/query':>12}")
+    print(f"{'float32':<16}{vectors.nbytes:>10}{1.0:>12.3f}{'-':>12}")
+    for method in ("int8", "pq"):
+        index = QuantizedIndex(method=method, num_subspaces=args.subspaces)
+        index.build(ids, vectors)
+        for rerank in (False, True):
+            start = time.perf_counter()
+            approximate = [
+                [
+                    tool_id
+                    for tool_id, _ in index.search(q, args.k, fetch if rerank else None)
+                ]
+                for q in queries
+            ]
+            elapsed = (time.perf_counter() - start) / len(queries) * 1e6
+            label = f"{method}{'+rerank' if rerank else ''}"
+            recall = recall_at_k(exact, approximate, args.k)
+            print(f"{label:<16}{index.nbytes:>10}{recall:>12.3f}{elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Benchmark JSON encoding and decoding on the payloads of the OneMCP APIs.
+
+Compares the standard library with onemcp.serialization (orjson when
+installed) on server records and tools/list responses of the explored MCP
+servers, and on a tools/call response carrying a large base64 image, which is
+also forwarded raw the way the sandbox does it.
+
+Usage:
+    python benchmarks/serialization.py [--servers assets/explored-mcp-server.json]
+"""
+
+import argparse
+import base64
+import json
+import os
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from onemcp import serialization
+from src.onemcp.sandbox.transport import with_id
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_servers(path: Path) -> list[dict[str, Any]]:
+    """Load a file of concatenated (or listed) server JSON objects."""
+    text = path.read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    servers: list[dict[str, Any]] = []
+    idx = 0
+    while idx < len(text):
+        if text[idx].isspace():
+            idx += 1
+            continue
+        obj, idx = decoder.raw_decode(text, idx)
+        servers.extend(obj if isinstance(obj, list) else [obj])
+    return servers
+
+
+def payloads(servers: list[dict[str, Any]], image_bytes: int) -> dict[str, Any]:
+    """Build the payloads exchanged by the APIs."""
+    tools_lists = [
+        {"jsonrpc": "2.0", "id": i, "result": {"tools": server.get("tools") or []}}
+        for i, server in enumerate(servers)
+    ]
+    image = base64.b64encode(os.urandom(image_bytes)).decode()
+    tool_result = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {
+            "content": [{"type": "image", "data": image, "mimeType": "image/png"}]
+        },
+    }
+    return {
+        "server records": servers,
+        "tools/list responses": tools_lists,
+        "tools/call image": tool_result,
+    }
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    """Best time of one call, in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--servers", default=str(ROOT / "assets" / "explored-mcp-server.json")
+    )
+    parser.add_argument("--image-bytes", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    backend = "orjson" if serialization.HAS_ORJSON else "stdlib fallback"
+    print(f"onemcp.serialization backend: {backend}\n")
+    print(
+        f"{'payload':<24}{'size':>10}{'operation':>12}{'stdlib ms':>12}{'onemcp ms':>12}"
+    )
+
+    for name, payload in payloads(
+        load_servers(Path(args.servers)), args.image_bytes
+    ).items():
+        encoded = stdlib_dumps(payload)
+        size = f"{len(encoded) / 1024:.0f}KiB"
+        rows = [
+            (
+                "encode",
+                measure(lambda: stdlib_dumps(payload), args.repeat),  # noqa: B023
+                measure(lambda: serialization.dumps(payload), args.repeat),  # noqa: B023
+            ),
+            (
+                "decode",
+                measure(lambda: json.loads(encoded), args.repeat),  # noqa: B023
+                measure(lambda: serialization.loads(encoded), args.repeat),  # noqa: B023
+            ),
+        ]
+        if name == "tools/call image":
+            # What the sandbox did before forwarding raw responses, against
+            # rewriting the id of the raw bytes.
+            rows.append(
+                (
+                    "forward",
+                    measure(
+                        lambda: stdlib_dumps(
+                            {**json.loads(encoded), "id": 7}  # noqa: B023
+                        ),
+                        args.repeat,
+                    ),
+                    measure(lambda: with_id(encoded, 7), args.repeat),  # noqa: B023
+                )
+            )
+        for operation, stdlib_ms, onemcp_ms in rows:
+            print(
+                f"{name:<24}{size:>10}{operation:>12}{stdlib_ms:>12.3f}{onemcp_ms:>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import (
+    ONNXMiniLM_L6_V2,
+    register_embedding_function,
+)
+
+# Model bundled with ChromaDB, which runs locally on ONNX runtime.
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Number of documents embedded per model invocation.
+DEFAULT_EMBEDDING_BATCH_SIZE = 32
+
+
+@dataclass
+class EmbeddingConfig:
+    """
+    Configuration of the local embedding provider.
+
+    Attributes:
+        model_name: Name of the embedding model
+        dimension: Number of dimensions to keep (None keeps all of them)
+        batch_size: Number of documents embedded per model invocation
+        num_threads: Number of threads used by the model (None lets it decide)
+        cache_path: Path to the on-disk embedding cache (None disables it)
+    """
+
+    model_name: str = DEFAULT_EMBEDDING_MODEL
+    dimension: Optional[int] = None
+    batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE
+    num_threads: Optional[int] = None
+    cache_path: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, cache_path: Optional[str] = None) -> "EmbeddingConfig":
+        """
+        Build the configuration from ONEMCP_EMBEDDING_* environment variables.
+
+        Args:
+            cache_path: Cache path to use if ONEMCP_EMBEDDING_CACHE is not set
+        """
+        dimension = os.getenv("ONEMCP_EMBEDDING_DIMENSION")
+        num_threads = os.getenv("ONEMCP_EMBEDDING_THREADS")
+        return cls(
+            model_name=os.getenv("ONEMCP_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+            dimension=int(dimension) if dimension else None,
+            batch_size=int(
+                os.getenv("ONEMCP_EMBEDDING_BATCH_SIZE", DEFAULT_EMBEDDING_BATCH_SIZE)
+            ),
+            num_threads=int(num_threads) if num_threads else None,
+            cache_path=os.getenv("ONEMCP_EMBEDDING_CACHE", cache_path),
+        )
+
+    @property
+    def model_key(self) -> str:
+        """Identifier of the vectors produced with this configuration."""
+        return f"{self.model_name}:{self.dimension or 'full'}"
+
+
+class EmbeddingCache:
+    """
+    Persistent content-hash -> vector cache backed by SQLite.
+
+    Vectors are keyed by the model that produced them, so swapping models back
+    and forth reuses the vectors computed by each of them.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, np.ndarray]:
+        """
+        Look up the vectors of several documents.
+
+        Args:
+            model: Key of the model that produced the vectors
+            hashes: Content hashes of the documents
+
+        Returns:
+            Dictionary mapping each cached content hash to its vector
+        """
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            # Stay well below SQLite's limit on the number of query parameters.
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT hash, vector FROM embeddings"
+                    f" WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *chunk],
+                )
+                for content_hash, vector in rows:
+                    found[content_hash] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: dict[str, np.ndarray]) -> None:
+        """
+        Store the vectors of several documents.
+
+        Args:
+            model: Key of the model that produced the vectors
+            vectors: Dictionary mapping content hashes to vectors
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector)"
+                " VALUES (?, ?, ?)",
+                [
+                    (model, content_hash, np.asarray(v, dtype=np.float32).tobytes())
+                    for content_hash, v in vectors.items()
+                ],
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return int(row[0])
+
+
+def _load_model(config: EmbeddingConfig) -> Any:
+    """
+    Load the embedding model described by `config`.
+
+    The default model runs on ONNX runtime; any other model name is loaded
+    through sentence-transformers, which must then be installed.
+    """
+    if config.model_name == DEFAULT_EMBEDDING_MODEL:
+        model = ONNXMiniLM_L6_V2()
+        if config.num_threads:
+            # ChromaDB does not expose the ONNX session options, so we build the
+            # inference session ourselves and seed the lazily created one.
+            model._download_model_if_not_exists()
+            options = model.ort.SessionOptions()
+            options.log_severity_level = 3
+            options.intra_op_num_threads = config.num_threads
+            options.inter_op_num_threads = 1
+            model.__dict__["model"] = model.ort.InferenceSession(
+                os.path.join(
+                    model.DOWNLOAD_PATH, model.EXTRACTED_FOLDER_NAME, "model.onnx"
+                ),
+                providers=["CPUExecutionProvider"],
+                sess_options=options,
+            )
+        return model
+
+    from chromadb.utils.embedding_functions import (
+        SentenceTransformerEmbeddingFunction,
+    )
+
+    if config.num_threads:
+        import torch
+
+        torch.set_num_threads(config.num_threads)
+    return SentenceTransformerEmbeddingFunction(
+        model_name=config.model_name, normalize_embeddings=True
+    )
+
+
+@register_embedding_function
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    ChromaDB embedding function backed by a local model and an on-disk cache.
+
+    Documents are embedded in batches, and only documents whose content hash is
+    not in the cache are sent to the model.
+    """
+
+    def __init__(
+        self,
+        config: Optional[EmbeddingConfig] = None,
+        model: Optional[Any] = None,
+    ) -> None:
+        """
+        Initialize the embedding function.
+
+        Args:
+            config: Embedding configuration (read from the environment if None)
+            model: Callable mapping documents to vectors (loaded from the
+                configuration on first use if None)
+        """
+        self.config = config or EmbeddingConfig.from_env()
+        self.cache = (
+            EmbeddingCache(self.config.cache_path) if self.config.cache_path else None
+        )
+        self._model = model
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """
+        Embed documents, reusing cached vectors whenever possible.
+
+        Args:
+            input: Documents to embed
+
+        Returns:
+            One vector per document, in the same order
+        """
+        hashes = [hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in input]
+        vectors: dict[str, np.ndarray] = {}
+        if self.cache is not None:
+            vectors = self.cache.get_many(self.config.model_key, hashes)
+
+        missing = {h: doc for h, doc in zip(hashes, input) if h not in vectors}
+        if missing:
+            computed = dict(zip(missing, self._embed(list(missing.values()))))
+            if self.cache is not None:
+                self.cache.put_many(self.config.model_key, computed)
+            vectors.update(computed)
+
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, input: Documents) -> Embeddings:
+        """Embed search queries, which are not worth caching."""
+        return self._embed(list(input))
+
+    def _embed(self, documents: list[str]) -> list[np.ndarray]:
+        """Run the model over `documents` in batches of the configured size."""
+        if self._model is None:
+            self._model = _load_model(self.config)
+
+        vectors: list[np.ndarray] = []
+        for start in range(0, len(documents), self.config.batch_size):
+            batch = documents[start : start + self.config.batch_size]
+            for vector in self._model(batch):
+                vectors.append(self._resize(np.asarray(vector, dtype=np.float32)))
+        return vectors
+
+    def _resize(self, vector: np.ndarray) -> np.ndarray:
+        """Truncate `vector` to the configured dimension and re-normalize it."""
+        dimension = self.config.dimension
+        if dimension is None or dimension == len(vector):
+            return vector
+        if dimension > len(vector):
+            raise ValueError(
+                f"Model {self.config.model_name} produces {len(vector)}-dimensional"
+                f" vectors, cannot use dimension {dimension}"
+            )
+        truncated = vector[:dimension]
+        norm = float(np.linalg.norm(truncated))
+        return truncated / norm if norm > 0 else truncated
+
+    @staticmethod
+    def name() -> str:
+        return "onemcp_cached"
+
+    def default_space(self) -> Any:
+        return "cosine"
+
+    def get_config(self) -> dict[str, Any]:
+        return {
+            "model_name": self.config.model_name,
+            "dimension": self.config.dimension,
+            "batch_size": self.config.batch_size,
+            "num_threads": self.config.num_threads,
+            "cache_path": self.config.cache_path,
+        }
+
+    @staticmethod
+    def build_from_config(config: dict[str, Any]) -> "CachedEmbeddingFunction":
+        return CachedEmbeddingFunction(EmbeddingConfig(**config))
+
+    def validate_config_update(
+        self, old_config: dict[str, Any], new_config: dict[str, Any]
+    ) -> None:
+        # Any setting may change; collections are rebuilt on model swaps.
+        pass
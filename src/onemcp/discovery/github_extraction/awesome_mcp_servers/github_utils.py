@@ -1,12 +1,18 @@
+import asyncio
+import base64
+import hashlib
+import itertools
 import json
 import os
-from typing import Any
+import time
+from collections.abc import Callable, Iterator
+from typing import Any, Optional
 from urllib.parse import urlparse
 
+import httpx
 import markdown
 import requests
 from bs4 import BeautifulSoup
-from bs4.element import NavigableString
 from dotenv import load_dotenv
 from tqdm import tqdm
 
@@ -22,6 +28,33 @@ HEADERS = {
     "Accept": "application/vnd.github+json",
 }
 
+# Number of repositories crawled concurrently
+DEFAULT_CONCURRENCY = 16
+
+# Maximum number of attempts of a request that hit the rate limit
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Seconds to wait after hitting a rate limit that does not say until when,
+# as GitHub asks to wait at least a minute then
+RATE_LIMIT_BACKOFF = 60.0
+
+# Top-level files whose changes may change how a server is installed
+INSTALL_FILES = (
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "requirements.txt",
+    "Pipfile",
+    "Pipfile.lock",
+    "poetry.lock",
+    "uv.lock",
+    "package.json",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "yarn.lock",
+    "Dockerfile",
+)
+
 
 class BaseGitHubRepoExplorer:
     def __init__(self, repo_url: str):
@@ -66,42 +99,233 @@ class BaseGitHubRepoExplorer:
 
     def get_repo_readme(self) -> str:
         self.readme_title = ""
+        self.readme_url = ""
 
-        base_readme_url = f"https://raw.githubusercontent.com/{self.owner}/{self.repo}/refs/heads/{self.default_branch}"
-        name_variations = ["README.md", "readme.md", "Readme.md", "README.rst"]
-        folder_variations = ["/", "/.github/", "/docs/"]
-        # Try all possible variations
-        for fv in folder_variations:
-            for nm in name_variations:
-                readme_url = f"{base_readme_url}{fv}{nm}"
-                try:
-                    response = requests.get(readme_url)
-                    response.raise_for_status()
-                    # If no fail, we have content
-                    self.readme_url = readme_url
-                    # Try to extract title from readme as well
-                    # Convert markdown to HTML
-                    html_content = markdown.markdown(response.text)
-                    soup = BeautifulSoup(html_content, "html.parser")
-                    try:
-                        node = soup.find(["h1"])
-                        if node is None:
-                            self.readme_title = ""
-                        if isinstance(node, NavigableString):
-                            self.readme_title = node.text
-
-                    except Exception:
-                        self.readme_title = ""
-                        # print(f"Error getting Readme Title: {self.repo_url}")
-                    # at this point we should break
-                    return response.text
-
-                except Exception:
-                    # print(f"not found for: {readme_url} ")
-                    continue
+        # The README endpoint resolves the file name and folder for us
+        endpoint = f"/repos/{self.owner}/{self.repo}/readme"
+        response = requests.get(f"{BASE_GITHUB_API_URL}{endpoint}", headers=HEADERS)
+        if response.status_code == 404:
+            return ""
+        response.raise_for_status()
+
+        readme = response.json()
+        self.readme_url = readme.get("download_url") or ""
+        content = decode_readme(readme)
+        self.readme_title = extract_readme_title(content)
+        return content
+
+
+def decode_readme(readme: dict[str, Any]) -> str:
+    """Decode the content of a README returned by the GitHub API"""
+    if readme.get("encoding") != "base64":
+        return str(readme.get("content") or "")
+    return base64.b64decode(readme["content"]).decode("utf-8", errors="replace")
+
+
+def extract_readme_title(content: str) -> str:
+    """Extract the first level-one heading of a markdown README"""
+    try:
+        # Convert markdown to HTML
+        html_content = markdown.markdown(content)
+        soup = BeautifulSoup(html_content, "html.parser")
+        node = soup.find(["h1"])
+        return node.get_text(strip=True) if node is not None else ""
+    except Exception:
         return ""
 
 
+def install_files_hash(tree: dict[str, Any]) -> str:
+    """
+    Hash the install-relevant files of a repository tree.
+
+    Args:
+        tree: Top-level tree of the repository, as returned by the GitHub API
+
+    Returns:
+        Digest of the paths and blob SHAs of the install files
+    """
+    entries = sorted(
+        [entry["path"], entry["sha"]]
+        for entry in tree.get("tree", [])
+        if entry.get("type") == "blob"
+        and (
+            entry["path"] in INSTALL_FILES
+            or (
+                entry["path"].startswith("requirements")
+                and entry["path"].endswith(".txt")
+            )
+        )
+    )
+    return hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()
+
+
+def parse_repo_url(repo_url: str) -> tuple[str, str]:
+    """Extract the owner and repository name of a GitHub URL"""
+    # Second and third path segments should always be owner/repo
+    params = urlparse(repo_url).path.split("/")
+    # Some repo urls come with .git at the end
+    return params[1], params[2].replace(".git", "")
+
+
+class ResponseCache:
+    """
+    On-disk cache of GitHub API responses, revalidated with ETags.
+
+    Conditional requests answered with 304 Not Modified do not count against
+    the rate limit, so recrawls only pay for what changed.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, url: str) -> Optional[dict[str, str]]:
+        """Return the cached ETag and body of `url`, if any"""
+        try:
+            with open(self._path(url)) as f:
+                entry: dict[str, str] = json.load(f)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, etag: str, body: str) -> None:
+        """Store the ETag and body of `url`"""
+        path = self._path(url)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"url": url, "etag": etag, "body": body}, f)
+        os.replace(f"{path}.tmp", path)
+
+
+class RateLimiter:
+    """
+    Pauses requests while GitHub's rate limit is exhausted.
+
+    The limiter tracks the X-RateLimit-Remaining and X-RateLimit-Reset headers,
+    as well as Retry-After on secondary rate limits, and keeps `reserve`
+    requests in hand for those already in flight.
+    """
+
+    def __init__(self, reserve: int = 0) -> None:
+        self.reserve = reserve
+        self.resume_at = 0.0
+
+    async def wait(self) -> None:
+        delay = self.resume_at - time.time()
+        if delay > 0:
+            print(f"Rate limited, waiting {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    def update(self, response: httpx.Response) -> bool:
+        """Record the rate limit state of a response, and tell if it was limited"""
+        headers = response.headers
+        limited = response.status_code in (403, 429) and (
+            "retry-after" in headers or headers.get("x-ratelimit-remaining") == "0"
+        )
+        if "retry-after" in headers and limited:
+            self.resume_at = max(
+                self.resume_at, time.time() + float(headers["retry-after"])
+            )
+        elif "x-ratelimit-remaining" in headers and "x-ratelimit-reset" in headers:
+            if int(headers["x-ratelimit-remaining"]) <= self.reserve or limited:
+                self.resume_at = max(
+                    self.resume_at, float(headers["x-ratelimit-reset"]) + 1
+                )
+        elif limited:
+            self.resume_at = max(self.resume_at, time.time() + RATE_LIMIT_BACKOFF)
+        return limited
+
+
+class AsyncGitHubClient:
+    """Asynchronous GitHub API client with response caching and rate limiting"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.cache = ResponseCache(cache_dir)
+        # Each repository issues up to three requests at once
+        self.rate_limiter = RateLimiter(reserve=3 * concurrency)
+        self._client = client or httpx.AsyncClient(
+            headers=HEADERS,
+            follow_redirects=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=3 * concurrency),
+        )
+
+    async def __aenter__(self) -> "AsyncGitHubClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._client.aclose()
+
+    async def get_json(self, url: str) -> Any:
+        """
+        GET a GitHub API URL, revalidating any cached response.
+
+        Returns:
+            Decoded JSON body, or None if the resource does not exist
+        """
+        cached = self.cache.get(url)
+        headers = {"If-None-Match": cached["etag"]} if cached else {}
+
+        for _ in range(MAX_RATE_LIMIT_RETRIES):
+            await self.rate_limiter.wait()
+            response = await self._client.get(url, headers=headers)
+            if self.rate_limiter.update(response):
+                continue
+            if response.status_code == 304 and cached:
+                return json.loads(cached["body"])
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            if "etag" in response.headers:
+                self.cache.put(url, response.headers["etag"], response.text)
+            return response.json()
+
+        raise RuntimeError(f"Rate limit retries exhausted for {url}")
+
+    async def explore_repo(self, repo_url: str) -> dict[str, Any]:
+        """Collect the metadata, README and revision of a repository"""
+        owner, repo = parse_repo_url(repo_url)
+        base_url = f"{BASE_GITHUB_API_URL}/repos/{owner}/{repo}"
+        information, languages, readme, commit = await asyncio.gather(
+            self.get_json(base_url),
+            self.get_json(f"{base_url}/languages"),
+            self.get_json(f"{base_url}/readme"),
+            self.get_json(f"{base_url}/commits/HEAD"),
+        )
+        if information is None:
+            raise LookupError(f"Repository not found: {repo_url}")
+
+        # Revision of the default branch, used to refresh the catalog
+        # incrementally.
+        tree = None
+        if commit is not None:
+            tree_sha = commit["commit"]["tree"]["sha"]
+            tree = await self.get_json(f"{base_url}/git/trees/{tree_sha}")
+
+        readme_content = decode_readme(readme) if readme else ""
+        return {
+            "repository_url": repo_url,
+            "name": information["name"],
+            "description": information["description"],
+            "language": information["language"],
+            "all_languages": languages or {},
+            "readme_url": (readme or {}).get("download_url") or "",
+            "readme_content": readme_content,
+            "readme_title": extract_readme_title(readme_content),
+            "default_branch": information["default_branch"],
+            "commit_sha": commit["sha"] if commit else None,
+            "install_files_hash": install_files_hash(tree) if tree else None,
+        }
+
+
 def get_awesome_mcp_servers_urls(url: str) -> list[str]:
     # Download markdown content
     response = requests.get(url)
@@ -148,49 +372,178 @@ def get_awesome_mcp_servers_urls(url: str) -> list[str]:
     return results
 
 
-def batch_extract_mcp_urls(urls: list[str], saved_results_filename: str) -> None:
+async def crawl_repos(
+    urls: list[str],
+    on_result: Callable[[dict[str, Any]], None],
+    cache_dir: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    client: Optional[httpx.AsyncClient] = None,
+) -> int:
+    """
+    Explore repositories with a bounded pool of concurrent workers.
+
+    Args:
+        urls: Repository URLs to explore
+        on_result: Called with the record of each explored repository
+        cache_dir: Directory of the on-disk response cache
+        concurrency: Number of repositories explored at once
+        client: HTTP client sending the requests (one is created if None)
+
+    Returns:
+        Number of repositories explored successfully
+    """
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    completed = 0
+
+    async with AsyncGitHubClient(cache_dir, concurrency, client) as github:
+        with tqdm(total=len(urls)) as progress:
+
+            async def worker() -> None:
+                nonlocal completed
+                while not queue.empty():
+                    url = queue.get_nowait()
+                    try:
+                        on_result(await github.explore_repo(url))
+                        completed += 1
+                    except Exception as e:
+                        print(f"Error: {url}")
+                        print(e)
+                    progress.update(1)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return completed
+
+
+class CrawlCheckpoint:
+    """
+    Append-only JSON Lines store of crawl results, used to resume crawls.
+
+    Each explored repository is appended as one line next to the results file,
+    so saving a result costs the same however many were saved before. The
+    explored URLs are kept in a set, and compact() merges everything into the
+    final JSON array. The URLs saved to the checkpoint since the last
+    compaction are also kept apart, so that an interrupted refresh of known
+    repositories resumes where it stopped.
+    """
+
+    def __init__(self, results_filename: str) -> None:
+        """
+        Open the checkpoint of a results file, loading what was already crawled.
+
+        Args:
+            results_filename: Path to the final JSON array of results
+        """
+        self.results_filename = results_filename
+        self.path = f"{os.path.splitext(results_filename)[0]}.jsonl"
+        self.urls: set[str] = set()
+        self.checkpointed: set[str] = set()
+        self.empty_readme = 0
+        self.empty_title = 0
+        self._drop_partial_line()
+        for record in self._compacted():
+            self._index(record)
+        for record in self._checkpointed():
+            self._index(record)
+            self.checkpointed.add(record["repository_url"])
+
+    def _drop_partial_line(self) -> None:
+        """Truncate a line left incomplete by an interrupted crawl"""
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "rb+") as file:
+            content = file.read()
+            end = content.rfind(b"\n") + 1
+            if end < len(content):
+                file.truncate(end)
+
+    def _compacted(self) -> Iterator[dict[str, Any]]:
+        """Yield the results merged by the last compaction"""
+        if os.path.isfile(self.results_filename):
+            with open(self.results_filename) as file:
+                yield from json.load(file)
+
+    def _checkpointed(self) -> Iterator[dict[str, Any]]:
+        """Yield the results saved since the last compaction"""
+        if os.path.isfile(self.path):
+            with open(self.path) as file:
+                for line in file:
+                    yield json.loads(line)
+
+    def _index(self, record: dict[str, Any]) -> None:
+        if record["repository_url"] in self.urls:
+            return
+        self.urls.add(record["repository_url"])
+        self.empty_readme += record["readme_content"] == ""
+        self.empty_title += record["readme_title"] == ""
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.urls
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def append(self, record: dict[str, Any]) -> None:
+        """Durably save the record of an explored repository"""
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+        self._index(record)
+        self.checkpointed.add(record["repository_url"])
+
+    def compact(self) -> None:
+        """Write all results to the results file and drop the checkpoint"""
+        if not os.path.isfile(self.path):
+            return
+        records: dict[str, dict[str, Any]] = {}
+        for record in itertools.chain(self._compacted(), self._checkpointed()):
+            records[record["repository_url"]] = record
+        tmp_filename = f"{self.results_filename}.tmp"
+        with open(tmp_filename, "w") as json_file:
+            json.dump(list(records.values()), json_file, indent=4)
+        os.replace(tmp_filename, self.results_filename)
+        os.remove(self.path)
+
+
+def batch_extract_mcp_urls(
+    urls: list[str],
+    saved_results_filename: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    cache_dir: Optional[str] = None,
+    refresh: bool = False,
+) -> None:
+    """
+    Explore repositories, saving their records to a JSON results file.
+
+    Args:
+        urls: Repository URLs to explore
+        saved_results_filename: Path to the JSON array of results
+        concurrency: Number of repositories explored at once
+        cache_dir: Directory of the on-disk response cache (next to the
+            results file if None)
+        refresh: Whether to explore again the repositories already in the
+            results file, to pick up their new commits and READMEs
+    """
     # Pick up where we left
-    json_results = []
-    if os.path.isfile(saved_results_filename):
-        with open(saved_results_filename) as file:
-            json_results = json.load(file)
+    checkpoint = CrawlCheckpoint(saved_results_filename)
     # Print stats
-    json_existing_urls = [x["repository_url"] for x in json_results]
-    empty_readme = [x for x in json_results if x["readme_content"] == ""]
-    empty_title = [x for x in json_results if x["readme_title"] == ""]
-    print(f"Records: {len(json_existing_urls)}/{len(urls)}")
-    print(f"Records with no readme titles: {len(empty_title)}")
-    print(f"Records with no readmes contents: {len(empty_readme)}")
-    completed = len(json_existing_urls)
-
-    for url in tqdm(urls):
-        # Skip the ones we have done
-        if url in json_existing_urls:
-            continue
-
-        url_object = {}
-        url_object["repository_url"] = url
+    print(f"Records: {len(checkpoint)}/{len(urls)}")
+    print(f"Records with no readme titles: {checkpoint.empty_title}")
+    print(f"Records with no readmes contents: {checkpoint.empty_readme}")
 
-        try:
-            GitHubExplorer = BaseGitHubRepoExplorer(repo_url=url)
-
-            url_object["name"] = GitHubExplorer.repo_information["name"]
-            url_object["description"] = GitHubExplorer.repo_information["description"]
-            url_object["language"] = GitHubExplorer.repo_information["language"]
-            url_object["all_languages"] = GitHubExplorer.programming_languages
-            url_object["readme_url"] = GitHubExplorer.readme_url
-            url_object["readme_content"] = GitHubExplorer.readme_content
-            url_object["readme_title"] = GitHubExplorer.readme_title
-
-            json_results.append(url_object)
-            # Always write
-            with open(saved_results_filename, "w") as json_file:
-                json.dump(json_results, json_file, indent=4)
-            # Counter for completed
-            completed += 1
-        except Exception as e:
-            print(f"Error: {url}")
-            print(e)
-            continue
+    # Skip the ones we have done (in this refresh, when refreshing)
+    done = checkpoint.checkpointed if refresh else checkpoint.urls
+    pending = [url for url in urls if url not in done]
+
+    if cache_dir is None:
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(saved_results_filename)), ".github-cache"
+        )
+    completed = len(urls) - len(pending)
+    completed += asyncio.run(
+        crawl_repos(pending, checkpoint.append, cache_dir, concurrency)
+    )
+    checkpoint.compact()
 
     print(f"Finished. Got {completed}/{len(urls)}")
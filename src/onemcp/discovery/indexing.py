@@ -1,8 +1,33 @@
+import hashlib
 import json
 import os
+from collections.abc import Sequence
 from typing import Any, Optional
 
 import chromadb
+import numpy as np
+
+from onemcp.discovery.embedding import CachedEmbeddingFunction, EmbeddingConfig
+from onemcp.discovery.quantization import QUANTIZATION_METHODS, QuantizedIndex
+from onemcp.serialization import loads
+
+# Name of the collection holding the tools of all servers.
+COLLECTION_NAME = "all-my-documents"
+
+# Vector stored in ChromaDB for each tool when searches run over the quantized
+# index, so that ChromaDB does not keep full-precision vectors in memory.
+PLACEHOLDER_EMBEDDING = [1.0]
+
+
+def content_hash(payload: Any) -> str:
+    """
+    Compute a stable SHA-256 digest of a JSON-serializable payload.
+
+    Keys are sorted so that two payloads with the same content always hash to
+    the same value, regardless of the order in which fields were written.
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
 
 
 class Indexing:
@@ -10,78 +35,298 @@ class Indexing:
     Class to handle indexing of MCP server tools into a ChromaDB collection.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, servers_dir: Optional[str] = None) -> None:
         """
         Initialize the ChromaDB client and collection.
+
+        Args:
+            servers_dir: Directory holding the server JSON files and the database
         """
         self.client: Optional[Any] = None
         self.collection: Optional[Any] = None
+        self.embedding_function: Optional[CachedEmbeddingFunction] = None
+        self.quantized_index: Optional[QuantizedIndex] = None
+        self._quantized_index_stale = True
+        # Tools added, changed or removed since the quantized index was updated.
+        self._quantized_changed_ids: set[str] = set()
+        self.servers_dir = servers_dir or os.path.join(
+            os.path.dirname(__file__), "servers"
+        )
 
     def init_db_server(
-        self, reset_collection: bool = False, db_name: str = "chroma_mcpservers_db"
+        self,
+        reset_collection: bool = False,
+        db_name: str = "chroma_mcpservers_db",
+        embedding_config: Optional[EmbeddingConfig] = None,
+        quantization: Optional[str] = None,
     ) -> None:
         """
         Initialize the ChromaDB client and collection.
 
+        The collection is rebuilt from the server JSON files when it is reset or
+        when it was built with a different embedding model. Vectors computed
+        before are served from the on-disk embedding cache.
+
         Args:
-            reset_collection: Whether to reset the collection (delete and recreate)
+            reset_collection: Whether to reset the collection (delete and rebuild)
+            embedding_config: Embedding model settings (read from the environment
+                if None)
+            quantization: Search over "int8" or product-quantized ("pq") codes
+                instead of full-precision vectors (read from
+                ONEMCP_EMBEDDING_QUANTIZATION if None, defaults to "none").
+                Only the codes are then kept in memory: ChromaDB stores a
+                placeholder vector per tool, and candidates are re-ranked with
+                vectors read from the on-disk embedding cache, which must be
+                enabled.
         """
+        config = embedding_config or EmbeddingConfig.from_env(
+            cache_path=os.path.join(self.servers_dir, "embedding-cache.sqlite3")
+        )
+        self.embedding_function = CachedEmbeddingFunction(config)
+
+        quantization = quantization or os.getenv(
+            "ONEMCP_EMBEDDING_QUANTIZATION", "none"
+        )
+        if quantization not in QUANTIZATION_METHODS:
+            raise ValueError(f"Unsupported quantization method: {quantization}")
+        if quantization != "none":
+            if config.cache_path is None:
+                raise ValueError(
+                    "Quantization re-ranks with cached embeddings, set"
+                    " ONEMCP_EMBEDDING_CACHE to enable the embedding cache"
+                )
+            self.quantized_index = QuantizedIndex(method=quantization)
+            self._quantized_index_stale = True
+
         # chroma run --host localhost --port 8000
         # self.client = chromadb.HttpClient(host="localhost", port=8000)
         self.client = chromadb.PersistentClient(
-            path=os.path.join(os.path.dirname(__file__), "servers", db_name)
+            path=os.path.join(self.servers_dir, db_name)
         )
 
-        if reset_collection:
+        # Collections of placeholder vectors are rebuilt when switching to
+        # full-precision vectors, and the other way around.
+        model_key = config.model_key
+        if self.quantized_index is not None:
+            model_key += ":quantized"
+        metadata = {
+            "description": "Collection of all tools from various servers",
+            "embedding-model": model_key,
+        }
+        if not reset_collection:
             try:
-                if self.client:
-                    self.client.delete_collection("all-my-documents")
-            except Exception:
-                pass  # Collection might not exist
-
-        if self.client:
-            self.collection = self.client.get_or_create_collection(
-                "all-my-documents",
-                # embedding_function=openai_ef,  # Uncomment if using OpenAI embeddings
-                metadata={
-                    "description": "Collection of all tools from various servers"
-                },
-            )
+                self.collection = self.client.get_or_create_collection(
+                    COLLECTION_NAME,
+                    embedding_function=self.embedding_function,
+                    metadata=metadata,
+                )
+            except ValueError:
+                # The collection was built with another embedding function.
+                self.collection = None
+
+            if (
+                self.collection is not None
+                and self.collection.metadata.get("embedding-model") == model_key
+            ):
+                return
+            print(f"Embedding model changed to {model_key}, rebuilding")
+
+        try:
+            self.client.delete_collection(COLLECTION_NAME)
+        except Exception:
+            pass  # Collection might not exist
+
+        self.collection = self.client.create_collection(
+            COLLECTION_NAME,
+            embedding_function=self.embedding_function,
+            metadata=metadata,
+        )
+        self.add_tools_from_dir(self.servers_dir)
 
-    def add_tools_from_json(self, json_file: str) -> None:
+    def add_tools_from_dir(self, json_dir: str) -> int:
+        """
+        Add the tools of every server JSON file in a directory.
+
+        Args:
+            json_dir: Directory containing the server JSON files
+
+        Returns:
+            Number of server files indexed
+        """
+        servers = []
+        for file in sorted(os.listdir(json_dir)):
+            if not file.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(json_dir, file), "rb") as f:
+                    data = loads(f.read())
+                if "repository_url" not in data or "description" not in data:
+                    raise ValueError("missing repository_url or description")
+                servers.append((data, file))
+            except Exception as e:
+                print(f"Error indexing server file {file}: {e}")
+
+        # Index every server in one pass over the embedding function.
+        self.sync_servers(servers)
+        return len(servers)
+
+    def add_tools_from_json(self, json_file: str) -> dict[str, int]:
         """
         Add tools from a JSON file to the ChromaDB collection.
 
+        Re-adding a server only applies what changed since the last time: new
+        tools are added, tools whose document changed are re-embedded, tools no
+        longer listed are removed, and unchanged tools keep their embeddings.
+
         Args:
             json_file: Path to the JSON file containing server and tool information.
+
+        Returns:
+            Number of tools added, updated, removed and left unchanged.
+        """
+        with open(json_file, "rb") as f:
+            data = loads(f.read())
+
+        changes, _ = self.sync_servers([(data, os.path.basename(json_file))])
+        return changes[0]
+
+    def sync_servers(
+        self,
+        servers: list[tuple[dict[str, Any], str]],
+        removed_urls: Sequence[str] = (),
+    ) -> tuple[list[dict[str, int]], dict[str, int]]:
+        """
+        Apply the tools of several servers to the ChromaDB collection at once.
+
+        The tools currently indexed for all servers are fetched in one query,
+        and every change is applied with a single upsert, update and delete, so
+        that new documents go through the embedding function in one batch.
+
+        Args:
+            servers: (server data, server file name) of each server to add or
+                update
+            removed_urls: Repository URLs of servers whose tools are removed
+
+        Returns:
+            Number of tools added, updated, removed and left unchanged for each
+            server, and number of tools removed for each removed URL.
         """
         if not self.collection:
             raise RuntimeError(
                 "Collection not initialized. Call init_db_server() first."
             )
 
-        with open(json_file) as f:
-            data = json.load(f)
-            server_summary = data["description"]  # Use LLM to summarize if needed
-            print(f"Adding server: {server_summary}")
-            for tool in data.get("tools", []):
-                document_info = f"""
+        urls = [data["repository_url"] for data, _ in servers] + list(removed_urls)
+        existing_by_url: dict[str, dict[str, Any]] = {url: {} for url in urls}
+        if urls:
+            where = {"source": urls[0]} if len(urls) == 1 else {"source": {"$in": urls}}
+            existing = self.collection.get(where=where, include=["metadatas"])
+            for tool_id, metadata in zip(
+                existing.get("ids") or [], existing.get("metadatas") or []
+            ):
+                existing_by_url[metadata["source"]][tool_id] = metadata
+
+        upserts: dict[str, tuple[str, dict[str, str]]] = {}
+        relabels: dict[str, dict[str, str]] = {}
+        deleted_ids: list[str] = []
+        server_changes: list[dict[str, int]] = []
+        for data, path_to_json in servers:
+            print(f"Adding server: {data['description']}")
+            documents = self._tool_documents(data, path_to_json)
+            existing_metadatas = existing_by_url[data["repository_url"]]
+
+            changed_ids: list[str] = []
+            relabeled_ids: list[str] = []
+            unchanged = 0
+            for tool_id, (document, metadata) in documents.items():
+                previous = existing_metadatas.get(tool_id) or {}
+                if previous.get("content-hash") != metadata["content-hash"]:
+                    changed_ids.append(tool_id)
+                    upserts[tool_id] = (document, metadata)
+                elif previous != metadata:
+                    # Only metadata changed, so the existing embedding is kept.
+                    relabeled_ids.append(tool_id)
+                    relabels[tool_id] = metadata
+                else:
+                    unchanged += 1
+            removed_ids = [i for i in existing_metadatas if i not in documents]
+            deleted_ids.extend(removed_ids)
+
+            added = sum(1 for i in changed_ids if i not in existing_metadatas)
+            server_changes.append(
+                {
+                    "added": added,
+                    "updated": len(changed_ids) - added + len(relabeled_ids),
+                    "removed": len(removed_ids),
+                    "unchanged": unchanged,
+                }
+            )
+
+        removed_counts: dict[str, int] = {}
+        for url in removed_urls:
+            removed_counts[url] = len(existing_by_url[url])
+            deleted_ids.extend(existing_by_url[url])
+
+        # ChromaDB caps the number of records written per call.
+        max_batch_size = (
+            self.client.get_max_batch_size() if self.client else len(upserts)
+        ) or 1
+        upsert_ids = list(upserts)
+        for start in range(0, len(upsert_ids), max_batch_size):
+            batch = upsert_ids[start : start + max_batch_size]
+            self.collection.upsert(
+                documents=[upserts[i][0] for i in batch],
+                metadatas=[upserts[i][1] for i in batch],
+                ids=batch,
+                embeddings=(
+                    [PLACEHOLDER_EMBEDDING] * len(batch)
+                    if self.quantized_index is not None
+                    else None
+                ),
+            )
+        if relabels:
+            self.collection.update(
+                metadatas=list(relabels.values()), ids=list(relabels)
+            )
+        if deleted_ids:
+            self.collection.delete(ids=deleted_ids)
+        self._quantized_changed_ids.update(upserts)
+        self._quantized_changed_ids.update(deleted_ids)
+
+        return server_changes, removed_counts
+
+    def _tool_documents(
+        self, data: dict[str, Any], path_to_json: str
+    ) -> dict[str, tuple[str, dict[str, str]]]:
+        """
+        Build the documents and metadata to index for every tool of a server.
+
+        Args:
+            data: Server record containing the description and its tools
+            path_to_json: Name of the JSON file the server record is stored in
+
+        Returns:
+            Dictionary mapping each tool ID to its document and metadata
+        """
+        server_summary = data["description"]  # Use LLM to summarize if needed
+        documents: dict[str, tuple[str, dict[str, str]]] = {}
+        for tool in data.get("tools", []):
+            document_info = f"""
                     Tool Name: {tool["name"]}
                     Tool Description: {tool["description"]}
                     Context: {server_summary}
                 """
-                self.collection.add(
-                    documents=[document_info],
-                    metadatas=[
-                        {
-                            "source": data["repository_url"],
-                            "path-to-json": os.path.basename(json_file),
-                            "tool-name": tool["name"],
-                            "tool-description": tool["description"],
-                        }
-                    ],
-                    ids=[f"{tool['name']}@{data['repository_url']}"],
-                )
+            documents[f"{tool['name']}@{data['repository_url']}"] = (
+                document_info,
+                {
+                    "source": data["repository_url"],
+                    "path-to-json": path_to_json,
+                    "tool-name": tool["name"],
+                    "tool-description": tool["description"],
+                    "content-hash": content_hash(document_info),
+                },
+            )
+        return documents
 
     def find_similar_tools(
         self, user_query: str, k: int = 5
@@ -103,6 +348,9 @@ class Indexing:
             )
 
         q_prompt = f"Description: {user_query}"
+        if self.quantized_index is not None:
+            return self._find_similar_tools_quantized(q_prompt, k)
+
         results = self.collection.query(
             query_texts=[q_prompt],
             n_results=k,
@@ -120,19 +368,94 @@ class Indexing:
                     and idx_ < len(all_distances[0])
                     else 0.0
                 )
-                print("tool-name:", mdata["tool-name"], f"[score = {distance}]")
-                query_result.append(
-                    {
-                        "tool-name": mdata["tool-name"],
-                        "tool-description": mdata["tool-description"],
-                        "server-url": mdata["source"],
-                        "path-to-json": mdata["path-to-json"],
-                        "distance": distance,
-                    }
-                )
+                query_result.append(self._tool_result(mdata, distance))
 
         return query_result
 
+    def _find_similar_tools_quantized(
+        self, q_prompt: str, k: int
+    ) -> list[dict[str, str | float]]:
+        """
+        Search the quantized index, re-ranking candidates with the full-precision
+        embeddings of the embedding cache.
+
+        Args:
+            q_prompt: Query prompt to embed
+            k: Maximum number of results to return
+
+        Returns:
+            List of dictionaries containing tool information and distances
+        """
+        assert self.collection is not None and self.quantized_index is not None
+        assert self.embedding_function is not None
+
+        self._update_quantized_index()
+        query = self.embedding_function.embed_query([q_prompt])[0]
+        matches = self.quantized_index.search(query, k, self._get_embeddings)
+        if not matches:
+            return []
+
+        found = self.collection.get(
+            ids=[tool_id for tool_id, _ in matches], include=["metadatas"]
+        )
+        metadatas = dict(zip(found["ids"], found["metadatas"]))
+        return [
+            self._tool_result(metadatas[tool_id], distance)
+            for tool_id, distance in matches
+            if tool_id in metadatas
+        ]
+
+    def _update_quantized_index(self) -> None:
+        """
+        Apply the tools changed since the last search to the quantized index.
+
+        Only the embeddings of changed tools are looked up and encoded, with
+        the codebooks of the index. All embeddings are looked up to train it
+        again once it outgrew them.
+        """
+        assert self.collection is not None and self.quantized_index is not None
+        changed_ids = sorted(self._quantized_changed_ids)
+        self._quantized_changed_ids.clear()
+        if changed_ids and not self._quantized_index_stale:
+            found = self.collection.get(ids=changed_ids, include=["documents"])
+            self.quantized_index.remove(changed_ids)
+            self.quantized_index.add(found["ids"], self._embed(found["documents"]))
+            self._quantized_index_stale = self.quantized_index.needs_training
+
+        if self._quantized_index_stale:
+            everything = self.collection.get(include=["documents"])
+            self.quantized_index.build(
+                everything["ids"], self._embed(everything["documents"])
+            )
+            self._quantized_index_stale = False
+
+    def _get_embeddings(self, ids: list[str]) -> np.ndarray:
+        """Look up the full-precision embeddings of `ids`, in the same order."""
+        assert self.collection is not None
+        found = self.collection.get(ids=ids, include=["documents"])
+        documents = dict(zip(found["ids"], found["documents"]))
+        return self._embed([documents[tool_id] for tool_id in ids])
+
+    def _embed(self, documents: list[str]) -> np.ndarray:
+        """Embed indexed documents, which hits the embedding cache."""
+        assert self.embedding_function is not None
+        if not documents:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.asarray(self.embedding_function(documents), dtype=np.float32)
+
+    def _tool_result(
+        self, mdata: dict[str, Any], distance: float
+    ) -> dict[str, str | float]:
+        """Convert the metadata of a matched tool into a search result."""
+        print("tool-name:", mdata["tool-name"], f"[score = {distance}]")
+        return {
+            "tool-name": mdata["tool-name"],
+            "tool-description": mdata["tool-description"],
+            "server-url": mdata["source"],
+            "path-to-json": mdata["path-to-json"],
+            "distance": distance,
+        }
+
     def get_server_json(self, codebase_url: str) -> dict[str, Any]:
         """
         Retrieve the JSON data for a specific server by its codebase URL.
@@ -159,9 +482,9 @@ class Indexing:
             metadata = all_results["metadatas"][0] if all_results["metadatas"] else {}
             path_to_json = str(metadata.get("path-to-json", ""))
             print("loading server JSON from:", path_to_json)
-            json_file = os.path.join(os.path.dirname(__file__), "servers", path_to_json)
-            with open(json_file) as f:
-                data: dict[str, Any] = json.load(f)
+            json_file = os.path.join(self.servers_dir, path_to_json)
+            with open(json_file, "rb") as f:
+                data: dict[str, Any] = loads(f.read())
 
             return data
 
@@ -194,6 +517,7 @@ class Indexing:
             # Delete all tools from this server
             tool_ids = all_results["ids"]
             self.collection.delete(ids=tool_ids)
+            self._quantized_changed_ids.update(tool_ids)
 
             print(f"Removed {len(tool_ids)} tools from server: {codebase_url}")
             return len(tool_ids)
@@ -230,10 +554,6 @@ Json file example:
 if __name__ == "__main__":
     indexing = Indexing()
     indexing.init_db_server()
-    files_dir = os.path.join(os.path.dirname(__file__), "servers")
-    # for file in os.listdir(files_dir):
-    #    if file.endswith(".json"):
-    #        indexing.add_tools_from_json(os.path.join(files_dir, file))
 
     results = indexing.find_similar_tools("Authenticate to Google task API", k=5)
     for res in results:
@@ -1,11 +1,15 @@
-import json
+import base64
+import bisect
 import os
-from typing import Any
+from collections.abc import Container, Iterator, Sequence
+from typing import Any, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-from onemcp.discovery.indexing import Indexing
+from onemcp.discovery.indexing import Indexing, content_hash
+from onemcp.serialization import FastJSONResponse, dumps, loads
 
 
 class ServerRegistrationRequest(BaseModel):
@@ -47,29 +51,49 @@ class FindToolsResponse(BaseModel):
     total_results: int
 
 
+# Fields of a server summary that can be selected in GET /servers
+SERVER_SUMMARY_FIELDS = ("filename", "repository_url", "description", "tools_count")
+
+# Media type of newline-delimited JSON responses
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
 class IndexingAPI:
     """
     RESTful API for indexing and discovering MCP server tools.
     """
 
-    def __init__(self, db_name: str = "chroma_mcpservers_db") -> None:
+    def __init__(
+        self,
+        db_name: str = "chroma_mcpservers_db",
+        servers_dir: str | None = None,
+        rebuild: bool = False,
+    ) -> None:
         self.app = FastAPI(
             title="OneMCP Indexing API",
             description="API for registering and discovering MCP server tools",
             version="1.0.0",
+            default_response_class=FastJSONResponse,
         )
-        self.indexing = Indexing()
-        self.servers_dir = os.path.join(os.path.dirname(__file__), "servers")
+        self.indexing = Indexing(servers_dir=servers_dir)
+        self.servers_dir = self.indexing.servers_dir
 
         # Initialize ChromaDB
         try:
-            self.indexing.init_db_server(db_name=db_name)
+            self.indexing.init_db_server(reset_collection=rebuild, db_name=db_name)
         except Exception as e:
             print(f"Warning: Could not initialize ChromaDB: {e}")
 
         # Ensure servers directory exists
         os.makedirs(self.servers_dir, exist_ok=True)
 
+        # Index of registered servers: repository URL -> (filename, content hash)
+        self._server_files: dict[str, tuple[str, str]] = {}
+        # Summary of every server file, listed in filename order
+        self._server_summaries: dict[str, dict[str, Any]] = {}
+        self._server_order: list[str] = []
+        self._load_server_files()
+
         # Setup routes
         self._setup_routes()
 
@@ -94,34 +118,112 @@ class IndexingAPI:
                         status_code=422, detail="Missing required field: repository_url"
                     )
 
-                # Use the request data as-is
-                server_data = request
+                result = self._apply_registrations([request])[0][0]
+                return {
+                    "status": "success",
+                    "message": "Server unchanged"
+                    if result["status"] == "unchanged"
+                    else "Server registered successfully",
+                    "server_file": result["server_file"],
+                    "tools_count": result["tools_count"],
+                    "server_url": result["repository_url"],
+                    "tools_added": result["tools_added"],
+                    "tools_updated": result["tools_updated"],
+                    "tools_removed": result["tools_removed"],
+                    "tools_unchanged": result["tools_unchanged"],
+                }
+
+            except HTTPException:
+                raise  # Re-raise HTTP exceptions
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"Failed to register server: {str(e)}"
+                ) from e
 
-                # Generate a unique filename for the server
-                server_name = self._generate_server_filename(request["repository_url"])
-                json_file_path = os.path.join(self.servers_dir, server_name)
+        @self.app.post("/register_servers")
+        async def register_servers(
+            request: Request, atomic: bool = False, replace: bool = False
+        ) -> dict[str, Any]:
+            """
+            Register many MCP servers in a single index update.
 
-                # Save to local storage
-                with open(json_file_path, "w") as f:
-                    json.dump(server_data, f, indent=2)
+            The body holds one server record per line (NDJSON), or a JSON array
+            of records. Valid records are applied together: their new tools go
+            through one batched embedding pass, and server files are only
+            written once the index has been updated.
 
-                # Add to ChromaDB using the existing method
-                self.indexing.add_tools_from_json(json_file_path)
+            Args:
+                atomic: Reject the whole request if any record is invalid
+                replace: Also unregister every server not listed in the request,
+                    in the same index update. The whole request is rejected if
+                    any record is invalid, as the server it lists is unknown.
 
-                # Calculate tools count if tools are present, otherwise 0
-                tools_count = len(request.get("tools", []))
+            Returns:
+                Dictionary with the overall status and the status of each record
+            """
+            try:
+                records = self._parse_bulk_body(
+                    await request.body(), request.headers.get("content-type", "")
+                )
 
-                return {
-                    "status": "success",
-                    "message": "Server registered successfully",
-                    "server_file": server_name,
-                    "tools_count": tools_count,
-                    "server_url": request["repository_url"],
-                }
+                results: list[dict[str, Any]] = []
+                latest: dict[str, int] = {}
+                for index, (record, error) in enumerate(records):
+                    error = error or self._validate_server_record(record)
+                    if error:
+                        results.append(
+                            {
+                                "index": index,
+                                "repository_url": None,
+                                "status": "error",
+                                "error": error,
+                            }
+                        )
+                        continue
+                    url: str = record["repository_url"]
+                    results.append({"index": index, "repository_url": url})
+                    if url in latest:
+                        # The last record of a server wins.
+                        results[latest[url]].update(
+                            status="skipped",
+                            reason="Superseded by a later record in the same request",
+                        )
+                    latest[url] = index
+
+                errors = [r for r in results if r.get("status") == "error"]
+                # Replacing the catalog would unregister the servers of the
+                # invalid records.
+                if (atomic or replace) and errors:
+                    raise HTTPException(
+                        status_code=422,
+                        detail={
+                            "message": "Invalid records, nothing was registered",
+                            "results": errors,
+                        },
+                    )
+
+                removed_urls = (
+                    [url for url in self._server_files if url not in latest]
+                    if replace
+                    else []
+                )
+                valid = sorted(latest.values())
+                applied, removed = self._apply_registrations(
+                    [records[i][0] for i in valid], removed_urls
+                )
+                for index, result in zip(valid, applied):
+                    results[index] = {"index": index, **result}
+
+                response = self._bulk_response(results)
+                if replace:
+                    response["removed"] = removed
+                return response
 
+            except HTTPException:
+                raise  # Re-raise HTTP exceptions
             except Exception as e:
                 raise HTTPException(
-                    status_code=500, detail=f"Failed to register server: {str(e)}"
+                    status_code=500, detail=f"Failed to register servers: {str(e)}"
                 ) from e
 
         @self.app.post("/find_tools", response_model=FindToolsResponse)
@@ -197,30 +299,94 @@ class IndexingAPI:
                     "error": str(e),
                 }
 
-        @self.app.get("/servers")
-        async def list_servers() -> dict[str, Any]:
-            """List all registered servers"""
+        @self.app.get("/servers", response_model=None)
+        async def list_servers(
+            request: Request,
+            cursor: Optional[str] = None,
+            limit: Optional[int] = None,
+            fields: Optional[str] = None,
+            format: Optional[str] = None,
+        ) -> dict[str, Any] | StreamingResponse:
+            """
+            List registered servers.
+
+            Args:
+                cursor: Opaque cursor returned as next_cursor by the previous page
+                limit: Maximum number of servers to return (all if not given)
+                fields: Comma-separated summary fields to return (all if not given)
+                format: "ndjson" to stream one server per line (also selected
+                    by an "Accept: application/x-ndjson" header)
+
+            Returns:
+                Dictionary with the servers, the total count and the next cursor,
+                or a newline-delimited JSON stream of servers
+            """
             try:
-                servers = []
-                for file in os.listdir(self.servers_dir):
-                    if file.endswith(".json"):
-                        file_path = os.path.join(self.servers_dir, file)
-                        with open(file_path) as f:
-                            server_data = json.load(f)
-                            servers.append(
-                                {
-                                    "filename": file,
-                                    "repository_url": server_data.get("repository_url"),
-                                    "description": server_data.get("description"),
-                                    "tools_count": len(server_data.get("tools", [])),
-                                }
-                            )
-                return {"servers": servers, "total_count": len(servers)}
+                if limit is not None and limit <= 0:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Parameter 'limit' must be greater than 0",
+                    )
+                selected = self._parse_fields(fields)
+                start = self._decode_cursor(cursor) if cursor else 0
+                end = len(self._server_order) if limit is None else start + limit
+                page = self._server_order[start:end]
+                next_cursor = (
+                    self._encode_cursor(page[-1])
+                    if page and end < len(self._server_order)
+                    else None
+                )
+
+                def project(filename: str) -> dict[str, Any]:
+                    summary = self._server_summaries[filename]
+                    return {field: summary[field] for field in selected}
+
+                if format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get(
+                    "accept", ""
+                ):
+
+                    def stream() -> Iterator[bytes]:
+                        for filename in page:
+                            yield dumps(project(filename)) + b"\n"
+
+                    headers = {"X-OneMCP-Next-Cursor": next_cursor or ""}
+                    return StreamingResponse(
+                        stream(), media_type=NDJSON_MEDIA_TYPE, headers=headers
+                    )
+
+                return {
+                    "servers": [project(filename) for filename in page],
+                    "total_count": len(self._server_order),
+                    "next_cursor": next_cursor,
+                }
+            except HTTPException:
+                raise  # Re-raise HTTP exceptions
             except Exception as e:
                 raise HTTPException(
                     status_code=500, detail=f"Failed to list servers: {str(e)}"
                 ) from e
 
+        @self.app.api_route("/server_exists", methods=["GET", "HEAD"])
+        async def server_exists(repository_url: str) -> Response:
+            """
+            Check whether a server is registered, without listing all servers.
+
+            Args:
+                repository_url: The repository URL of the server
+
+            Returns:
+                200 with the server file if the server is registered, 404 otherwise
+            """
+            server_file, _ = self._server_files.get(repository_url, ("", ""))
+            return JSONResponse(
+                status_code=200 if server_file else 404,
+                content={
+                    "repository_url": repository_url,
+                    "exists": bool(server_file),
+                    "server_file": server_file or None,
+                },
+            )
+
         @self.app.get("/server/{codebase_url:path}")
         async def get_server_json(codebase_url: str) -> dict[str, Any]:
             """
@@ -271,25 +437,9 @@ class IndexingAPI:
             """
             try:
                 codebase_url = request.repository_url
+                result = self._apply_unregistrations([codebase_url])[0]
 
-                # Remove tools from ChromaDB
-                tools_removed = self.indexing.remove_server_tools(codebase_url)
-
-                # Find and remove the JSON file(s) for this server
-                files_removed = []
-                for file in os.listdir(self.servers_dir):
-                    if file.endswith(".json"):
-                        file_path = os.path.join(self.servers_dir, file)
-                        try:
-                            with open(file_path) as f:
-                                server_data = json.load(f)
-                                if server_data.get("repository_url") == codebase_url:
-                                    os.remove(file_path)
-                                    files_removed.append(file)
-                        except Exception as e:
-                            print(f"Error reading/removing file {file}: {e}")
-
-                if tools_removed == 0 and len(files_removed) == 0:
+                if result["status"] == "not_found":
                     raise HTTPException(
                         status_code=404, detail=f"Server not found: {codebase_url}"
                     )
@@ -298,8 +448,8 @@ class IndexingAPI:
                     "status": "success",
                     "message": "Server unregistered successfully",
                     "server_url": codebase_url,
-                    "tools_removed": tools_removed,
-                    "files_removed": files_removed,
+                    "tools_removed": result["tools_removed"],
+                    "files_removed": result["files_removed"],
                 }
 
             except HTTPException:
@@ -309,8 +459,317 @@ class IndexingAPI:
                     status_code=500, detail=f"Failed to unregister server: {str(e)}"
                 ) from e
 
-    def _generate_server_filename(self, codebase_url: str) -> str:
-        """Generate a unique filename for the server based on its URL"""
+        @self.app.api_route("/unregister_servers", methods=["POST", "DELETE"])
+        async def unregister_servers(request: Request) -> dict[str, Any]:
+            """
+            Unregister many servers in a single index update.
+
+            The body holds one record per line (NDJSON) or a JSON array, where
+            each record is either a repository URL or an object with a
+            repository_url field.
+
+            Returns:
+                Dictionary with the overall status and the status of each record
+            """
+            try:
+                records = self._parse_bulk_body(
+                    await request.body(), request.headers.get("content-type", "")
+                )
+
+                results: list[dict[str, Any]] = []
+                urls: list[str] = []
+                for index, (record, error) in enumerate(records):
+                    url = (
+                        record.get("repository_url")
+                        if isinstance(record, dict)
+                        else record
+                    )
+                    if error or not isinstance(url, str) or not url:
+                        results.append(
+                            {
+                                "index": index,
+                                "repository_url": None,
+                                "status": "error",
+                                "error": error
+                                or "Missing required field: repository_url",
+                            }
+                        )
+                        continue
+                    results.append({"index": index, "repository_url": url})
+                    urls.append(url)
+
+                removed = {
+                    result["repository_url"]: result
+                    for result in self._apply_unregistrations(urls)
+                }
+                for result in results:
+                    if result.get("status") != "error":
+                        result.update(removed[result["repository_url"]])
+
+                return self._bulk_response(results)
+
+            except HTTPException:
+                raise  # Re-raise HTTP exceptions
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"Failed to unregister servers: {str(e)}"
+                ) from e
+
+    def _parse_bulk_body(
+        self, body: bytes, content_type: str
+    ) -> list[tuple[Any, Optional[str]]]:
+        """
+        Split the body of a bulk request into records.
+
+        Returns:
+            (record, parse error) of each record, in request order
+        """
+        if "application/json" in content_type:
+            try:
+                records = loads(body)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=f"Invalid JSON: {e}") from e
+            if not isinstance(records, list):
+                raise HTTPException(
+                    status_code=422, detail="Expected a JSON array of records"
+                )
+            return [(record, None) for record in records]
+
+        parsed: list[tuple[Any, Optional[str]]] = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                parsed.append((loads(line), None))
+            except ValueError as e:
+                parsed.append((None, f"Invalid JSON: {e}"))
+        return parsed
+
+    def _validate_server_record(self, record: Any) -> Optional[str]:
+        """Return why a server record cannot be registered, if it cannot"""
+        if not isinstance(record, dict):
+            return "Expected a JSON object"
+        for field in ("repository_url", "description"):
+            if field not in record:
+                return f"Missing required field: {field}"
+        tools = record.get("tools", [])
+        if not isinstance(tools, list) or not all(
+            isinstance(tool, dict) and "name" in tool for tool in tools
+        ):
+            return "Field 'tools' must be a list of objects with a name"
+        return None
+
+    def _apply_registrations(
+        self, records: list[dict[str, Any]], removed_urls: Sequence[str] = ()
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """
+        Register and unregister several servers with a single index update.
+
+        Server files are staged next to their final location and only moved in
+        place once the index has been updated, so that a failed update leaves
+        the stored servers untouched.
+
+        Args:
+            records: Server records, at most one per repository URL
+            removed_urls: Repository URLs of the servers to unregister
+
+        Returns:
+            Registration result of each record and unregistration result of
+            each distinct removed URL
+        """
+        removed_urls = list(dict.fromkeys(removed_urls))
+        staged: list[tuple[str, str, str, str]] = []
+        reserved: set[str] = set()
+        for server_data in records:
+            server_url = server_data["repository_url"]
+            server_hash = content_hash(server_data)
+
+            # Reuse the file of a previous registration, if any.
+            server_name, previous_hash = self._server_files.get(server_url, ("", ""))
+            server_name = server_name or self._generate_server_filename(
+                server_url, reserved
+            )
+            reserved.add(server_name)
+            staged.append((server_url, server_name, server_hash, previous_hash))
+
+        tmp_files: dict[str, str] = {}
+        try:
+            # The file is left untouched if the server record did not change.
+            for server_data, (_, server_name, server_hash, previous_hash) in zip(
+                records, staged
+            ):
+                if previous_hash != server_hash:
+                    tmp_file_path = os.path.join(self.servers_dir, f"{server_name}.tmp")
+                    with open(tmp_file_path, "wb") as f:
+                        f.write(dumps(server_data))
+                    tmp_files[server_name] = tmp_file_path
+
+            # Apply only the tool changes to ChromaDB
+            changes, tools_removed = self.indexing.sync_servers(
+                [(data, name) for data, (_, name, _, _) in zip(records, staged)],
+                removed_urls,
+            )
+        except Exception:
+            for tmp_file_path in tmp_files.values():
+                os.remove(tmp_file_path)
+            raise
+
+        results = []
+        for server_data, (server_url, server_name, server_hash, previous_hash), (
+            change
+        ) in zip(records, staged, changes):
+            if server_name in tmp_files:
+                os.replace(
+                    tmp_files[server_name], os.path.join(self.servers_dir, server_name)
+                )
+            self._server_files[server_url] = (server_name, server_hash)
+            self._add_server_summary(server_name, server_data)
+
+            if not previous_hash:
+                status = "registered"
+            elif previous_hash != server_hash:
+                status = "updated"
+            else:
+                status = "unchanged"
+            results.append(
+                {
+                    "repository_url": server_url,
+                    "status": status,
+                    "server_file": server_name,
+                    "tools_count": len(server_data.get("tools", [])),
+                    "tools_added": change["added"],
+                    "tools_updated": change["updated"],
+                    "tools_removed": change["removed"],
+                    "tools_unchanged": change["unchanged"],
+                }
+            )
+        return results, self._remove_server_files(removed_urls, tools_removed)
+
+    def _apply_unregistrations(self, urls: list[str]) -> list[dict[str, Any]]:
+        """
+        Unregister several servers with a single index update.
+
+        Args:
+            urls: Repository URLs of the servers
+
+        Returns:
+            Unregistration result of each distinct URL
+        """
+        return self._apply_registrations([], urls)[1]
+
+    def _remove_server_files(
+        self, urls: list[str], tools_removed: dict[str, int]
+    ) -> list[dict[str, Any]]:
+        """Remove the files of servers whose tools were removed from the index"""
+        files_by_url: dict[str, list[str]] = {url: [] for url in urls}
+        for filename, summary in self._server_summaries.items():
+            if summary["repository_url"] in files_by_url:
+                files_by_url[summary["repository_url"]].append(filename)
+
+        results = []
+        for url in urls:
+            files_removed = []
+            for file in files_by_url[url]:
+                try:
+                    os.remove(os.path.join(self.servers_dir, file))
+                    self._remove_server_summary(file)
+                    files_removed.append(file)
+                except Exception as e:
+                    print(f"Error removing file {file}: {e}")
+            self._server_files.pop(url, None)
+
+            results.append(
+                {
+                    "repository_url": url,
+                    "status": "removed"
+                    if tools_removed[url] or files_removed
+                    else "not_found",
+                    "tools_removed": tools_removed[url],
+                    "files_removed": files_removed,
+                }
+            )
+        return results
+
+    def _bulk_response(self, results: list[dict[str, Any]]) -> dict[str, Any]:
+        """Summarize the per-record results of a bulk request"""
+        counts: dict[str, int] = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {
+            "status": "partial" if counts.get("error") else "success",
+            "total_count": len(results),
+            "counts": counts,
+            "results": results,
+        }
+
+    def _load_server_files(self) -> None:
+        """Index the server files already stored on disk by repository URL"""
+        for file in sorted(os.listdir(self.servers_dir)):
+            if not file.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.servers_dir, file), "rb") as f:
+                    server_data = loads(f.read())
+            except Exception as e:
+                print(f"Error reading server file {file}: {e}")
+                continue
+            self._add_server_summary(file, server_data)
+            server_url = server_data.get("repository_url")
+            if server_url and server_url not in self._server_files:
+                self._server_files[server_url] = (file, content_hash(server_data))
+
+    def _add_server_summary(self, filename: str, server_data: dict[str, Any]) -> None:
+        """Add or replace the listing summary of a server file"""
+        if filename not in self._server_summaries:
+            bisect.insort(self._server_order, filename)
+        self._server_summaries[filename] = {
+            "filename": filename,
+            "repository_url": server_data.get("repository_url"),
+            "description": server_data.get("description"),
+            "tools_count": len(server_data.get("tools", [])),
+        }
+
+    def _remove_server_summary(self, filename: str) -> None:
+        """Remove the listing summary of a server file"""
+        if self._server_summaries.pop(filename, None) is not None:
+            self._server_order.remove(filename)
+
+    def _parse_fields(self, fields: Optional[str]) -> list[str]:
+        """Validate a comma-separated list of server summary fields"""
+        if not fields:
+            return list(SERVER_SUMMARY_FIELDS)
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in SERVER_SUMMARY_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown fields: {', '.join(unknown)}. "
+                f"Valid fields: {', '.join(SERVER_SUMMARY_FIELDS)}",
+            )
+        return selected
+
+    def _encode_cursor(self, filename: str) -> str:
+        """Encode the last filename of a page into an opaque cursor"""
+        return base64.urlsafe_b64encode(filename.encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> int:
+        """Return the position of the first server after `cursor`"""
+        try:
+            filename = base64.urlsafe_b64decode(cursor.encode()).decode()
+        except Exception as e:
+            raise HTTPException(status_code=422, detail="Invalid cursor") from e
+        return bisect.bisect_right(self._server_order, filename)
+
+    def _generate_server_filename(
+        self, codebase_url: str, reserved: Container[str] = ()
+    ) -> str:
+        """
+        Generate a unique filename for the server based on its URL.
+
+        Args:
+            codebase_url: The codebase URL of the server
+            reserved: Filenames already taken by servers not yet written
+        """
         # Extract repository name from URL
         if codebase_url.endswith("/"):
             codebase_url = codebase_url[:-1]
@@ -327,7 +786,9 @@ class IndexingAPI:
         filename = base_filename
         counter = 1
 
-        while os.path.exists(os.path.join(self.servers_dir, filename)):
+        while filename in reserved or os.path.exists(
+            os.path.join(self.servers_dir, filename)
+        ):
             filename = f"{clean_name}-server-{counter}.json"
             counter += 1
 
@@ -352,9 +813,13 @@ class IndexingAPI:
         return server_url
 
 
-def create_app(db_name: str = "chroma_mcpservers_db") -> FastAPI:
+def create_app(
+    db_name: str = "chroma_mcpservers_db",
+    servers_dir: str | None = None,
+    rebuild: bool = False,
+) -> FastAPI:
     """Create and return the FastAPI application"""
-    api = IndexingAPI(db_name=db_name)
+    api = IndexingAPI(db_name=db_name, servers_dir=servers_dir, rebuild=rebuild)
     return api.app
 
 
@@ -366,7 +831,12 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Run the OneMCP Indexing API")
     parser.add_argument("--port", type=int, default=8001, help="Port to run the API on")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild the index from the server files before serving",
+    )
 
     args = parser.parse_args()
-    app = create_app()
+    app = create_app(rebuild=args.rebuild)
     uvicorn.run(app, host="localhost", port=args.port)
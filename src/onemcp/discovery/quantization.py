@@ -0,0 +1,284 @@
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Supported quantization methods for tool embeddings.
+QUANTIZATION_METHODS = ("none", "int8", "pq")
+
+# Number of candidates re-ranked with full-precision vectors, per result.
+DEFAULT_RERANK_FACTOR = 4
+
+# Growth of an index, relative to the vectors its quantizer was trained on,
+# after which the quantizer is trained again.
+RETRAIN_GROWTH = 2.0
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row of `vectors` to unit L2 norm."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class Int8Quantizer:
+    """
+    Scalar quantizer storing each dimension as a signed byte.
+
+    Every dimension is mapped linearly from its observed [min, max] range onto
+    [-127, 127], which takes a quarter of the memory of float32 vectors.
+    """
+
+    def fit(self, vectors: np.ndarray) -> "Int8Quantizer":
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = ((high + low) / 2).astype(np.float32)
+        self.scale = np.maximum((high - low) / 254, 1e-12).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.asarray(np.clip(codes, -127, 127), dtype=np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner products between `query` and the encoded vectors."""
+        # <q, c * scale + offset> = <q * scale, c> + <q, offset>
+        return np.asarray(codes @ (query * self.scale) + float(query @ self.offset))
+
+
+class ProductQuantizer:
+    """
+    Product quantizer storing each vector as one byte per subspace.
+
+    Vectors are split into `num_subspaces` contiguous chunks, and each chunk is
+    replaced by the index of its nearest centroid, learned with k-means. If the
+    dimension of the vectors is not divisible by `num_subspaces`, the largest
+    number of subspaces below it that divides the dimension is used.
+    """
+
+    def __init__(
+        self, num_subspaces: int = 8, num_centroids: int = 256, iterations: int = 20
+    ) -> None:
+        if num_centroids > 256:
+            raise ValueError("Product quantization codes are limited to 256 values")
+        self.num_subspaces = num_subspaces
+        self.num_centroids = num_centroids
+        self.iterations = iterations
+
+    def fit(self, vectors: np.ndarray, seed: int = 0) -> "ProductQuantizer":
+        dimension = vectors.shape[1]
+        if dimension % self.num_subspaces != 0:
+            num_subspaces = max(
+                n for n in range(1, self.num_subspaces + 1) if dimension % n == 0
+            )
+            logger.warning(
+                f"Dimension {dimension} is not divisible by {self.num_subspaces}"
+                f" subspaces, using {num_subspaces} subspaces"
+            )
+            self.num_subspaces = num_subspaces
+        rng = np.random.default_rng(seed)
+        num_centroids = min(self.num_centroids, len(vectors))
+        self.codebooks = []
+        for sub in np.split(vectors, self.num_subspaces, axis=1):
+            centroids = sub[rng.choice(len(sub), num_centroids, replace=False)]
+            for _ in range(self.iterations):
+                assignment = self._nearest(sub, centroids)
+                for c in range(num_centroids):
+                    members = sub[assignment == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+            self.codebooks.append(centroids.astype(np.float32))
+        return self
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (
+            (vectors**2).sum(axis=1, keepdims=True)
+            - 2 * vectors @ centroids.T
+            + (centroids**2).sum(axis=1)
+        )
+        return np.asarray(distances.argmin(axis=1))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subspaces = np.split(vectors, self.num_subspaces, axis=1)
+        return np.stack(
+            [self._nearest(sub, cb) for sub, cb in zip(subspaces, self.codebooks)],
+            axis=1,
+        ).astype(np.uint8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner products using per-subspace lookup tables."""
+        tables = [
+            cb @ sub
+            for sub, cb in zip(np.split(query, self.num_subspaces), self.codebooks)
+        ]
+        return np.asarray(
+            np.sum([table[codes[:, i]] for i, table in enumerate(tables)], axis=0),
+            dtype=np.float32,
+        )
+
+
+class QuantizedIndex:
+    """
+    In-memory cosine-similarity index over quantized tool embeddings.
+
+    Only the compact codes are kept in memory, while the full-precision
+    vectors stay on disk (e.g. in the embedding cache). Searches score every
+    code, then re-rank the best candidates with full-precision vectors fetched
+    on demand through `fetch_vectors`, so that quantization errors do not
+    reorder the final results.
+
+    Vectors added after `build` are encoded with the codebooks learned then,
+    until the index grows `RETRAIN_GROWTH` times larger than the vectors they
+    were learned from, and `needs_training` asks for another `build`.
+    """
+
+    def __init__(
+        self,
+        method: str = "int8",
+        rerank_factor: int = DEFAULT_RERANK_FACTOR,
+        num_subspaces: int = 8,
+    ) -> None:
+        """
+        Initialize an empty index.
+
+        Args:
+            method: Quantization method ("int8" or "pq")
+            rerank_factor: Candidates re-ranked per requested result (0 disables
+                re-ranking)
+            num_subspaces: Number of subspaces used by product quantization
+        """
+        if method == "int8":
+            self.quantizer: Int8Quantizer | ProductQuantizer = Int8Quantizer()
+        elif method == "pq":
+            self.quantizer = ProductQuantizer(num_subspaces=num_subspaces)
+        else:
+            raise ValueError(f"Unsupported quantization method: {method}")
+        self.method = method
+        self.rerank_factor = rerank_factor
+        self.ids: list[str] = []
+        self.codes = np.empty((0, 0), dtype=np.int8)
+        self._positions: dict[str, int] = {}
+        # Number of vectors the quantizer was trained on, 0 if untrained.
+        self.trained_on = 0
+
+    def build(self, ids: list[str], vectors: np.ndarray) -> None:
+        """
+        Replace the contents of the index, training the quantizer on them.
+
+        Args:
+            ids: Identifier of each vector
+            vectors: Full-precision vectors, one row per identifier
+        """
+        self.ids = list(ids)
+        self._positions = {tool_id: i for i, tool_id in enumerate(self.ids)}
+        if not self.ids:
+            self.codes = np.empty((0, 0), dtype=np.int8)
+            self.trained_on = 0
+            return
+        normalized = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.quantizer.fit(normalized)
+        self.trained_on = len(self.ids)
+        self.codes = self.quantizer.encode(normalized)
+
+    def add(self, ids: list[str], vectors: np.ndarray) -> None:
+        """
+        Add vectors to the index, or replace those of existing identifiers.
+
+        The vectors are encoded with the current codebooks. An empty index is
+        built from them instead.
+
+        Args:
+            ids: Identifier of each vector
+            vectors: Full-precision vectors, one row per identifier
+        """
+        if not self.ids:
+            self.build(ids, vectors)
+            return
+        if not ids:
+            return
+        codes = self.quantizer.encode(_normalize(np.asarray(vectors, dtype=np.float32)))
+        new_rows = []
+        for row, tool_id in enumerate(ids):
+            position = self._positions.get(tool_id)
+            if position is None:
+                self._positions[tool_id] = len(self.ids)
+                self.ids.append(tool_id)
+                new_rows.append(row)
+            else:
+                self.codes[position] = codes[row]
+        if new_rows:
+            self.codes = np.concatenate([self.codes, codes[new_rows]])
+
+    def remove(self, ids: list[str]) -> None:
+        """Remove the vectors of `ids`, ignoring identifiers not in the index."""
+        dropped = [self._positions[i] for i in ids if i in self._positions]
+        if not dropped:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[dropped] = False
+        self.codes = self.codes[keep]
+        self.ids = [tool_id for tool_id, kept in zip(self.ids, keep) if kept]
+        self._positions = {tool_id: i for i, tool_id in enumerate(self.ids)}
+
+    @property
+    def needs_training(self) -> bool:
+        """Whether the index outgrew the vectors its quantizer was trained on."""
+        return len(self.ids) > self.trained_on * RETRAIN_GROWTH
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        fetch_vectors: Optional[Callable[[list[str]], np.ndarray]] = None,
+    ) -> list[tuple[str, float]]:
+        """
+        Find the `k` vectors most similar to `query`.
+
+        Args:
+            query: Query vector
+            k: Number of results
+            fetch_vectors: Returns the full-precision vectors of the given IDs,
+                used to re-rank candidates (None disables re-ranking)
+
+        Returns:
+            List of (id, cosine distance) pairs, closest first
+        """
+        if not self.ids:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        scores = self.quantizer.scores(self.codes, query)
+
+        rerank = fetch_vectors is not None and self.rerank_factor > 0
+        num_candidates = min(len(self.ids), k * self.rerank_factor if rerank else k)
+        candidates = np.argpartition(-scores, num_candidates - 1)[:num_candidates]
+
+        if rerank and fetch_vectors is not None:
+            exact = _normalize(fetch_vectors([self.ids[i] for i in candidates]))
+            scores[candidates] = exact @ query
+
+        best = candidates[np.argsort(-scores[candidates])][:k]
+        return [(self.ids[i], float(1.0 - scores[i])) for i in best]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the codes (and codebooks) of the index."""
+        extra = 0
+        if isinstance(self.quantizer, ProductQuantizer):
+            extra = sum(cb.nbytes for cb in getattr(self.quantizer, "codebooks", []))
+        return int(self.codes.nbytes) + extra
+
+
+def recall_at_k(exact: list[list[str]], approximate: list[list[str]], k: int) -> float:
+    """
+    Fraction of the exact top-k results that also appear in the approximate ones.
+
+    Args:
+        exact: Exact top-k IDs of each query
+        approximate: Approximate top-k IDs of each query
+        k: Number of results considered per query
+    """
+    hits = sum(len(set(e[:k]) & set(a[:k])) for e, a in zip(exact, approximate))
+    total = sum(min(k, len(e)) for e in exact)
+    return hits / total if total else 1.0
@@ -1,9 +1,10 @@
 from typing import Optional
 from urllib.parse import quote
 
-import mcp.types as types
 import requests
 
+from onemcp.serialization import dumps, loads
+
 from .registry_api import RegistryInterface, ServerEntry, ToolEntry
 
 
@@ -18,7 +19,7 @@ class Registry(RegistryInterface):
     def health_check(self) -> Optional[tuple[int, str]]:
         try:
             response = requests.get(f"{self.base_url}/health")
-            return response.status_code, response.json()
+            return response.status_code, loads(response.content)
         except requests.exceptions.ConnectionError:
             print("Could not connect to the server.")
             return None
@@ -27,19 +28,9 @@ class Registry(RegistryInterface):
         search_request = {"query": query, "k": k}
         try:
             response = requests.post(f"{self.base_url}/find_tools", json=search_request)
-            result = response.json()
-
-            tools = []
-            for _, tool in enumerate(result["tools"], 1):
-                entry = ToolEntry(
-                    tool_name=tool["tool_name"],
-                    tool_description=tool["tool_description"],
-                    server_name=tool["server_name"],
-                    server_url=tool["server_url"],
-                    distance=tool["distance"],
-                )
-                tools.append(entry)
-            return tools
+            result = loads(response.content)
+
+            return [ToolEntry.from_dict(tool) for tool in result["tools"]]
         except Exception as e:
             print(f"Error searching tools: {e}")
             return []
@@ -47,23 +38,9 @@ class Registry(RegistryInterface):
     def get_server(self, url: str) -> ServerEntry | None:
         try:
             response = requests.get(f"{self.base_url}/server/{quote(url, safe='')}")
-            result = response.json()
-
-            entry = ServerEntry(
-                name=result.get("name", ""),
-                url=result.get("repository_url", ""),
-                bootstrap_metadata=result.get("bootstrap_metadata", {}),
-            )
-            for tool in result.get("tools", []):
-                t = types.Tool(
-                    name=tool.get("name", ""),
-                    description=tool.get("description", ""),
-                    inputSchema=tool.get("inputSchema", {}),
-                    annotations=None,
-                )
-                entry.tools.append(t)
+            result = loads(response.content)
 
-            return entry
+            return ServerEntry.from_dict(result)
         except Exception as e:
             print(f"Error getting server: {e}")
             return None
@@ -71,17 +48,16 @@ class Registry(RegistryInterface):
     def list_servers(self) -> list[ServerEntry]:
         try:
             response = requests.get(f"{self.base_url}/servers")
-            result = response.json()
+            result = loads(response.content)
 
-            servers = []
-            for _, server in enumerate(result["servers"], 1):
-                entry = ServerEntry(
+            return [
+                ServerEntry(
                     name=server.get("filename", ""),
                     url=server.get("repository_url", ""),
                     bootstrap_metadata=server.get("bootstrap_metadata", {}),
                 )
-                servers.append(entry)
-            return servers
+                for server in result["servers"]
+            ]
         except Exception as e:
             print(f"Error listing servers: {e}")
             return []
@@ -89,9 +65,11 @@ class Registry(RegistryInterface):
     def register_server(self, server_data: ServerEntry) -> Optional[tuple[int, str]]:
         try:
             response = requests.post(
-                f"{self.base_url}/register_server", json=server_data
+                f"{self.base_url}/register_server",
+                data=dumps(server_data.to_dict()),
+                headers={"Content-Type": "application/json"},
             )
-            return response.status_code, response.json()
+            return response.status_code, loads(response.content)
         except Exception as e:
             print(f"Error registering server: {e}")
             return None
@@ -102,7 +80,10 @@ class Registry(RegistryInterface):
                 f"{self.base_url}/unregister_server",
                 json={"codebase_url": codebase_url},
             )
-            return {"status_code": response.status_code, "response": response.json()}
+            return {
+                "status_code": response.status_code,
+                "response": loads(response.content),
+            }
         except Exception as e:
             print(f"Error unregistering server: {e}")
             return None
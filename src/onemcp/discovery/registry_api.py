@@ -1,41 +1,71 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Optional
 
 import mcp.types as types
 
 
+@dataclass(frozen=True, slots=True)
 class ServerEntry:
-    __slots__ = ("name", "url", "bootstrap_metadata", "tools")
+    name: str
+    url: str
+    bootstrap_metadata: Mapping[str, str]
+    tools: tuple[types.Tool, ...] = ()
+    description: str = ""
 
-    def __init__(self, name: str, url: str, bootstrap_metadata: dict[str, str]):
-        self.name = name
-        self.url = url
-        self.bootstrap_metadata = bootstrap_metadata
-        self.tools: list[types.Tool] = []
+    @classmethod
+    def from_dict(cls, server: Mapping[str, Any]) -> "ServerEntry":
+        """Build an entry from a server record of the indexing API."""
+        return cls(
+            name=server.get("name", ""),
+            url=server.get("repository_url", ""),
+            bootstrap_metadata=server.get("bootstrap_metadata", {}),
+            tools=tuple(
+                types.Tool(
+                    name=tool.get("name", ""),
+                    description=tool.get("description", ""),
+                    inputSchema=tool.get("inputSchema", {}),
+                    annotations=None,
+                )
+                for tool in server.get("tools", [])
+            ),
+            description=server.get("description", ""),
+        )
 
+    def to_dict(self) -> dict[str, Any]:
+        """Return the server record of the entry, as registered."""
+        return {
+            "name": self.name,
+            "repository_url": self.url,
+            "description": self.description,
+            "bootstrap_metadata": dict(self.bootstrap_metadata),
+            # The indexing API requires a description of every tool.
+            "tools": [
+                {"description": "", **tool.model_dump(exclude_none=True)}
+                for tool in self.tools
+            ],
+        }
 
+
+@dataclass(frozen=True, slots=True)
 class ToolEntry:
-    __slots__ = (
-        "tool_name",
-        "tool_description",
-        "server_name",
-        "server_url",
-        "distance",
-    )
-
-    def __init__(
-        self,
-        tool_name: str,
-        tool_description: str,
-        server_name: str,
-        server_url: str,
-        distance: float,
-    ):
-        self.tool_name = tool_name
-        self.tool_description = tool_description
-        self.server_name = server_name
-        self.server_url = server_url
-        self.distance = distance
+    tool_name: str
+    tool_description: str
+    server_name: str
+    server_url: str
+    distance: float
+
+    @classmethod
+    def from_dict(cls, tool: Mapping[str, Any]) -> "ToolEntry":
+        """Build an entry from a search result of the indexing API."""
+        return cls(
+            tool_name=tool["tool_name"],
+            tool_description=tool["tool_description"],
+            server_name=tool["server_name"],
+            server_url=tool["server_url"],
+            distance=tool["distance"],
+        )
 
 
 class RegistryInterface(ABC):
@@ -0,0 +1,77 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Immutable JSON-RPC messages exchanged with MCP servers.
+
+Messages wrap the decoded JSON they are built from without copying it, and
+are never modified in place: changing a field returns a new message, so the
+body received from a caller is never altered on its way to the server.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from typing import Any, Optional, Union
+
+JSONRPC_VERSION = "2.0"
+
+RequestId = Union[int, str]
+
+
+@dataclass(frozen=True, slots=True)
+class Request:
+    """A JSON-RPC request, or a notification if it has no id."""
+
+    method: str
+    params: Mapping[str, Any] = field(default_factory=dict)
+    id: Optional[RequestId] = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Request":
+        """Build a request from its JSON object, ignoring unknown fields."""
+        return cls(
+            method=data["method"], params=data.get("params") or {}, id=data.get("id")
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        message: dict[str, Any] = {"jsonrpc": JSONRPC_VERSION}
+        if self.id is not None:
+            message["id"] = self.id
+        message["method"] = self.method
+        if self.params or self.id is not None:
+            message["params"] = self.params
+        return message
+
+    def with_id(self, request_id: Optional[RequestId]) -> "Request":
+        return replace(self, id=request_id)
+
+    def with_meta(self, **meta: Any) -> "Request":
+        """Return the request with `meta` added to the `_meta` of its params."""
+        params = dict(self.params)
+        params["_meta"] = {**params.get("_meta", {}), **meta}
+        return replace(self, params=params)
+
+
+@dataclass(frozen=True, slots=True)
+class Response:
+    """A JSON-RPC response, holding either a result or an error."""
+
+    id: Optional[RequestId]
+    result: Optional[Mapping[str, Any]] = None
+    error: Optional[Mapping[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Response":
+        return cls(
+            id=data.get("id"), result=data.get("result"), error=data.get("error")
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        message: dict[str, Any] = {"jsonrpc": JSONRPC_VERSION, "id": self.id}
+        if self.error is not None:
+            message["error"] = self.error
+        else:
+            message["result"] = self.result if self.result is not None else {}
+        return message
+
+    def with_id(self, request_id: Optional[RequestId]) -> "Response":
+        return replace(self, id=request_id)
@@ -1,8 +1,11 @@
+import asyncio
 import json
 import logging
+import os
 import pathlib
 import re
 import sys
+import time
 from collections.abc import Sequence
 from itertools import chain
 from typing import Any
@@ -25,22 +28,52 @@ from pydantic import BaseModel, Field
 sys.path.append(str(pathlib.Path(__file__).parent.parent.parent))
 
 from onemcp import Registry, ToolEntry
+from onemcp.messages import Response
 from onemcp.sandbox.api import SandboxAPI
 
 # from qdrant_client import QdrantClient, models
 # from sentence_transformers import SentenceTransformer
 
 
+# Seconds a tool call may take before it is cancelled in the sandbox.
+TOOL_CALL_TIMEOUT = float(os.getenv("ONEMCP_TOOL_CALL_TIMEOUT", "60"))
+
+
 class MockSandbox:
     """A mock sandbox for testing purposes."""
 
-    async def call_tool(self, sandbox_id: str, name: str, args: dict[str, Any]) -> Any:
+    async def call_tool(
+        self,
+        sandbox_id: str,
+        name: str,
+        args: dict[str, Any],
+        ctx: Context | None = None,
+    ) -> Any:
         print(
             f"Mock call to tool: {name} with args: {args} and sandbox_id: {sandbox_id}"
         )
         api = SandboxAPI()
+        deadline = time.time() + TOOL_CALL_TIMEOUT
+
+        if ctx is None:
+            return api.call_tool(
+                sandbox_id=sandbox_id, tool_name=name, arguments=args, deadline=deadline
+            )
 
-        response = api.call_tool(sandbox_id=sandbox_id, tool_name=name, arguments=args)
+        # Stream the call, forwarding the progress of the tool to the client.
+        events = api.call_tool_stream(
+            sandbox_id=sandbox_id, tool_name=name, arguments=args, deadline=deadline
+        )
+        response = None
+        while (event := await asyncio.to_thread(next, events, None)) is not None:
+            if event.get("type") == "progress":
+                await ctx.report_progress(
+                    progress=event.get("progress", 0),
+                    total=event.get("total"),
+                    message=event.get("message"),
+                )
+            else:
+                response = {k: v for k, v in event.items() if k != "type"}
 
         return response
 
@@ -277,7 +310,7 @@ async def suggest(prompt: str, files: list[str], ctx: Context) -> list[str]:
             any_installed = True
             # output_array.append(base.AssistantMessage(content="Installing server: " + url))
             sandbox_id = await sandbox.run_server(registry_server.bootstrap_metadata)
-            local_state.add_server(sandbox_id, url, registry_server.tools)
+            local_state.add_server(sandbox_id, url, list(registry_server.tools))
 
             await ctx.report_progress(
                 progress=i + 1,
@@ -312,7 +345,7 @@ async def sandbox_call(name: str, args: dict[str, Any], ctx: Context) -> Any:
 
     if tool:
         sandbox = MockSandbox()
-        return await sandbox.call_tool(tool[0], name, args)
+        return await sandbox.call_tool(tool[0], name, args, ctx)
 
     return [
         "This is a mock response from the sandbox MCP proxy for tool: "
@@ -322,6 +355,36 @@ async def sandbox_call(name: str, args: dict[str, Any], ctx: Context) -> Any:
     ]
 
 
+# Content types of tool results, by their "type" field.
+_CONTENT_TYPES: dict[str, type[TextContent | ImageContent | EmbeddedResource]] = {
+    "text": TextContent,
+    "image": ImageContent,
+    "resource": EmbeddedResource,
+}
+
+
+def _sandbox_result_content(
+    result: Any,
+) -> Sequence[TextContent | ImageContent | EmbeddedResource] | None:
+    """Return the content of a tool call answered by the sandbox as is.
+
+    Text, images and embedded resources are passed on to the client without
+    re-encoding them, so base64 payloads are not copied into a JSON string.
+    Returns None if the result is not a tool call response of the sandbox, or
+    has content of another type.
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("response"), dict):
+        return None
+    response = Response.from_dict(result["response"])
+    content = (response.result or {}).get("content")
+    if not isinstance(content, list) or not all(
+        isinstance(item, dict) and item.get("type") in _CONTENT_TYPES
+        for item in content
+    ):
+        return None
+    return [_CONTENT_TYPES[item["type"]].model_validate(item) for item in content]
+
+
 def _convert_to_content(
     result: Any,
 ) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
@@ -338,8 +401,12 @@ def _convert_to_content(
     if isinstance(result, list | tuple):
         return list(chain.from_iterable(_convert_to_content(item) for item in result))
 
+    content = _sandbox_result_content(result)
+    if content is not None:
+        return content
+
     if not isinstance(result, str):
-        result = pydantic_core.to_json(result, fallback=str, indent=2).decode()
+        result = pydantic_core.to_json(result, fallback=str).decode()
 
     return [TextContent(type="text", text=result)]
 
@@ -3,11 +3,14 @@ from __future__ import annotations
 import json
 import pathlib
 import re
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 from typing import Any
 
 import requests
 
+from onemcp.serialization import dumps, loads
+
 BASE_URL: str = "https://klqnxwmj-8001.usw2.devtunnels.ms"
 
 
@@ -23,9 +26,11 @@ class ServerRegistry:
     Methods:
         - health()
         - register_server(...)
+        - register_servers(servers, replace=False)
         - find_tools(query, k=3)
         - list_servers()
         - unregister_server(codebase_url)
+        - unregister_servers(codebase_urls)
         - server_exists(codebase_url)
     """
 
@@ -43,7 +48,7 @@ class ServerRegistry:
 
     def _parse_json(self, resp: requests.Response) -> Any:
         try:
-            return resp.json()
+            return loads(resp.content)
         except ValueError as e:
             raise ServerRegistryError(
                 f"Expected JSON from {resp.request.method} {resp.request.url}, "
@@ -64,9 +69,11 @@ class ServerRegistry:
             f"HTTP {resp.status_code} for {resp.request.method} {resp.request.url}\n{detail}"
         )
 
-    def _get_json(self, path: str) -> Any:
+    def _get_json(self, path: str, *, params: dict[str, Any] | None = None) -> Any:
         try:
-            resp = self._session.get(self._url(path), timeout=self.timeout)
+            resp = self._session.get(
+                self._url(path), params=params, timeout=self.timeout
+            )
         except requests.RequestException as e:
             raise ServerRegistryError(f"GET {path} failed: {e}") from e
         self._check_status(resp)
@@ -80,6 +87,27 @@ class ServerRegistry:
         self._check_status(resp)
         return self._parse_json(resp)
 
+    def _post_ndjson(
+        self,
+        path: str,
+        *,
+        records: Iterable[Any],
+        params: dict[str, Any] | None = None,
+    ) -> Any:
+        body = b"".join(dumps(record) + b"\n" for record in records)
+        try:
+            resp = self._session.post(
+                self._url(path),
+                data=body,
+                params=params,
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise ServerRegistryError(f"POST {path} failed: {e}") from e
+        self._check_status(resp)
+        return self._parse_json(resp)
+
     def _delete_json(self, path: str, *, json: dict[str, Any]) -> Any:
         try:
             resp = self._session.delete(
@@ -123,25 +151,84 @@ class ServerRegistry:
         }
         return self._post_json("/register_server", json=payload)
 
+    def register_servers(
+        self,
+        servers: Iterable[dict[str, Any]],
+        atomic: bool = False,
+        replace: bool = False,
+    ) -> Any:
+        """
+        POST /register_servers with one server record per line.
+
+        If `atomic`, nothing is registered when any record is invalid. If
+        `replace`, every registered server not in `servers` is unregistered.
+        """
+        params = {"atomic": str(atomic).lower(), "replace": str(replace).lower()}
+        return self._post_ndjson("/register_servers", records=servers, params=params)
+
     def find_tools(self, query: str, k: int = 3) -> Any:
         """POST /find_tools -> dict(result); payload: {"query": str, "k": int}"""
         payload = {"query": query, "k": k}
         return self._post_json("/find_tools", json=payload)
 
-    def list_servers(self) -> Any:
-        """GET /servers -> dict(result)"""
-        return self._get_json("/servers")
+    def list_servers(
+        self,
+        fields: list[str] | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> Any:
+        """
+        GET /servers -> dict(result)
+
+        Optionally returns only `fields` of each server, and at most `limit`
+        servers starting after `cursor` (the next_cursor of the previous page).
+        """
+        params: dict[str, Any] = {}
+        if fields:
+            params["fields"] = ",".join(fields)
+        if limit is not None:
+            params["limit"] = limit
+        if cursor:
+            params["cursor"] = cursor
+        return self._get_json("/servers", params=params)
+
+    def iter_servers(
+        self, fields: list[str] | None = None, page_size: int = 500
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate over all registered servers, fetching them page by page."""
+        cursor: str | None = None
+        while True:
+            page = self.list_servers(fields=fields, limit=page_size, cursor=cursor)
+            yield from page.get("servers", [])
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
 
     def unregister_server(self, codebase_url: str) -> Any:
         """DELETE /unregister_server with {"codebase_url": "..."}"""
         payload = {"repository_url": codebase_url}
         return self._delete_json("/unregister_server", json=payload)
 
+    def unregister_servers(self, codebase_urls: Iterable[str]) -> Any:
+        """POST /unregister_servers with one {"repository_url": ...} per line."""
+        records = ({"repository_url": url} for url in codebase_urls)
+        return self._post_ndjson("/unregister_servers", records=records)
+
     def server_exists(self, repository_url: str) -> bool:
-        """Convenience helper that checks whether a server is currently registered."""
-        data = self.list_servers()
-        servers = data.get("servers", [])
-        return any(s.get("repository_url") == repository_url for s in servers)
+        """HEAD /server_exists -> whether a server is currently registered."""
+        path = "/server_exists"
+        try:
+            resp = self._session.head(
+                self._url(path),
+                params={"repository_url": repository_url},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise ServerRegistryError(f"HEAD {path} failed: {e}") from e
+        if resp.status_code == 404:
+            return False
+        self._check_status(resp)
+        return True
 
 
 # add main function for testing purposes
@@ -170,13 +257,6 @@ if __name__ == "__main__":
     # with open(prompt_path, encoding="utf-8") as f:
     #     server_data = json.load(f)
 
-    server_list = registry.list_servers()
-
-    # remove all for testing purposes
-    for server in server_list["servers"]:
-        print(f"Unregistering server: {server['repository_url']}")
-        registry.unregister_server(server["repository_url"])
-
     # server_data is a json array, want to register each server
     for server in server_data:
         server["name"] = server.get(
@@ -186,5 +266,12 @@ if __name__ == "__main__":
             "description", server["bootstrap_metadata"]["repository_url"]
         )
         server["repository_url"] = server["bootstrap_metadata"]["repository_url"]
-        print(f"Registering server: {server['repository_url']}")
-        registry._post_json("/register_server", json=server)
+
+    # Replace the whole catalog in a single request, removing any server that
+    # is no longer in the file.
+    print(f"Registering {len(server_data)} servers")
+    result = registry.register_servers(server_data, replace=True)
+    print(f"Registration summary: {result['counts']}")
+    for item in result["results"]:
+        if item["status"] == "error":
+            print(f"Failed to register record {item['index']}: {item['error']}")
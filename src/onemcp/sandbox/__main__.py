@@ -3,16 +3,35 @@
 
 """HTTP API wrapper for the Docker Sandbox implementation."""
 
+import asyncio
+import contextlib
 import json
 import logging
-from collections.abc import AsyncIterator
+import os
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import Any, Optional, TypeVar
 
 import uvicorn
 from fastapi import FastAPI, Header, HTTPException, Request
-
+from fastapi.responses import Response, StreamingResponse
+
+from src.onemcp import messages
+from src.onemcp.sandbox.admission import (
+    MAX_CONCURRENT_STARTS,
+    START_LANE,
+    AdmissionController,
+    Overloaded,
+    Ticket,
+)
 from src.onemcp.sandbox.docker.registry import DockerSandboxRegistry
+from src.onemcp.sandbox.store import (
+    PERSIST_SANDBOXES,
+    SANDBOX_STORE_PATH,
+    SandboxStore,
+)
+from src.onemcp.serialization import FastJSONResponse, dumps, loads
 
 # Configure logging
 logging.basicConfig(
@@ -22,10 +41,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="OneMCP Sandbox API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Application lifespan context manager for setup and teardown."""
+    # Reattach to the sandboxes left running by the previous run.
+    await sandbox.reattach()
+    yield
+    # Clean up resources on shutdown, keeping the sandboxes that persist.
+    logger.info("Shutting down sandbox API, cleaning up instances...")
+    await sandbox.shutdown()
+
+
+app = FastAPI(
+    title="OneMCP Sandbox API",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+
+# First host port mapped to sandboxes, distinct for each sandbox API running on
+# the same machine.
+SANDBOX_BASE_PORT = int(os.getenv("ONEMCP_SANDBOX_BASE_PORT", "9000"))
 
 # Global sandbox instance
-sandbox = DockerSandboxRegistry()
+sandbox = DockerSandboxRegistry(
+    base_port=SANDBOX_BASE_PORT,
+    store=SandboxStore(SANDBOX_STORE_PATH) if PERSIST_SANDBOXES else None,
+)
+
+# Limits the START and CALL_TOOL requests running at once.
+admission = AdmissionController()
 
 
 class SandboxAPI:
@@ -35,39 +81,166 @@ class SandboxAPI:
         self.sandbox = sandbox_instance
 
 
-@app.post("/sandbox")
+# Media type of streamed CALL_TOOL responses, one JSON event per line.
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Header identifying the caller of a request, for fairness between callers.
+CALLER_HEADER = "X-OneMCP-Caller"
+
+# Header with the deadline of a request, in seconds since the epoch.
+DEADLINE_HEADER = "X-OneMCP-Deadline"
+
+# Status of the responses to requests whose client disconnected.
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+
+def _deadline(request: Request) -> Optional[float]:
+    """
+    Return the deadline of `request` on the time.monotonic clock, if any.
+
+    Raises:
+        ValueError: If the deadline header is not a number.
+    """
+    value = request.headers.get(DEADLINE_HEADER)
+    if value is None:
+        return None
+    return time.monotonic() + float(value) - time.time()
+
+
+async def _disconnected(request: Request) -> None:
+    """Return once the client of `request` disconnected."""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _cancel_on_disconnect(
+    request: Request, handler: Awaitable[T]
+) -> T | Response:
+    """Await `handler`, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(handler)
+    watcher = asyncio.ensure_future(_disconnected(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if not task.done():
+        logger.info("Client disconnected, cancelling its request")
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    return task.result()
+
+
+def _caller(request: Request) -> str:
+    """Return the identity of the caller of `request`."""
+    caller = request.headers.get(CALLER_HEADER)
+    if caller:
+        return caller
+    return request.client.host if request.client is not None else ""
+
+
+async def _release_after(
+    iterator: AsyncIterable[Any], ticket: Ticket
+) -> AsyncIterator[Any]:
+    """Iterate over a streamed response, then release its admission ticket."""
+    try:
+        async for chunk in iterator:
+            yield chunk
+    finally:
+        admission.release(ticket)
+
+
+@app.post("/sandbox", response_model=None)
 async def sandbox_endpoint(
     request: Request,
     x_onemcp_message_type: str = Header(..., alias="X-OneMCP-Message-Type"),
-) -> dict[str, Any]:
+) -> dict[str, Any] | Response:
     """Main sandbox endpoint that handles all operations based on message type.
 
     Supported message types:
     - DISCOVER: Discover MCP server capabilities
     - START: Start a sandbox instance
     - GET_TOOLS: Get the tools offered by a running sandbox
-    - CALL_TOOL: Call a specific tool offered by a sandbox
+    - CALL_TOOL: Call a specific tool offered by a sandbox, streaming its
+      progress as NDJSON if the request accepts application/x-ndjson
     - STOP: Stop a sandbox instance
+    - GET_STATUS: Get the health of one sandbox, or of all of them
+
+    START and CALL_TOOL requests over the concurrency limits are queued, and
+    answered with 429 (sandbox saturated) or 503 (API saturated) and a
+    Retry-After header when the queues are full or the wait is too long.
+
+    CALL_TOOL requests may carry a deadline in the X-OneMCP-Deadline header
+    (seconds since the epoch), covering the time spent queued. Calls whose
+    deadline passes or whose client disconnects are cancelled in the MCP
+    server.
     """
     try:
-        body = await request.json()
+        body = loads(await request.body())
+        try:
+            deadline = _deadline(request)
+        except ValueError:
+            return {
+                "response_code": "400",
+                "error_description": f"Invalid {DEADLINE_HEADER} header",
+            }
 
         if x_onemcp_message_type == "DISCOVER":
             return await handle_discover(body)
         elif x_onemcp_message_type == "START":
-            return await handle_start(body)
+            async with admission.slot(
+                START_LANE, _caller(request), limit=MAX_CONCURRENT_STARTS
+            ):
+                return await handle_start(body)
         elif x_onemcp_message_type == "GET_TOOLS":
             return await handle_get_tools(body)
         elif x_onemcp_message_type == "CALL_TOOL":
-            return await handle_call_tool(body)
+            # Sessions of a shared sandbox queue for the same container.
+            sandbox_id = str(body.get("sandbox_id"))
+            lane = sandbox.sessions.get(sandbox_id, sandbox_id)
+            if NDJSON_MEDIA_TYPE not in request.headers.get("Accept", ""):
+                async with admission.slot(lane, _caller(request), deadline=deadline):
+                    return await _cancel_on_disconnect(
+                        request, handle_call_tool(body, deadline)
+                    )
+
+            # The slot is held until the response is fully streamed, and the
+            # stream is cancelled if the client disconnects.
+            ticket = await admission.acquire(lane, _caller(request), deadline=deadline)
+            try:
+                response = await handle_call_tool_stream(body, deadline)
+            except BaseException:
+                admission.release(ticket)
+                raise
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = _release_after(response.body_iterator, ticket)
+            else:
+                admission.release(ticket)
+            return response
         elif x_onemcp_message_type == "STOP":
             return await handle_stop(body)
+        elif x_onemcp_message_type == "GET_STATUS":
+            return await handle_get_status(body)
         else:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unsupported message type: {x_onemcp_message_type}",
             )
 
+    except Overloaded as e:
+        logger.warning(f"Rejected {x_onemcp_message_type} request: {e}")
+        return FastJSONResponse(
+            {"response_code": str(e.status), "error_description": str(e)},
+            status_code=e.status,
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except json.JSONDecodeError as e:
         raise HTTPException(
             status_code=400, detail="Invalid JSON in request body"
@@ -80,6 +253,14 @@ async def sandbox_endpoint(
 async def handle_discover(body: dict[str, Any]) -> dict[str, Any]:
     """Handle DISCOVER message type.
 
+    Expected payload:
+    {
+        "repository_url": "...",
+        "repository_readme": "...",
+        "setup_script": "...",  (optional, skips generating a new one)
+        "revision": "..."  (optional, commit SHA of the repository)
+    }
+
     JSON payload on success:
     {
         "tools": "<JSON Object>",
@@ -106,7 +287,12 @@ async def handle_discover(body: dict[str, Any]) -> dict[str, Any]:
 
     repository_url = body["repository_url"]
     repository_readme = body["repository_readme"]
-    result = await sandbox.discover(repository_url, repository_readme)
+    result = await sandbox.discover(
+        repository_url,
+        repository_readme,
+        setup_script=body.get("setup_script"),
+        revision=body.get("revision"),
+    )
 
     return result
 
@@ -151,7 +337,9 @@ async def handle_get_tools(body: dict[str, Any]) -> dict[str, Any]:
     return result
 
 
-async def handle_call_tool(body: dict[str, Any]) -> dict[str, Any]:
+async def handle_call_tool(
+    body: dict[str, Any], deadline: Optional[float] = None
+) -> dict[str, Any] | Response:
     """Handle CALL_TOOL message type.
 
     The expected payload is the same payload of the tools/call request of the
@@ -173,11 +361,42 @@ async def handle_call_tool(body: dict[str, Any]) -> dict[str, Any]:
             "error_description": "Missing required field: sandbox_id",
         }
 
+    result = await sandbox.call_tool_raw(
+        body["sandbox_id"], messages.Request.from_dict(body), deadline
+    )
+    if isinstance(result, dict):
+        return result
+
+    # Forward the response of the server as is, without decoding it.
+    return Response(
+        content=b'{"response":' + result + b"}", media_type="application/json"
+    )
+
+
+async def handle_call_tool_stream(
+    body: dict[str, Any], deadline: Optional[float] = None
+) -> dict[str, Any] | StreamingResponse:
+    """Handle CALL_TOOL message type, streaming progress as NDJSON.
+
+    The payload is the same as for handle_call_tool. Each line of the response
+    is a JSON event: {"type": "progress", "progress": ..., "total": ...,
+    "message": ...} for each progress notification of the tool, then
+    {"type": "response", ...} with the fields of a non-streamed response.
+    """
+    if "sandbox_id" not in body:
+        return {
+            "response_code": "400",
+            "error_description": "Missing required field: sandbox_id",
+        }
+
     sandbox_id = body["sandbox_id"]
-    del body["sandbox_id"]
-    result = await sandbox.call_tool(sandbox_id, body)
+    request = messages.Request.from_dict(body)
 
-    return result
+    async def events() -> AsyncIterator[bytes]:
+        async for event in sandbox.call_tool_stream(sandbox_id, request, deadline):
+            yield dumps(event) + b"\n"
+
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE)
 
 
 async def handle_stop(body: dict[str, Any]) -> dict[str, Any]:
@@ -200,22 +419,25 @@ async def handle_stop(body: dict[str, Any]) -> dict[str, Any]:
     return result
 
 
+async def handle_get_status(body: dict[str, Any]) -> dict[str, Any]:
+    """Handle GET_STATUS message type.
+
+    Expected payload, without sandbox_id for the status of all sandboxes:
+    {
+        "sandbox_id": "..."
+    }
+    """
+    result = await sandbox.get_status(body.get("sandbox_id"))
+
+    return result
+
+
 @app.get("/health")
 async def health_check() -> dict[str, str]:
     """Health check endpoint."""
     return {"status": "healthy", "service": "OneMCP Sandbox API"}
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    """Application lifespan context manager for setup and teardown."""
-    # Nothing to do on startup for now
-    yield
-    # Clean up resources on shutdown
-    logger.info("Shutting down sandbox API, cleaning up instances...")
-    await sandbox.cleanup_all()
-
-
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
     return app
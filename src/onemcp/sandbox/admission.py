@@ -0,0 +1,299 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Admission control for the requests of the sandbox API.
+
+Requests run in lanes, one per sandbox (plus one for starting sandboxes), each
+with a limit of concurrent requests, under a global limit for the whole API.
+Requests over the limits wait in bounded queues and are admitted round-robin
+across lanes and, within a lane, across callers, so one busy caller cannot
+starve the others. A request that cannot be admitted before its deadline is
+rejected right away rather than left to time out in the queue.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Maximum number of requests running at once, across all sandboxes.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("ONEMCP_MAX_CONCURRENT_REQUESTS", "64"))
+
+# Maximum number of requests waiting, across all sandboxes.
+MAX_QUEUED_REQUESTS = int(os.getenv("ONEMCP_MAX_QUEUED_REQUESTS", "256"))
+
+# Maximum number of requests running at once on one sandbox.
+MAX_REQUESTS_PER_SANDBOX = int(os.getenv("ONEMCP_MAX_REQUESTS_PER_SANDBOX", "8"))
+
+# Maximum number of requests waiting for one sandbox.
+MAX_QUEUED_PER_SANDBOX = int(os.getenv("ONEMCP_MAX_QUEUED_PER_SANDBOX", "32"))
+
+# Maximum number of sandboxes starting at once.
+MAX_CONCURRENT_STARTS = int(os.getenv("ONEMCP_MAX_CONCURRENT_STARTS", "4"))
+
+# Maximum time in seconds a request waits to be admitted.
+QUEUE_TIMEOUT = float(os.getenv("ONEMCP_QUEUE_TIMEOUT", "30"))
+
+# Lane of START requests.
+START_LANE = "START"
+
+# Assumed duration of a request, until some requests of the lane completed.
+DEFAULT_SERVICE_TIME: float = 1.0
+
+# Weight of the last request in the average duration of requests of a lane.
+SERVICE_TIME_WEIGHT: float = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, status: int, message: str, retry_after: float) -> None:
+        """
+        Args:
+            status: HTTP status of the rejection, 429 if the sandbox is
+                saturated and 503 if the whole API is
+            message: Description of the rejection
+            retry_after: Seconds after which the request may be retried
+        """
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+@dataclass
+class Ticket:
+    """An admitted request, to be released once it completes."""
+
+    lane: str
+    admitted_at: float
+    # Deadline of the request (time.monotonic), if it has one. Time spent
+    # waiting in the queue counts against it.
+    deadline: Optional[float] = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline of the request, if it has one."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+
+@dataclass
+class _Waiter:
+    caller: str
+    future: "asyncio.Future[None]"
+
+
+@dataclass
+class _Lane:
+    limit: int
+    active: int = 0
+    queued: int = 0
+    # Waiting requests, by caller, and the order callers are served in.
+    waiters: dict[str, deque[_Waiter]] = field(default_factory=dict)
+    callers: deque[str] = field(default_factory=deque)
+    service_time: float = DEFAULT_SERVICE_TIME
+
+    def push(self, waiter: _Waiter) -> None:
+        if waiter.caller not in self.waiters:
+            self.waiters[waiter.caller] = deque()
+            self.callers.append(waiter.caller)
+        self.waiters[waiter.caller].append(waiter)
+        self.queued += 1
+
+    def pop(self) -> _Waiter:
+        """Remove the next waiter, taking callers in turn."""
+        caller = self.callers.popleft()
+        waiters = self.waiters[caller]
+        waiter = waiters.popleft()
+        if waiters:
+            self.callers.append(caller)
+        else:
+            del self.waiters[caller]
+        self.queued -= 1
+        return waiter
+
+    def remove(self, waiter: _Waiter) -> bool:
+        """Remove a waiter, returning whether it was still queued."""
+        waiters = self.waiters.get(waiter.caller)
+        if waiters is None or waiter not in waiters:
+            return False
+        waiters.remove(waiter)
+        if not waiters:
+            del self.waiters[waiter.caller]
+            self.callers.remove(waiter.caller)
+        self.queued -= 1
+        return True
+
+    def wait_estimate(self, position: int) -> float:
+        """Estimated seconds before the waiter at `position` is admitted."""
+        return self.service_time * position / max(self.limit, 1)
+
+
+class AdmissionController:
+    """Limits the concurrent requests per lane and overall, queueing the rest."""
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        max_queued: int = MAX_QUEUED_REQUESTS,
+        per_sandbox: int = MAX_REQUESTS_PER_SANDBOX,
+        per_sandbox_queued: int = MAX_QUEUED_PER_SANDBOX,
+        queue_timeout: float = QUEUE_TIMEOUT,
+    ) -> None:
+        """
+        Args:
+            max_concurrent: Maximum number of requests running at once
+            max_queued: Maximum number of requests waiting
+            per_sandbox: Default maximum number of requests running at once
+                in a lane
+            per_sandbox_queued: Maximum number of requests waiting in a lane
+            queue_timeout: Maximum time in seconds a request waits
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.per_sandbox = per_sandbox
+        self.per_sandbox_queued = per_sandbox_queued
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._lanes: dict[str, _Lane] = {}
+        # Lanes in the order they are served in.
+        self._order: deque[str] = deque()
+
+    async def acquire(
+        self,
+        lane: str,
+        caller: str,
+        limit: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> Ticket:
+        """
+        Wait until a request may run.
+
+        Args:
+            lane: Lane of the request, e.g. the sandbox it runs on
+            caller: Identity of the caller, for fairness between callers
+            limit: Maximum number of requests running at once in the lane,
+                if the lane does not exist yet (default: per_sandbox)
+            deadline: Deadline of the request (time.monotonic)
+
+        Returns:
+            The ticket of the request, to pass to `release`
+
+        Raises:
+            Overloaded: If the queues are full, or the request cannot be
+                admitted before its deadline or the queue timeout
+        """
+        now = time.monotonic()
+        state = self._lanes.get(lane)
+        if state is None:
+            state = self._lanes[lane] = _Lane(
+                limit if limit is not None else self.per_sandbox
+            )
+            self._order.append(lane)
+
+        if state.active < state.limit and self.active < self.max_concurrent:
+            self._admit(state)
+            return Ticket(lane, now, deadline)
+
+        wait_until = now + self.queue_timeout
+        if deadline is not None:
+            wait_until = min(wait_until, deadline)
+        estimate = state.wait_estimate(state.queued + 1)
+        if state.queued >= self.per_sandbox_queued:
+            self._drop_if_idle(lane)
+            raise Overloaded(429, f"Too many requests queued for {lane}", estimate)
+        if self.queued >= self.max_queued:
+            self._drop_if_idle(lane)
+            raise Overloaded(503, "Too many requests queued", estimate)
+        if now + estimate > wait_until:
+            self._drop_if_idle(lane)
+            raise Overloaded(
+                503, f"Request to {lane} would not be admitted in time", estimate
+            )
+
+        waiter = _Waiter(caller, asyncio.get_running_loop().create_future())
+        state.push(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(waiter.future, wait_until - now)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted, but the caller went away meanwhile.
+                self._free(lane)
+            else:
+                if state.remove(waiter):
+                    self.queued -= 1
+                self._drop_if_idle(lane)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded(
+                    503,
+                    f"Timed out waiting to be admitted to {lane}",
+                    state.wait_estimate(state.queued + 1),
+                ) from None
+            raise
+        return Ticket(lane, time.monotonic(), deadline)
+
+    def release(self, ticket: Ticket) -> None:
+        """Release the slot of a completed request, admitting the next ones."""
+        state = self._lanes[ticket.lane]
+        elapsed = time.monotonic() - ticket.admitted_at
+        state.service_time += SERVICE_TIME_WEIGHT * (elapsed - state.service_time)
+        self._free(ticket.lane)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        lane: str,
+        caller: str,
+        limit: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Ticket]:
+        """Hold a slot of `lane` for the duration of the context."""
+        ticket = await self.acquire(lane, caller, limit, deadline)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _admit(self, state: _Lane) -> None:
+        state.active += 1
+        self.active += 1
+
+    def _free(self, lane: str) -> None:
+        self._lanes[lane].active -= 1
+        self.active -= 1
+        self._dispatch()
+        self._drop_if_idle(lane)
+
+    def _dispatch(self) -> None:
+        """Admit waiting requests while there is capacity, lane by lane."""
+        progress = True
+        while progress and self.queued and self.active < self.max_concurrent:
+            progress = False
+            for _ in range(len(self._order)):
+                lane = self._order[0]
+                self._order.rotate(-1)
+                state = self._lanes[lane]
+                if not state.queued or state.active >= state.limit:
+                    continue
+                waiter = state.pop()
+                self.queued -= 1
+                progress = True
+                if waiter.future.done():
+                    continue
+                self._admit(state)
+                waiter.future.set_result(None)
+                if self.active >= self.max_concurrent:
+                    return
+
+    def _drop_if_idle(self, lane: str) -> None:
+        state = self._lanes.get(lane)
+        if state is not None and not state.active and not state.queued:
+            del self._lanes[lane]
+            self._order.remove(lane)
@@ -1,10 +1,32 @@
 # Copyright(c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from typing import Any
+import time
+from collections.abc import Iterator
+from typing import Any, Optional
 
 import requests
 
+from onemcp.messages import Request
+from onemcp.serialization import loads
+
+# Header with the deadline of a request, in seconds since the epoch.
+DEADLINE_HEADER = "X-OneMCP-Deadline"
+
+# Extra time in seconds given to the sandbox to answer after a deadline.
+DEADLINE_GRACE: float = 5.0
+
+
+def _deadline_headers(deadline: Optional[float]) -> dict[str, str]:
+    return {} if deadline is None else {DEADLINE_HEADER: f"{deadline:.3f}"}
+
+
+def _timeout(deadline: Optional[float]) -> Optional[float]:
+    """Timeout of the HTTP request of a call with a deadline."""
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0) + DEADLINE_GRACE
+
 
 class SandboxAPI:
     """Client for interacting with the OneMCP sandbox HTTP API."""
@@ -38,7 +60,7 @@ class SandboxAPI:
         )
         response.raise_for_status()
 
-        result = response.json()
+        result = loads(response.content)
         return result["sandbox_id"]
 
     def get_tools(self, sandbox_id: str) -> Any:
@@ -64,7 +86,7 @@ class SandboxAPI:
         response = requests.post(self.sandbox_endpoint, json=data, headers=headers)
         response.raise_for_status()
 
-        return response.json()
+        return loads(response.content)
 
     def call_tool(
         self,
@@ -72,6 +94,7 @@ class SandboxAPI:
         tool_name: str,
         arguments: dict[str, Any],
         request_id: int = 1,
+        deadline: Optional[float] = None,
     ) -> Any:
         """
         Call a tool in the MCP server within the sandbox.
@@ -81,6 +104,8 @@ class SandboxAPI:
             tool_name: The name of the tool to call
             arguments: The arguments to pass to the tool
             request_id: The JSON-RPC request ID (default: 1)
+            deadline: Time (seconds since the epoch) after which the sandbox
+                gives up on the call and cancels it in the MCP server
 
         Returns:
             The tool call response
@@ -88,23 +113,81 @@ class SandboxAPI:
         Raises:
             requests.RequestException: If the request fails
         """
-        data = {
-            "sandbox_id": sandbox_id,
-            "jsonrpc": "2.0",
-            "id": request_id,
-            "method": "tools/call",
-            "params": {"name": tool_name, "arguments": arguments},
-        }
+        request = Request(
+            id=request_id,
+            method="tools/call",
+            params={"name": tool_name, "arguments": arguments},
+        )
+        data = {"sandbox_id": sandbox_id, **request.to_dict()}
 
         headers = {
             "Content-Type": "application/json",
             "X-OneMCP-Message-Type": "CALL_TOOL",
+            **_deadline_headers(deadline),
         }
 
-        response = requests.post(self.sandbox_endpoint, json=data, headers=headers)
+        response = requests.post(
+            self.sandbox_endpoint,
+            json=data,
+            headers=headers,
+            timeout=_timeout(deadline),
+        )
         response.raise_for_status()
 
-        return response.json()
+        return loads(response.content)
+
+    def call_tool_stream(
+        self,
+        sandbox_id: str,
+        tool_name: str,
+        arguments: dict[str, Any],
+        request_id: int = 1,
+        deadline: Optional[float] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Call a tool in the MCP server within the sandbox, streaming its progress.
+
+        Args:
+            sandbox_id: The ID of the sandbox
+            tool_name: The name of the tool to call
+            arguments: The arguments to pass to the tool
+            request_id: The JSON-RPC request ID (default: 1)
+            deadline: Time (seconds since the epoch) after which the sandbox
+                gives up on the call and cancels it in the MCP server
+
+        Yields:
+            A {"type": "progress", ...} event for each progress notification
+            of the tool, then a {"type": "response", ...} event with the tool
+            call response
+
+        Raises:
+            requests.RequestException: If the request fails
+        """
+        request = Request(
+            id=request_id,
+            method="tools/call",
+            params={"name": tool_name, "arguments": arguments},
+        )
+        data = {"sandbox_id": sandbox_id, **request.to_dict()}
+
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/x-ndjson",
+            "X-OneMCP-Message-Type": "CALL_TOOL",
+            **_deadline_headers(deadline),
+        }
+
+        with requests.post(
+            self.sandbox_endpoint,
+            json=data,
+            headers=headers,
+            stream=True,
+            timeout=_timeout(deadline),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield loads(line)
 
     def stop_sandbox(self, sandbox_id: str) -> Any:
         """
@@ -126,7 +209,7 @@ class SandboxAPI:
         response = requests.post(self.sandbox_endpoint, json=data, headers=headers)
         response.raise_for_status()
 
-        return response.json()
+        return loads(response.content)
 
 
 if __name__ == "__main__":
@@ -4,34 +4,55 @@
 """Docker-based Sandbox implementation for OneMCP."""
 
 import asyncio
+import contextlib
 import logging
 import os
 import subprocess
 import tempfile
+import threading
+import time
 import uuid
-from pathlib import Path
-from typing import Any, Optional
-
-from openai import OpenAI
+from collections.abc import AsyncIterator, Callable
+from typing import Any, Optional, TypeVar
 
+from src.onemcp.messages import Request
+from src.onemcp.sandbox.docker import snapshot as snapshots
 from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.docker.snapshot import Snapshot
+from src.onemcp.sandbox.health import AUTO_RESTART, MAX_RESTARTS, OPEN, CircuitOpen
 from src.onemcp.sandbox.mcp_server import McpServer
+from src.onemcp.sandbox.ports import PortAllocator
+from src.onemcp.sandbox.setup_script import (
+    SETUP_SCRIPT_TEMPLATE_PATH,
+    UVX_SETUP_SCRIPT_TEMPLATE_PATH,
+    SetupScriptGenerator,
+    fill_template,
+)
+from src.onemcp.sandbox.store import CONTAINER_LABEL, SandboxRecord, SandboxStore
+from src.onemcp.sandbox.transport import DEFAULT_READ_TIMEOUT, TRANSPORTS
 from src.onemcp.util.env import ONEMCP_SRC_ROOT
 
 logger = logging.getLogger(__name__)
 
-DISCOVERY_PROMPT_FILE_PATH = os.path.join(
-    ONEMCP_SRC_ROOT, "sandbox", "discovery-prompt-header.md"
-)
 INSTALL_MCP_DOCKERFILE_PATH = os.path.join(
     ONEMCP_SRC_ROOT, "sandbox", "install_mcp.dockerfile"
 )
-SETUP_SCRIPT_TEMPLATE_PATH = os.path.join(
-    ONEMCP_SRC_ROOT, "sandbox", "try-install-mcp-server.sh"
-)
 USE_HEURISTIC_DISCOVERY = (
     os.getenv("USE_HEURISTIC_DISCOVERY", "false").lower() == "true"
 )
+# Setup script candidates raced during discovery: "pip" and "uvx" fill in
+# heuristic templates, and "llm" asks a model to write the script.
+DISCOVERY_STRATEGIES = [
+    strategy.strip()
+    for strategy in os.getenv(
+        "ONEMCP_DISCOVERY_STRATEGIES",
+        "pip,uvx" if USE_HEURISTIC_DISCOVERY else "pip,uvx,llm",
+    ).split(",")
+    if strategy.strip()
+]
+# Share one container per server across callers, unless the bootstrap
+# metadata of the server sets "stateful".
+SHARED_SANDBOXES = os.getenv("ONEMCP_SHARED_SANDBOXES", "false").lower() == "true"
 
 
 class ReadmeNotFound(Exception):
@@ -44,30 +65,105 @@ class DockerSandboxError(Exception):
     pass
 
 
+T = TypeVar("T")
+
+
+def _deadline_exceeded(sandbox_id: str, error: TimeoutError) -> dict[str, Any]:
+    logger.warning(f"Tool call in sandbox {sandbox_id} timed out: {error}")
+    return {
+        "response_code": "504",
+        "error_description": f"Tool call in sandbox {sandbox_id} timed out",
+    }
+
+
+def image_tag_from_repo_url(repository_url: str) -> str:
+    """Return the canonical tag of the container image of a repository."""
+    domain = "github.com/"
+    idx = repository_url.find(domain) + len(domain)
+    version = "v1"
+    return f"onemcp/{domain}{repository_url[idx:]}:{version}"
+
+
+def _endpoint(port: Optional[int]) -> str:
+    """Return the endpoint of a sandbox mapped to `port`, if any."""
+    return "stdio" if port is None else f"localhost:{port}"
+
+
+def _unavailable(sandbox_id: str, error: CircuitOpen) -> dict[str, Any]:
+    return {
+        "response_code": "503",
+        "error_description": f"Sandbox {sandbox_id} is unavailable: {error}",
+    }
+
+
 class DockerSandboxRegistry:
     """Docker-based sandbox for MCP servers."""
 
-    def __init__(self, base_port: int = 9000, max_instances: int = 10):
+    def __init__(
+        self,
+        base_port: int = 9000,
+        max_instances: int = 10,
+        store: Optional[SandboxStore] = None,
+    ):
         """Initialize the Docker sandbox.
 
         Args:
             base_port: Starting port for sandbox instances
             max_instances: Maximum number of concurrent sandbox instances
+            store: Durable store of the sandboxes, to reattach to them after
+                a restart (None keeps them in memory only)
         """
         self.base_port = base_port
         self.max_instances = max_instances
+        self.store = store
         self.instances: dict[str, tuple[DockerContainer, McpServer]] = {}
-        self.used_ports: set = set()
+        self.ports = PortAllocator(base_port)
         self._lock = asyncio.Lock()
+        # Sandboxes whose container is being started, counted against the limit.
+        self._starting = 0
+        self.setup_scripts = SetupScriptGenerator()
+        # Snapshots of initialized servers, by canonical image tag.
+        self.snapshots: dict[str, Snapshot] = {}
+        # Sandboxes to snapshot once their server has listed its tools.
+        self._snapshot_candidates: set[str] = set()
+        self._snapshot_tasks: dict[str, asyncio.Task] = {}
+        # Tools listed by the servers of each image, by image digest.
+        self.tool_lists: dict[str, list[Any]] = {}
+        # Digest of the image each sandbox was started from.
+        self._sandbox_digests: dict[str, str] = {}
+        # Shared sandboxes: the session ids handed out to callers and the
+        # sandbox each one maps onto, the sandbox shared for each image, and
+        # the number of open sessions of each shared sandbox.
+        self.sessions: dict[str, str] = {}
+        self._shared: dict[str, str] = {}
+        self._shared_starting: dict[str, asyncio.Future[dict[str, Any]]] = {}
+        self._shared_waiters: dict[str, int] = {}
+        self._refcounts: dict[str, int] = {}
+        # Shared sandboxes being stopped because no session was opened on them.
+        self._unused_stops: set[asyncio.Task] = set()
+        # Bootstrap metadata of each sandbox, to restart it from its image,
+        # and the restarts in progress.
+        self._bootstrap_metadata: dict[str, dict[str, Any]] = {}
+        self._restarts: dict[str, asyncio.Task] = {}
+        # Tags of the images built or run here, reported to the scheduler of
+        # a fleet of sandbox nodes for image locality.
+        self.images: set[str] = set()
 
     async def discover(
-        self, repository_url: str, repository_readme: str
+        self,
+        repository_url: str,
+        repository_readme: str,
+        setup_script: Optional[str] = None,
+        revision: Optional[str] = None,
     ) -> dict[str, Any]:
         """Discover capabilities and setup instructions for an MCP Server.
 
         Args:
             repository_url: URL of the repository to discover
             repository_readme: Contents of the repository's README
+            setup_script: Setup script known to work for a previous revision
+                of the repository, used instead of generating a new one
+            revision: Commit SHA of the repository, if known
 
         Returns:
             Dictionary containing discovery information
@@ -77,7 +173,7 @@ class DockerSandboxRegistry:
 
             # Analyze repository structure
             discovery_info = await self._analyze_repository(
-                repository_url, repository_readme
+                repository_url, repository_readme, setup_script, revision
             )
 
             return {
@@ -93,118 +189,528 @@ class DockerSandboxRegistry:
                 "error_description": f"Discovery failed: {str(e)}",
             }
 
-    async def start(self, bootstrap_metadata: dict[str, Any]) -> dict[str, Any]:
+    async def start(
+        self,
+        bootstrap_metadata: dict[str, Any],
+        revision: Optional[str] = None,
+        image_tag: Optional[str] = None,
+    ) -> dict[str, Any]:
         """Start a sandbox instance using the provided bootstrap metadata.
 
+        With ONEMCP_SHARED_SANDBOXES, callers of the same server share one
+        container, unless the bootstrap metadata flags the server as stateful.
+
         Args:
             bootstrap_metadata: Metadata required to start the sandbox
+            revision: Rebuild the container image for this revision of the
+                repository, even if an image already exists
+            image_tag: Tag of the container image (derived from the
+                repository URL if None)
 
         Returns:
             Dictionary containing start response
         """
-        async with self._lock:
+        repository_url = bootstrap_metadata.get("repository_url")
+        if (
+            SHARED_SANDBOXES
+            and repository_url
+            and revision is None
+            and image_tag is None
+            and not bootstrap_metadata.get("stateful", False)
+        ):
+            return await self._start_shared(bootstrap_metadata, repository_url)
+        return await self._start_container(bootstrap_metadata, revision, image_tag)
+
+    async def _start_shared(
+        self, bootstrap_metadata: dict[str, Any], repository_url: str
+    ) -> dict[str, Any]:
+        """Open a session on the shared container of a server.
+
+        The container is started by the first session, and concurrent first
+        sessions wait for the same start. If all of them are cancelled, the
+        container is stopped once started.
+
+        Returns:
+            Dictionary containing start response, with the id of the session
+        """
+        image_tag = self.get_image_tag_from_repo_url(repository_url)
+        backing_id = self._shared.get(image_tag)
+        if backing_id is None:
+            future = self._shared_starting.get(image_tag)
+            if future is None:
+                future = asyncio.ensure_future(
+                    self._start_shared_container(bootstrap_metadata, image_tag)
+                )
+                self._shared_starting[image_tag] = future
+                future.add_done_callback(
+                    lambda _: self._shared_starting.pop(image_tag, None)
+                )
+            self._shared_waiters[image_tag] = self._shared_waiters.get(image_tag, 0) + 1
             try:
-                if len(self.instances) >= self.max_instances:
-                    return {
-                        "response_code": "429",
-                        "error_description": "Maximum number of sandbox instances reached",
-                    }
+                response = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                future.add_done_callback(lambda _: self._stop_unused_shared(image_tag))
+                raise
+            finally:
+                self._shared_waiters[image_tag] -= 1
+                if not self._shared_waiters[image_tag]:
+                    del self._shared_waiters[image_tag]
+            if response.get("response_code") != "200":
+                return response
+            backing_id = response["sandbox_id"]
+
+        session_id = str(uuid.uuid4())
+        self.sessions[session_id] = backing_id
+        self._refcounts[backing_id] = self._refcounts.get(backing_id, 0) + 1
+        if self.store is not None:
+            self.store.put_session(session_id, backing_id)
+        _, instance = self.instances[backing_id]
+
+        logger.info(f"Opened session {session_id} on sandbox {backing_id}")
 
-                repository_url = bootstrap_metadata.get("repository_url")
-                if not repository_url:
-                    return {
-                        "response_code": "400",
-                        "error_description": "Missing required field: repository_url",
-                    }
+        return {
+            "response_code": "200",
+            "sandbox_id": session_id,
+            "endpoint": instance.endpoint,
+        }
+
+    async def _start_shared_container(
+        self, bootstrap_metadata: dict[str, Any], image_tag: str
+    ) -> dict[str, Any]:
+        """Start the shared container of an image, and register it as such."""
+        response = await self._start_container(bootstrap_metadata)
+        if response.get("response_code") == "200":
+            self._shared[image_tag] = response["sandbox_id"]
+        return response
+
+    def _stop_unused_shared(self, image_tag: str) -> None:
+        """Stop the shared container of an image if no session uses it, nor
+        waits for it to start."""
+        backing_id = self._shared.get(image_tag)
+        if (
+            backing_id is None
+            or image_tag in self._shared_waiters
+            or self._refcounts.get(backing_id, 0) > 0
+        ):
+            return
+        logger.info(f"Stopping shared sandbox {backing_id}, which has no sessions")
+        del self._shared[image_tag]
+        task = asyncio.ensure_future(self.stop(backing_id))
+        self._unused_stops.add(task)
+        task.add_done_callback(self._unused_stops.discard)
+
+    async def _start_container(
+        self,
+        bootstrap_metadata: dict[str, Any],
+        revision: Optional[str] = None,
+        image_tag: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """Start a sandbox instance in a container of its own.
+
+        Images are built and containers started outside of the registry lock,
+        so that several sandboxes can be started at the same time.
+
+        Args:
+            bootstrap_metadata: Metadata required to start the sandbox
+            revision: Rebuild the container image for this revision of the
+                repository, even if an image already exists
+            image_tag: Tag of the container image (derived from the
+                repository URL if None)
+
+        Returns:
+            Dictionary containing start response
+        """
+        try:
+            repository_url = bootstrap_metadata.get("repository_url")
+            if not repository_url:
+                return {
+                    "response_code": "400",
+                    "error_description": "Missing required field: repository_url",
+                }
 
-                setup_script = bootstrap_metadata.get("setup_script")
-                if not setup_script:
+            setup_script = bootstrap_metadata.get("setup_script")
+            if not setup_script:
+                return {
+                    "response_code": "400",
+                    "error_description": "Missing required field: setup_script",
+                }
+
+            transport = bootstrap_metadata.get("transport", "stdio")
+            if transport not in TRANSPORTS:
+                return {
+                    "response_code": "400",
+                    "error_description": f"Unsupported transport: {transport}",
+                }
+
+            container_image_tag = image_tag or self.get_image_tag_from_repo_url(
+                repository_url
+            )
+
+            # FIXME: remove this tweak once start method does not require bootstrap_metadata
+            bootstrap_metadata["container_image_tag"] = container_image_tag
+
+            async with self._lock:
+                if len(self.instances) + self._starting >= self.max_instances:
                     return {
-                        "response_code": "400",
-                        "error_description": "Missing required field: setup_script",
+                        "response_code": "429",
+                        "error_description": "Maximum number of sandbox instances reached",
                     }
 
-                container_image_tag = self.get_image_tag_from_repo_url(repository_url)
+                # Allocate a port, which servers speaking STDIO do not use.
+                port: Optional[int] = None
+                if transport != "stdio":
+                    port = self.ports.allocate()
+                    if port is None:
+                        return {
+                            "response_code": "503",
+                            "error_description": "No available ports for sandbox instance",
+                        }
+                self._starting += 1
 
-                # FIXME: remove this tweak once start method does not require bootstrap_metadata
-                bootstrap_metadata["container_image_tag"] = container_image_tag
+            try:
+                # Discovery candidates are never snapshotted.
+                snapshot_mode = snapshots.SNAPSHOT_MODE if image_tag is None else "off"
+                snapshot: Optional[Snapshot] = None
 
                 # Generate Dockerfile if the image does not exist.
-                if not self._check_if_docker_image_exists(container_image_tag):
+                if revision is not None or not self._check_if_docker_image_exists(
+                    container_image_tag
+                ):
                     logger.info(
                         f"Generating Dockerfile for {repository_url} with tag {container_image_tag}"
                     )
-                    self._generate_dockerfile(setup_script, container_image_tag)
+                    await self._build_image(
+                        setup_script, container_image_tag, revision or ""
+                    )
+                    # Snapshots of the previous image are stale.
+                    if snapshot_mode != "off":
+                        await self._drop_snapshot(container_image_tag, snapshot_mode)
                 else:
                     logger.info(f"Using existing Docker image: {container_image_tag}")
+                    if snapshot_mode != "off":
+                        snapshot = await self._get_snapshot(
+                            container_image_tag, snapshot_mode
+                        )
 
                 # Generate unique sandbox ID
                 sandbox_id = str(uuid.uuid4())
 
-                # Allocate port
-                port = self._allocate_port()
-                if port is None:
-                    return {
-                        "response_code": "503",
-                        "error_description": "No available ports for sandbox instance",
-                    }
-
                 # Start Docker container
-                container: DockerContainer = self._start_docker_container(
-                    sandbox_id, bootstrap_metadata, port
+                start_task = asyncio.ensure_future(
+                    asyncio.to_thread(
+                        self._start_from_snapshot,
+                        sandbox_id,
+                        bootstrap_metadata,
+                        port,
+                        snapshot,
+                    )
                 )
+                try:
+                    container: DockerContainer = await asyncio.shield(start_task)
+                except asyncio.CancelledError:
+                    # The container keeps starting in its thread, so remove it
+                    # once it is up.
+                    with contextlib.suppress(Exception):
+                        await (await start_task).remove()
+                    raise
+            except BaseException:
+                self.ports.release(port)
+                raise
+            finally:
+                self._starting -= 1
+
+            # Create sandbox instance
+            instance = McpServer(
+                endpoint=_endpoint(port),
+                status="running",
+                transport=transport,
+                path=bootstrap_metadata.get("mcp_path", "/mcp"),
+            )
 
-                # Create sandbox instance
-                instance = McpServer(
-                    endpoint=f"localhost:{port}",
-                    status="running",
+            self.instances[sandbox_id] = (container, instance)
+            self._bootstrap_metadata[sandbox_id] = bootstrap_metadata
+            self.images.add(container_image_tag)
+            digest = await self._image_digest(container_image_tag)
+            if digest is not None:
+                self._sandbox_digests[sandbox_id] = digest
+            if snapshot_mode != "off" and container_image_tag not in self.snapshots:
+                self._snapshot_candidates.add(sandbox_id)
+            # Discovery candidates are not reattached after a restart.
+            if self.store is not None and image_tag is None:
+                self.store.put(
+                    SandboxRecord(
+                        sandbox_id,
+                        port,
+                        transport,
+                        instance.path,
+                        bootstrap_metadata,
+                    )
                 )
 
-                self.instances[sandbox_id] = (container, instance)
-                self.used_ports.add(port)
+            logger.info(f"Started sandbox {sandbox_id} on {instance.endpoint}")
 
-                logger.info(f"Started sandbox {sandbox_id} on port {port}")
+            return {
+                "response_code": "200",
+                "sandbox_id": sandbox_id,
+                "endpoint": instance.endpoint,
+            }
 
-                return {
-                    "response_code": "200",
-                    "sandbox_id": sandbox_id,
-                    "endpoint": instance.endpoint,
-                }
+        except Exception as e:
+            logger.error(f"Failed to start sandbox: {e}")
+            return {
+                "response_code": "500",
+                "error_description": f"Failed to start sandbox: {str(e)}",
+            }
 
-            except Exception as e:
-                logger.error(f"Failed to start sandbox: {e}")
-                return {
-                    "response_code": "500",
-                    "error_description": f"Failed to start sandbox: {str(e)}",
-                }
+    async def _call_in_thread(
+        self,
+        sandbox_id: str,
+        call: Callable[..., T],
+        *args: Any,
+        deadline: Optional[float],
+    ) -> T:
+        """Run a blocking tool call off the event loop, until its deadline.
+
+        Off the event loop, sessions of a shared sandbox run their calls
+        concurrently. If the awaiting task is cancelled, e.g. because the
+        client disconnected, the call is cancelled in the MCP server too.
+        A call that opens the breaker of the server restarts its sandbox.
+
+        Raises:
+            TimeoutError: If the deadline passed before the tool responded.
+            CircuitOpen: If the breaker of the server is open.
+        """
+        timeout = DEFAULT_READ_TIMEOUT
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise TimeoutError("Deadline exceeded before calling the tool")
+        cancelled = threading.Event()
+        try:
+            return await asyncio.to_thread(
+                call, *args, timeout=timeout, cancelled=cancelled
+            )
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        except Exception:
+            self._maybe_restart(sandbox_id)
+            raise
+
+    def _maybe_restart(self, sandbox_id: str) -> None:
+        """Restart a sandbox whose breaker is open, in the background."""
+        instance = self.instances.get(sandbox_id, (None, None))[1]
+        if (
+            not AUTO_RESTART
+            or instance is None
+            or instance.health.state != OPEN
+            or instance.health.restarts >= MAX_RESTARTS
+            or sandbox_id in self._restarts
+            or sandbox_id not in self._bootstrap_metadata
+        ):
+            return
+        task = asyncio.ensure_future(self._restart(sandbox_id))
+        self._restarts[sandbox_id] = task
+
+    async def _restart(self, sandbox_id: str) -> None:
+        """Replace the container of a sandbox with a new one from its image.
+
+        The sandbox keeps its id, port and sessions, and the health of its
+        server, so that the number of restarts is bounded.
+        """
+        try:
+            container, instance = self.instances[sandbox_id]
+            logger.warning(
+                f"Restarting sandbox {sandbox_id}: {instance.health.last_error}"
+            )
+            with contextlib.suppress(Exception):
+                await container.remove()
+            new_container = await asyncio.to_thread(
+                self._start_docker_container,
+                sandbox_id,
+                self._bootstrap_metadata[sandbox_id],
+                container.port,
+            )
+            if sandbox_id not in self.instances:
+                # The sandbox was cleaned up while restarting.
+                await new_container.remove()
+                return
+            self.instances[sandbox_id] = (
+                new_container,
+                McpServer(
+                    endpoint=instance.endpoint,
+                    status="running",
+                    transport=instance.transport,
+                    path=instance.path,
+                    health=instance.health,
+                ),
+            )
+            instance.health.record_restart()
+            logger.info(f"Restarted sandbox {sandbox_id}")
+        except Exception as e:
+            logger.error(f"Failed to restart sandbox {sandbox_id}: {e}")
+        finally:
+            self._restarts.pop(sandbox_id, None)
 
-    async def call_tool(self, sandbox_id: str, body: dict[str, Any]) -> dict[str, Any]:
+    async def call_tool(
+        self, sandbox_id: str, body: Request, deadline: Optional[float] = None
+    ) -> dict[str, Any]:
         """Call a tool exposed by an MCP server running in `sandbox_id`.
 
         Args:
-            The tools/call payload of the MCP protocol.
+            sandbox_id: ID of the sandbox running the tool
+            body: The tools/call payload of the MCP protocol
+            deadline: Deadline of the call (time.monotonic), after which it
+                is cancelled (default: in DEFAULT_READ_TIMEOUT seconds)
 
         Returns:
             The response for the tool execution.
         """
         logger.info(
-            "Calling tool {} for sandbox ID: {}".format(
-                body["params"]["name"], sandbox_id
-            )
+            "Calling tool {} for sandbox ID: {}".format(body.params["name"], sandbox_id)
         )
 
+        sandbox_id = self.sessions.get(sandbox_id, sandbox_id)
         (container, instance) = self.instances.get(sandbox_id, [None, None])
 
-        if instance is not None and container is not None:
-            response = instance.call_tool(container, body)
-        else:
+        if instance is None or container is None:
             return {
                 "response_code": "404",
                 "error_description": f"Sandbox {sandbox_id} not found",
             }
 
+        try:
+            response = await self._call_in_thread(
+                sandbox_id, instance.call_tool, container, body, deadline=deadline
+            )
+        except TimeoutError as e:
+            return _deadline_exceeded(sandbox_id, e)
+        except CircuitOpen as e:
+            return _unavailable(sandbox_id, e)
+
         return {"response": response}
 
+    async def call_tool_raw(
+        self, sandbox_id: str, body: Request, deadline: Optional[float] = None
+    ) -> bytes | dict[str, Any]:
+        """Call a tool like `call_tool`, without decoding its response.
+
+        Args:
+            sandbox_id: ID of the sandbox running the tool
+            body: The tools/call payload of the MCP protocol
+            deadline: Deadline of the call (time.monotonic)
+
+        Returns:
+            The encoded JSON-RPC response of the tool, or a dictionary with
+            the error if the sandbox does not exist
+        """
+        logger.info(
+            "Calling tool {} for sandbox ID: {}".format(body.params["name"], sandbox_id)
+        )
+
+        sandbox_id = self.sessions.get(sandbox_id, sandbox_id)
+        (container, instance) = self.instances.get(sandbox_id, [None, None])
+        if instance is None or container is None:
+            return {
+                "response_code": "404",
+                "error_description": f"Sandbox {sandbox_id} not found",
+            }
+
+        try:
+            return await self._call_in_thread(
+                sandbox_id, instance.call_tool_raw, container, body, deadline=deadline
+            )
+        except TimeoutError as e:
+            return _deadline_exceeded(sandbox_id, e)
+        except CircuitOpen as e:
+            return _unavailable(sandbox_id, e)
+
+    async def call_tool_stream(
+        self, sandbox_id: str, body: Request, deadline: Optional[float] = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Call a tool, streaming its progress notifications as they arrive.
+
+        Args:
+            sandbox_id: ID of the sandbox running the tool
+            body: The tools/call payload of the MCP protocol
+            deadline: Deadline of the call (time.monotonic)
+
+        Yields:
+            A {"type": "progress", ...} event with the parameters of each
+            progress notification, then a {"type": "response", ...} event with
+            the same fields as the result of `call_tool`
+        """
+        logger.info(
+            "Streaming tool {} for sandbox ID: {}".format(
+                body.params["name"], sandbox_id
+            )
+        )
+
+        sandbox_id = self.sessions.get(sandbox_id, sandbox_id)
+        (container, instance) = self.instances.get(sandbox_id, [None, None])
+        if instance is None or container is None:
+            yield {
+                "type": "response",
+                "response_code": "404",
+                "error_description": f"Sandbox {sandbox_id} not found",
+            }
+            return
+
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+        def on_progress(params: dict[str, Any]) -> None:
+            event = {"type": "progress", **params}
+            event.pop("progressToken", None)
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        call = asyncio.ensure_future(
+            self._call_in_thread(
+                sandbox_id,
+                instance.call_tool,
+                container,
+                body,
+                on_progress,
+                deadline=deadline,
+            )
+        )
+        try:
+            while not call.done():
+                next_event = asyncio.ensure_future(events.get())
+                await asyncio.wait(
+                    {next_event, call}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event.done():
+                    yield next_event.result()
+                else:
+                    next_event.cancel()
+
+            # Progress reported right before the response.
+            while not events.empty():
+                yield events.get_nowait()
+        finally:
+            if not call.done():
+                call.cancel()
+
+        try:
+            response = call.result()
+        except TimeoutError as e:
+            yield {"type": "response", **_deadline_exceeded(sandbox_id, e)}
+            return
+        except CircuitOpen as e:
+            yield {"type": "response", **_unavailable(sandbox_id, e)}
+            return
+        except Exception as e:
+            logger.error(f"Failed to call tool in sandbox {sandbox_id}: {e}")
+            yield {
+                "type": "response",
+                "response_code": "500",
+                "error_description": str(e),
+            }
+            return
+
+        yield {"type": "response", "response": response}
+
     async def get_tools(self, sandbox_id: str) -> dict[str, Any]:
         """Get the tools exposed by an MCP server.
 
@@ -215,11 +721,25 @@ class DockerSandboxRegistry:
             List of available tools
         """
         logger.info(f"Getting tools for sandbox ID: {sandbox_id}")
+        sandbox_id = self.sessions.get(sandbox_id, sandbox_id)
         (container, instance) = self.instances.get(sandbox_id, [None, None])
 
         if container is not None and instance is not None:
-            tools = instance.get_tools(container)
-            logger.info(f"Got tools: {tools}")
+            tools = self._cached_tools(sandbox_id)
+            if tools is None:
+                try:
+                    tools = await asyncio.to_thread(instance.get_tools, container)
+                except CircuitOpen as e:
+                    self._maybe_restart(sandbox_id)
+                    return _unavailable(sandbox_id, e)
+                except Exception:
+                    self._maybe_restart(sandbox_id)
+                    raise
+                logger.info(f"Got tools: {tools}")
+                self._cache_tools(sandbox_id, tools)
+                # Only a server that listed its tools has been initialized.
+                if isinstance(tools, list) and tools:
+                    self._maybe_snapshot(sandbox_id)
         else:
             return {
                 "response_code": "404",
@@ -228,6 +748,47 @@ class DockerSandboxRegistry:
 
         return {"tools": tools}
 
+    async def get_status(self, sandbox_id: Optional[str] = None) -> dict[str, Any]:
+        """Get the health of the MCP servers of sandboxes.
+
+        Args:
+            sandbox_id: ID of the sandbox, or of a session, to query (all
+                sandboxes if None)
+
+        Returns:
+            The status of the sandbox, or of every sandbox by ID along with
+            the load and the images of this node
+        """
+        if sandbox_id is None:
+            return {
+                "sandboxes": {sid: self._status(sid) for sid in list(self.instances)},
+                "node": {
+                    "instances": len(self.instances) + self._starting,
+                    "max_instances": self.max_instances,
+                    "images": sorted(self.images),
+                },
+            }
+
+        sandbox_id = self.sessions.get(sandbox_id, sandbox_id)
+        if sandbox_id not in self.instances:
+            return {
+                "response_code": "404",
+                "error_description": f"Sandbox {sandbox_id} not found",
+            }
+        return {"sandbox_id": sandbox_id, **self._status(sandbox_id)}
+
+    def _status(self, sandbox_id: str) -> dict[str, Any]:
+        container, instance = self.instances[sandbox_id]
+        try:
+            running = container.is_running()
+        except Exception:
+            running = False
+        return {
+            "running": running,
+            "restarting": sandbox_id in self._restarts,
+            "health": instance.health.to_dict(),
+        }
+
     async def stop(self, sandbox_id: str) -> dict[str, Any]:
         """Stop a running sandbox instance.
 
@@ -237,6 +798,22 @@ class DockerSandboxRegistry:
         Returns:
             Dictionary containing stop response
         """
+        if sandbox_id in self.sessions:
+            backing_id = self.sessions.pop(sandbox_id)
+            self._refcounts[backing_id] -= 1
+            if self.store is not None:
+                self.store.delete_session(sandbox_id)
+            logger.info(f"Closed session {sandbox_id} on sandbox {backing_id}")
+            if self._refcounts[backing_id] > 0:
+                return {"response_code": "200"}
+
+            # The last session of a shared sandbox stops its container.
+            del self._refcounts[backing_id]
+            for image_tag, shared_id in list(self._shared.items()):
+                if shared_id == backing_id:
+                    del self._shared[image_tag]
+            sandbox_id = backing_id
+
         async with self._lock:
             try:
                 if sandbox_id not in self.instances:
@@ -247,6 +824,12 @@ class DockerSandboxRegistry:
 
                 container, instance = self.instances[sandbox_id]
                 await container.stop()
+                # The port may be handed out again before the sandbox is
+                # cleaned up, which must not release it a second time.
+                self.ports.release(container.port)
+                container.port = None
+                if self.store is not None:
+                    self.store.delete(sandbox_id)
 
                 logger.info(f"Stopped sandbox {sandbox_id}")
 
@@ -259,12 +842,19 @@ class DockerSandboxRegistry:
                     "error_description": f"Failed to stop sandbox: {str(e)}",
                 }
 
-    async def cleanup(self, sandbox_id: str) -> None:
+    async def cleanup(self, sandbox_id: str, remove_image: bool = True) -> None:
         """Clean up resources for a specific sandbox instance.
 
         Args:
             sandbox_id: ID of the sandbox to clean up
+            remove_image: Whether to also remove the image of the sandbox
         """
+        backing_id = self.sessions.get(sandbox_id)
+        if backing_id is not None:
+            # Sessions share their sandbox, which is stopped with the last one.
+            logger.info(f"Session {sandbox_id} is still open, keeping {backing_id}")
+            return
+
         async with self._lock:
             if sandbox_id in self.instances:
                 container, _ = self.instances[sandbox_id]
@@ -272,200 +862,533 @@ class DockerSandboxRegistry:
                 await container.remove()
                 logger.info(f"Cleaned up sandbox {sandbox_id}")
 
-                await container.remove_image()
-                logger.info("Removed orphaned images")
+                if remove_image:
+                    await container.remove_image()
+                    logger.info("Removed orphaned images")
+                    metadata = self._bootstrap_metadata.get(sandbox_id, {})
+                    self.images.discard(metadata.get("container_image_tag", ""))
 
-                self.used_ports.discard(container.port)
+                self.ports.release(container.port)
                 del self.instances[sandbox_id]
+                self._snapshot_candidates.discard(sandbox_id)
+                self._sandbox_digests.pop(sandbox_id, None)
+                self._bootstrap_metadata.pop(sandbox_id, None)
+                if self.store is not None:
+                    self.store.delete(sandbox_id)
+                restart = self._restarts.pop(sandbox_id, None)
+                if restart is not None:
+                    restart.cancel()
 
             else:
                 logger.warning(f"Sandbox {sandbox_id} not found for cleanup")
 
+    async def reattach(self) -> int:
+        """Reattach to the sandboxes left running by a previous run.
+
+        Sandboxes whose container is gone are forgotten, and labeled
+        containers that belong to no sandbox are removed.
+
+        Returns:
+            The number of sandboxes reattached
+        """
+        if self.store is None:
+            return 0
+
+        containers = await self._labeled_containers()
+        for record in self.store.sandboxes():
+            sandbox_id = record.sandbox_id
+            if containers.get(sandbox_id, False):
+                try:
+                    container = await asyncio.to_thread(
+                        self._attach_docker_container, record
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to reattach sandbox {sandbox_id}: {e}")
+                else:
+                    self._adopt(record, container)
+                    del containers[sandbox_id]
+                    continue
+            # The container, if any, is removed with the orphans.
+            logger.info(f"Sandbox {sandbox_id} is gone, forgetting it")
+            self.store.delete(sandbox_id)
+
+        for session_id, backing_id in self.store.sessions().items():
+            self.sessions[session_id] = backing_id
+            self._refcounts[backing_id] = self._refcounts.get(backing_id, 0) + 1
+            image_tag = self._bootstrap_metadata[backing_id]["container_image_tag"]
+            self._shared[image_tag] = backing_id
+
+        for name in containers:
+            logger.info(f"Removing orphaned container {name}")
+            with contextlib.suppress(DockerSandboxError):
+                await self._docker("rm", "-f", name)
+
+        for sandbox_id in self.instances:
+            tag = self._bootstrap_metadata[sandbox_id]["container_image_tag"]
+            digest = await self._image_digest(tag)
+            if digest is not None:
+                self._sandbox_digests[sandbox_id] = digest
+
+        logger.info(f"Reattached {len(self.instances)} sandboxes")
+        return len(self.instances)
+
+    def _adopt(self, record: SandboxRecord, container: DockerContainer) -> None:
+        """Register a reattached sandbox."""
+        self.instances[record.sandbox_id] = (
+            container,
+            McpServer(
+                endpoint=_endpoint(record.port),
+                status="running",
+                transport=record.transport,
+                path=record.path,
+            ),
+        )
+        if record.port is not None:
+            self.ports.reserve(record.port)
+        self._bootstrap_metadata[record.sandbox_id] = record.bootstrap_metadata
+        self.images.add(record.bootstrap_metadata["container_image_tag"])
+
+    async def _labeled_containers(self) -> dict[str, bool]:
+        """Return whether each container of a sandbox is running, by name."""
+        output = await self._docker(
+            "ps",
+            "-a",
+            "--filter",
+            f"label={CONTAINER_LABEL}",
+            "--format",
+            "{{.Names}}\t{{.State}}",
+        )
+        containers = {}
+        for line in output.splitlines():
+            name, _, state = line.partition("\t")
+            containers[name] = state == "running"
+        return containers
+
+    def _attach_docker_container(self, record: SandboxRecord) -> DockerContainer:
+        return DockerContainer.attach(
+            record.sandbox_id,
+            record.bootstrap_metadata["container_image_tag"],
+            record.port,
+        )
+
+    async def shutdown(self) -> None:
+        """Stop serving the sandboxes.
+
+        Sandboxes that are persisted keep running, to be reattached to by the
+        next run, and all others are stopped.
+        """
+        if self.store is None:
+            await self.cleanup_all()
+            return
+        await asyncio.gather(*self._snapshot_tasks.values(), return_exceptions=True)
+        await asyncio.gather(*self._unused_stops, return_exceptions=True)
+        for sandbox_id, (container, _) in list(self.instances.items()):
+            try:
+                container.detach()
+            except Exception as e:
+                logger.warning(f"Failed to detach from sandbox {sandbox_id}: {e}")
+        logger.info(f"Detached from {len(self.instances)} sandboxes")
+
     async def cleanup_all(self) -> None:
         """Stop all running sandbox instances."""
+        await asyncio.gather(*self._snapshot_tasks.values(), return_exceptions=True)
+        await asyncio.gather(*self._unused_stops, return_exceptions=True)
+        self.sessions.clear()
+        self._shared.clear()
+        self._refcounts.clear()
         sandbox_ids = list(self.instances.keys())
         for sandbox_id in sandbox_ids:
             await self.stop(sandbox_id)
             await self.cleanup(sandbox_id)
 
-    def _allocate_port(self) -> Optional[int]:
-        """Allocate an available port for a new sandbox instance."""
-        for port in range(self.base_port, self.base_port + 1000):
-            if port not in self.used_ports:
-                return port
-        return None
-
-    def _build_prompt(self, repository_url: str, repository_readme: str) -> str:
-        prompt = f"The GitHub URL for the MCP server is {repository_url}. Here "
-        prompt += f"is the README:\n{repository_readme}"
-
-        return prompt
-
-    def _generate_dockerfile(self, setup_script: str, image_tag: str) -> None:
+    async def _build_image(
+        self, setup_script: str, image_tag: str, revision: str = ""
+    ) -> None:
         dockerfile_path = INSTALL_MCP_DOCKERFILE_PATH
 
         logger.info(f"Generating docker file (tag={image_tag}, path={dockerfile_path})")
 
-        # Dump the setup script on a temporary file that we delete afterwards.
-        with tempfile.NamedTemporaryFile(mode="w+", delete=False) as tmp:
-            tmp.write(setup_script)
-            tmp.flush()
+        # Dump the setup script on a temporary directory that we delete
+        # afterwards.
+        with tempfile.TemporaryDirectory() as script_dir:
+            with open(os.path.join(script_dir, "install_mcp.sh"), "w") as tmp:
+                tmp.write(setup_script)
 
-            tmp_name_basename = os.path.basename(tmp.name)
-            tmp_name_dirname = os.path.dirname(tmp.name)
             docker_cmd = [
                 "docker",
                 "build",
-                f"-t {image_tag}",
-                f"-f {dockerfile_path}",
-                f"--build-arg SCRIPT_PATH={tmp_name_basename}",
-                f"--build-context scriptctx={tmp_name_dirname}",
+                "-t",
+                image_tag,
+                "-f",
+                dockerfile_path,
+                "--build-arg",
+                "SCRIPT_PATH=install_mcp.sh",
+                # Changing the revision invalidates the cached install layer.
+                "--build-arg",
+                f"ONEMCP_REVISION={revision}",
+                "--build-context",
+                f"scriptctx={script_dir}",
                 ".",
             ]
 
-            docker_cmd_str = " ".join(docker_cmd)
-            logger.info(f"docker_cmd: {docker_cmd_str}")
-            subprocess.run(docker_cmd_str, shell=True, check=True)
+            logger.info(f"docker_cmd: {' '.join(docker_cmd)}")
+            # Cache mounts in the Dockerfiles require BuildKit.
+            proc = await asyncio.create_subprocess_exec(
+                *docker_cmd, env={**os.environ, "DOCKER_BUILDKIT": "1"}
+            )
+            try:
+                returncode = await proc.wait()
+            except asyncio.CancelledError:
+                # Discovery picked another candidate.
+                proc.kill()
+                await proc.wait()
+                raise
+            if returncode != 0:
+                raise DockerSandboxError(
+                    f"Failed to build image {image_tag} (exit code {returncode})"
+                )
 
             logger.info(f"Generated dockerfile at: {image_tag}")
 
-    def get_image_tag_from_repo_url(self, repository_url: str) -> str:
-        domain = "github.com/"
-        idx = repository_url.find(domain) + len(domain)
-        version = "v1"
-        return f"onemcp/{domain}{repository_url[idx:]}:{version}"
-
-    def ask_openai(self, repository_url: str, repository_readme: str) -> str:
-        # First get the repository readme file.
-        prompt = self._build_prompt(repository_url, repository_readme)
-
-        system_prompt_file = Path(DISCOVERY_PROMPT_FILE_PATH)
-        if not system_prompt_file.exists():
-            raise Exception(f"Error: File {system_prompt_file} does not exist.")
-
-        # Read the system prompt from the file.
-        system_prompt = system_prompt_file.read_text().strip()
-
-        # Get the installation instructions from an LLM.
-        # FIXME: this is using carlos' personal API key.
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-        )
+    async def _docker(self, *args: str) -> str:
+        """Run a docker command, raising on failure.
 
-        # Catch if the model returns a markdown blob, even if instructed to not
-        # do so.
-        setup_script: str = response.choices[0].message.content or ""
-        if setup_script.startswith("```") and setup_script.endswith("```"):
-            setup_script = "\n".join(setup_script.split("\n")[1:-1])
+        Returns:
+            The output of the command
+        """
+        proc = await asyncio.create_subprocess_exec(
+            "docker",
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise DockerSandboxError(
+                f"docker {' '.join(args)} failed: {stderr.decode().strip()}"
+            )
+        return stdout.decode()
 
-        return setup_script
+    def get_image_tag_from_repo_url(self, repository_url: str) -> str:
+        return image_tag_from_repo_url(repository_url)
 
-    def try_template_file(self, repository_url: str) -> str:
-        # Read the template file
-        template_file_path = Path(SETUP_SCRIPT_TEMPLATE_PATH)
+    async def ask_openai(self, repository_url: str, repository_readme: str) -> str:
+        # Served from the cache if this README was already seen.
+        return await self.setup_scripts.generate(repository_url, repository_readme)
 
-        # Add the repository URL to the template
-        if not template_file_path.exists():
-            raise Exception(f"Error: File {template_file_path} does not exist.")
-        template_content = template_file_path.read_text()
-        setup_script = template_content.replace(
-            "REPOSITORY_URL=", f"REPOSITORY_URL={repository_url}"
-        )
-        return setup_script
+    def try_template_file(
+        self, repository_url: str, template_path: str = SETUP_SCRIPT_TEMPLATE_PATH
+    ) -> str:
+        return fill_template(repository_url, template_path)
 
     async def _analyze_repository(
-        self, repository_url: str, repository_readme: str
+        self,
+        repository_url: str,
+        repository_readme: str,
+        setup_script: Optional[str] = None,
+        revision: Optional[str] = None,
     ) -> dict[str, Any]:
         """Analyze repository to extract MCP server information.
 
+        Each discovery strategy produces a candidate setup script, and all
+        candidates are tried in parallel containers. The first one whose server
+        lists its tools wins, and the others are cancelled.
+
         Args:
-            repo_path: Path to the cloned repository
+            repository_url: URL of the repository to discover
+            repository_readme: Contents of the repository's README
+            setup_script: Setup script to use instead of the discovery
+                strategies
+            revision: Commit SHA of the repository, if known
 
         Returns:
             Dictionary containing analysis results
         """
+        # Always build images of the current revision of the repository.
+        revision = revision or str(uuid.uuid4())
+        strategies = ["known"] if setup_script else DISCOVERY_STRATEGIES
+        tasks = {
+            asyncio.create_task(
+                self._try_candidate(
+                    strategy,
+                    repository_url,
+                    repository_readme,
+                    revision,
+                    setup_script,
+                )
+            ): strategy
+            for strategy in strategies
+        }
 
-        if USE_HEURISTIC_DISCOVERY:
-            # Use the template file to generate the setup script.
-            logger.info(
-                f"Using template file to generate setup script for {repository_url}"
+        winner: Optional[dict[str, Any]] = None
+        errors: list[str] = []
+        pending = set(tasks)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(f"{tasks[task]}: {task.exception()}")
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        # Another candidate finished at the same time.
+                        await self._docker("rmi", task.result()["image_tag"])
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            raise DockerSandboxError(
+                "Failed to retrieve tools from MCP server: " + "; ".join(errors)
             )
-            setup_script = self.try_template_file(repository_url)
-        else:
-            # Ask OpenAI to generate the setup script.
+
+        # Publish the image of the winning candidate under the canonical tag.
+        image_tag = self.get_image_tag_from_repo_url(repository_url)
+        await self._docker("tag", winner["image_tag"], image_tag)
+        await self._docker("rmi", winner["image_tag"])
+        self.images.add(image_tag)
+        # Snapshots of the previous image are stale.
+        if snapshots.SNAPSHOT_MODE != "off":
+            await self._drop_snapshot(image_tag, snapshots.SNAPSHOT_MODE)
+
+        logger.info(
+            f"Discovered {repository_url} with the {winner['strategy']} strategy"
+        )
+        print(f"Got tools: {winner['tools']}")
+
+        return {
+            "overview": "MCP Server Repository",
+            "tools": winner["tools"],
+            "bootstrap_metadata": {
+                "repository_url": repository_url,
+                "setup_script": winner["setup_script"],
+                "container_image_tag": image_tag,
+            },
+        }
+
+    async def _candidate_setup_script(
+        self, strategy: str, repository_url: str, repository_readme: str
+    ) -> str:
+        """Produce the setup script of a discovery strategy."""
+        if strategy == "pip":
+            return self.try_template_file(repository_url)
+        if strategy == "uvx":
+            return self.try_template_file(
+                repository_url, UVX_SETUP_SCRIPT_TEMPLATE_PATH
+            )
+        if strategy == "llm":
             logger.info(f"Using OpenAI to generate setup script for {repository_url}")
-            setup_script = self.ask_openai(repository_url, repository_readme)
+            return await self.ask_openai(repository_url, repository_readme)
+        raise ValueError(f"Unsupported discovery strategy: {strategy}")
+
+    async def _try_candidate(
+        self,
+        strategy: str,
+        repository_url: str,
+        repository_readme: str,
+        revision: str,
+        setup_script: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """Install a candidate setup script in its own container and list tools.
+
+        Returns:
+            Dictionary with the strategy, setup script, tools and the tag of
+            the image built for the candidate
 
-        logger.debug(f"Generated set-up script for MCP server at url: {repository_url}")
+        Raises:
+            Exception: If the server could not be installed or listed no tools
+        """
+        if setup_script is None:
+            setup_script = await self._candidate_setup_script(
+                strategy, repository_url, repository_readme
+            )
+        logger.debug(f"Candidate {strategy} set-up script for {repository_url}")
         logger.debug(f"{setup_script}")
 
-        overview = "MCP Server Repository"
-        tools: list[Any] = []
-        # TODO: update
+        image_tag = f"{self.get_image_tag_from_repo_url(repository_url)}-{strategy}"
         bootstrap_metadata = {
             "repository_url": repository_url,
             "setup_script": setup_script,
         }
+        response = await self.start(
+            bootstrap_metadata, revision=revision, image_tag=image_tag
+        )
+        if response.get("response_code") != "200":
+            raise DockerSandboxError(response.get("error_description"))
+        sandbox_id = response["sandbox_id"]
 
-        # Start docker container
-        response = await self.start(bootstrap_metadata)
-        sandbox_id = response.get("sandbox_id", "")
-
-        (container, instance) = self.instances.get(sandbox_id, [None, None])
+        succeeded = False
         try:
-            if container is not None and instance is not None:
-                tools = instance.get_tools(container)
-            else:
-                return {
-                    "response_code": "404",
-                    "error_description": f"Sandbox {sandbox_id} not found",
-                }
+            container, instance = self.instances[sandbox_id]
+            # An image that was already discovered lists the same tools.
+            tools = self._cached_tools(sandbox_id)
+            if tools is None:
+                tools = await asyncio.to_thread(instance.get_tools, container)
+                self._cache_tools(sandbox_id, tools)
+            if not isinstance(tools, list) or not tools:
+                raise DockerSandboxError("MCP server listed no tools")
+            succeeded = True
+        except asyncio.CancelledError:
+            # Losing the race says nothing about whether the script works.
+            raise
         except Exception:
             logger.error(
                 f"Error getting tools for sandbox {sandbox_id} from repo {repository_url}"
             )
-
+            # Do not serve a setup script that does not work from the cache.
+            if strategy == "llm":
+                self.setup_scripts.invalidate(repository_url, repository_readme)
+            raise
+        finally:
             # Attempt to stop the sandbox and check for errors.
-            stop_response: dict[str, Any] = await self.stop(sandbox_id)
+            stop_response: dict[str, Any] = await asyncio.shield(self.stop(sandbox_id))
             if stop_response.get("response_code") != "200":
-                logger.error(
-                    f"Failed to stop sandbox {sandbox_id} after error: {stop_response}"
-                )
+                logger.error(f"Failed to stop sandbox {sandbox_id}: {stop_response}")
 
-            # Clean up the sandbox instance.
-            await self.cleanup(sandbox_id)
-
-            return {
-                "response_code": "500",
-                "error_description": "Failed to retrieve tools from MCP server",
-            }
-
-        await self.stop(sandbox_id)
-
-        print(f"Got tools: {tools}")
+            # Clean up the sandbox instance, keeping the image of a candidate
+            # that worked.
+            await asyncio.shield(self.cleanup(sandbox_id, remove_image=not succeeded))
 
         return {
-            "overview": overview,
+            "strategy": strategy,
+            "setup_script": setup_script,
             "tools": tools,
-            "bootstrap_metadata": bootstrap_metadata,
+            "image_tag": image_tag,
         }
 
     def _start_docker_container(
-        self, sandbox_id: str, bootstrap_metadata: dict[str, Any], port: int
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: Optional[int],
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
     ) -> DockerContainer:
         container: DockerContainer = DockerContainer()
         container.start(
             sandbox_id=sandbox_id,
             bootstrap_metadata=bootstrap_metadata,
             port=port,
+            image=image,
+            checkpoint=checkpoint,
         )
         return container
 
+    def _start_from_snapshot(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: Optional[int],
+        snapshot: Optional[Snapshot] = None,
+    ) -> DockerContainer:
+        """Start a container from a snapshot, falling back to its image.
+
+        A CRIU checkpoint that fails to restore is retried with the files of
+        the snapshot only, and then with the image the snapshot was taken of.
+        """
+        attempts: list[tuple[Optional[str], Optional[tuple[str, str]]]] = []
+        if snapshot is not None:
+            if snapshot.checkpoint is not None:
+                attempts.append((snapshot.image, snapshot.checkpoint))
+            attempts.append((snapshot.image, None))
+        attempts.append((None, None))
+
+        for image, checkpoint in attempts[:-1]:
+            try:
+                container = self._start_docker_container(
+                    sandbox_id, bootstrap_metadata, port, image, checkpoint
+                )
+                logger.info(f"Started sandbox {sandbox_id} from snapshot {image}")
+                return container
+            except Exception as e:
+                logger.warning(f"Failed to start from snapshot {image}: {e}")
+        return self._start_docker_container(sandbox_id, bootstrap_metadata, port)
+
+    async def _get_snapshot(self, image_tag: str, mode: str) -> Optional[Snapshot]:
+        """Return the snapshot of an image, including one left by a previous run."""
+        if image_tag not in self.snapshots:
+            snapshot = await asyncio.to_thread(snapshots.find_snapshot, image_tag, mode)
+            if snapshot is None:
+                return None
+            self.snapshots[image_tag] = snapshot
+        return self.snapshots[image_tag]
+
+    async def _drop_snapshot(self, image_tag: str, mode: str) -> None:
+        """Remove the snapshot of an image, e.g. after the image was rebuilt."""
+        snapshot = self.snapshots.pop(image_tag, None)
+        if snapshot is None:
+            snapshot = await asyncio.to_thread(snapshots.find_snapshot, image_tag, mode)
+        if snapshot is not None:
+            await snapshots.remove_snapshot(snapshot)
+
+    def _maybe_snapshot(self, sandbox_id: str) -> None:
+        """Snapshot a sandbox in the background after its first tools/list."""
+        if sandbox_id not in self._snapshot_candidates:
+            return
+        self._snapshot_candidates.discard(sandbox_id)
+        container, _ = self.instances[sandbox_id]
+        image_tag = container.image
+        if image_tag in self.snapshots or image_tag in self._snapshot_tasks:
+            return
+
+        async def snapshot() -> None:
+            try:
+                self.snapshots[image_tag] = await snapshots.take_snapshot(
+                    container, image_tag, snapshots.SNAPSHOT_MODE
+                )
+            except Exception as e:
+                logger.error(f"Failed to snapshot sandbox {sandbox_id}: {e}")
+            finally:
+                del self._snapshot_tasks[image_tag]
+
+        self._snapshot_tasks[image_tag] = asyncio.create_task(snapshot())
+
+    async def _image_digest(self, image_tag: str) -> Optional[str]:
+        """Return the digest of an image, or None if it cannot be inspected."""
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "docker",
+                "image",
+                "inspect",
+                "--format",
+                "{{.Id}}",
+                image_tag,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, _ = await proc.communicate()
+        except OSError as e:
+            logger.warning(f"Failed to inspect image {image_tag}: {e}")
+            return None
+        if proc.returncode != 0:
+            return None
+        return stdout.decode().strip() or None
+
+    def _cached_tools(self, sandbox_id: str) -> Optional[list[Any]]:
+        """Return the cached tools of the image of a sandbox, if still valid."""
+        digest = self._sandbox_digests.get(sandbox_id)
+        if digest is None:
+            return None
+        _, instance = self.instances[sandbox_id]
+        if instance.tools_list_changed:
+            logger.info(f"Tools of sandbox {sandbox_id} changed, listing them again")
+            self.tool_lists.pop(digest, None)
+            return None
+        tools = self.tool_lists.get(digest)
+        if tools is not None:
+            logger.info(f"Using cached tools for sandbox {sandbox_id}")
+        return tools
+
+    def _cache_tools(self, sandbox_id: str, tools: Any) -> None:
+        """Cache the tools listed by a sandbox for the image it runs."""
+        digest = self._sandbox_digests.get(sandbox_id)
+        if digest is not None and isinstance(tools, list) and tools:
+            self.tool_lists[digest] = tools
+
     def _check_if_docker_image_exists(self, tag: str) -> bool:
         proc = subprocess.run(
             ["docker", "image", "ls", "--quiet", "--filter", f"reference={tag}"],
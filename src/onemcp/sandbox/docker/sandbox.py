@@ -11,7 +11,9 @@ import subprocess
 import tempfile
 import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+from src.onemcp.sandbox.store import CONTAINER_LABEL
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,7 @@ class DockerSandboxError(Exception):
 class DockerContainer:
     name: str
     image: str
+    port: Optional[int]
     proc: subprocess.Popen
 
     def pid(self) -> int:
@@ -41,6 +44,10 @@ class DockerContainer:
         """
         return self.proc.pid
 
+    def is_running(self) -> bool:
+        """Return whether the process running the docker container is alive."""
+        return self.proc.poll() is None
+
     def _ensure_container_up(
         self, name: str, attempts: int = 5, wait_seconds: float = 1.0
     ) -> None:
@@ -78,8 +85,25 @@ class DockerContainer:
         raise RuntimeError(f"Container '{name}' is not Up after {attempts} attempts.")
 
     def start(
-        self, sandbox_id: str, bootstrap_metadata: dict[str, Any], port: int
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: Optional[int],
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
     ) -> None:
+        """
+        Start the container of a sandbox.
+
+        Args:
+            sandbox_id: Name of the container
+            bootstrap_metadata: Metadata required to start the sandbox
+            port: Host port mapped to the container (None not to map any)
+            image: Image to run instead of `container_image_tag`, e.g. a
+                snapshot of it
+            checkpoint: Directory and name of a CRIU checkpoint of the
+                server process to restore
+        """
         # Create temporary directory for this sandbox
         self.name: str = sandbox_id
         sandbox_dir = Path(tempfile.mkdtemp(prefix=f"sandbox_{self.name}_"))
@@ -94,17 +118,24 @@ class DockerContainer:
                 )
             self.image = container_image_tag
 
-            # Run Docker container
+            # Run Docker container, detached so that it outlives the sandbox
+            # API, with its STDIN kept open for the sessions attached to it.
             run_cmd = [
                 "docker",
-                "run",
+                # A restored container is created first, then started from
+                # the checkpoint.
+                *(["create"] if checkpoint else ["run", "-d"]),
                 "-i",
-                "-p",
-                f"{port}:8000",  # Port mapping
                 "--name",
                 self.name,
+                "--label",
+                f"{CONTAINER_LABEL}={self.name}",
             ]
 
+            # Port mapping, for servers that are not reached over STDIO
+            if port is not None:
+                run_cmd.extend(["-p", f"{port}:8000"])
+
             # Add environment variables (if any are provided)
             env_vars = bootstrap_metadata.get("environment_variables", {})
             for key, value in env_vars.items():
@@ -115,7 +146,7 @@ class DockerContainer:
             run_cmd.extend(["-w", working_dir])
 
             # Add image tag
-            run_cmd.append(container_image_tag)
+            run_cmd.append(image or container_image_tag)
 
             # Add entrypoint if specified
             entrypoint = bootstrap_metadata.get("entrypoint")
@@ -125,15 +156,21 @@ class DockerContainer:
             logger.info(f"Starting Docker container: {' '.join(run_cmd)}")
 
             self.port = port
-            self.proc = subprocess.Popen(
-                run_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                # TODO: un-comment so that we do not pollute the logs
-                # stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-            )
+            subprocess.run(run_cmd, capture_output=True, check=True)
+            if checkpoint:
+                checkpoint_dir, checkpoint_name = checkpoint
+                run_cmd = [
+                    "docker",
+                    "start",
+                    "--checkpoint-dir",
+                    checkpoint_dir,
+                    "--checkpoint",
+                    checkpoint_name,
+                    self.name,
+                ]
+                logger.info(f"Restoring Docker container: {' '.join(run_cmd)}")
+                subprocess.run(run_cmd, capture_output=True, check=True)
+            self._attach()
 
             # Make sure that the container is up and running before returing.
             self._ensure_container_up(self.name)
@@ -143,6 +180,47 @@ class DockerContainer:
             shutil.rmtree(sandbox_dir, ignore_errors=True)
             raise DockerSandboxError(f"Failed to start container: {e}") from e
 
+    @classmethod
+    def attach(cls, name: str, image: str, port: Optional[int]) -> "DockerContainer":
+        """
+        Attach to the container of a sandbox that is already running, e.g.
+        one started before the sandbox API restarted.
+
+        Args:
+            name: Name of the container
+            image: Image the container was started from
+            port: Host port mapped to the container
+        """
+        container = cls()
+        container.name = name
+        container.image = image
+        container.port = port
+        try:
+            container._attach()
+            container._ensure_container_up(name, attempts=1)
+        except Exception as e:
+            raise DockerSandboxError(f"Failed to attach to container: {e}") from e
+        return container
+
+    def _attach(self) -> None:
+        """Attach to the STDIO of the container."""
+        # Signals to the attached process are not forwarded to the container,
+        # which keeps running once the process is gone.
+        self.proc = subprocess.Popen(
+            ["docker", "attach", "--sig-proxy=false", self.name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # TODO: un-comment so that we do not pollute the logs
+            # stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+    def detach(self) -> None:
+        """Detach from the STDIO of the container, leaving it running."""
+        if self.proc.poll() is None:
+            self.proc.terminate()
+
     async def stop(self) -> None:
         try:
             # Stop the container
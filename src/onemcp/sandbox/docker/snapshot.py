@@ -0,0 +1,175 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Snapshots of initialized MCP server containers."""
+
+import asyncio
+import functools
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+
+logger = logging.getLogger(__name__)
+
+# Supported snapshot modes: "off", "fs" (commit the container filesystem), and
+# "criu" (also checkpoint the process state, falling back to "fs").
+SNAPSHOT_MODES = ("off", "fs", "criu")
+SNAPSHOT_MODE = os.getenv("ONEMCP_SANDBOX_SNAPSHOT", "off").lower()
+if SNAPSHOT_MODE not in SNAPSHOT_MODES:
+    logger.warning(
+        f"Unknown snapshot mode {SNAPSHOT_MODE!r}, expected one of "
+        f"{', '.join(SNAPSHOT_MODES)}; disabling snapshots"
+    )
+    SNAPSHOT_MODE = "off"
+SNAPSHOT_DIR = os.getenv(
+    "ONEMCP_SANDBOX_SNAPSHOT_DIR",
+    os.path.join(tempfile.gettempdir(), "onemcp-checkpoints"),
+)
+
+# Name of the CRIU checkpoint of a snapshot.
+CHECKPOINT_NAME = "initialized"
+
+
+@dataclass
+class Snapshot:
+    """
+    Snapshot of a container taken once its MCP server was initialized.
+
+    Attributes:
+        image: Image holding the filesystem of the container
+        checkpoint_dir: Directory holding the CRIU checkpoint of the server
+            process (None if only the filesystem was saved)
+    """
+
+    image: str
+    checkpoint_dir: Optional[str] = None
+
+    @property
+    def checkpoint(self) -> Optional[tuple[str, str]]:
+        """Checkpoint directory and name to restore, if any."""
+        if self.checkpoint_dir is None:
+            return None
+        return self.checkpoint_dir, CHECKPOINT_NAME
+
+
+def snapshot_tag(image_tag: str) -> str:
+    """Return the tag of the snapshot of `image_tag`."""
+    return f"{image_tag}-snapshot"
+
+
+def _checkpoint_dir(image_tag: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", image_tag))
+
+
+@functools.cache
+def criu_available() -> bool:
+    """Tell whether the Docker daemon can checkpoint containers with CRIU."""
+    if shutil.which("criu") is None:
+        return False
+    proc = subprocess.run(
+        ["docker", "info", "--format", "{{.ExperimentalBuild}}"],
+        capture_output=True,
+        text=True,
+    )
+    return proc.returncode == 0 and proc.stdout.strip() == "true"
+
+
+async def _docker(*args: str) -> None:
+    proc = await asyncio.create_subprocess_exec(
+        "docker",
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"docker {' '.join(args)} failed: {stderr.decode().strip()}")
+
+
+def find_snapshot(image_tag: str, mode: str = SNAPSHOT_MODE) -> Optional[Snapshot]:
+    """Return the snapshot of `image_tag` left by a previous run, if any."""
+    if mode == "off":
+        return None
+    proc = subprocess.run(
+        [
+            "docker",
+            "image",
+            "ls",
+            "--quiet",
+            "--filter",
+            f"reference={snapshot_tag(image_tag)}",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    checkpoint_dir = _checkpoint_dir(image_tag)
+    if mode == "criu" and os.path.isdir(os.path.join(checkpoint_dir, CHECKPOINT_NAME)):
+        return Snapshot(snapshot_tag(image_tag), checkpoint_dir)
+    return Snapshot(snapshot_tag(image_tag))
+
+
+async def take_snapshot(
+    container: DockerContainer, image_tag: str, mode: str = SNAPSHOT_MODE
+) -> Snapshot:
+    """
+    Snapshot a running container whose MCP server is initialized.
+
+    Args:
+        container: Container to snapshot, which keeps running
+        image_tag: Image the container was started from
+        mode: "fs" or "criu"
+
+    Returns:
+        The snapshot
+    """
+    tag = snapshot_tag(image_tag)
+    use_criu = mode == "criu" and criu_available()
+    if mode == "criu" and not use_criu:
+        logger.warning("CRIU checkpoints are not available, snapshotting files only")
+
+    # The process must not write files while they are committed if its state
+    # is checkpointed along with them.
+    await _docker("commit", f"--pause={str(use_criu).lower()}", container.name, tag)
+    logger.info(f"Committed container {container.name} to {tag}")
+    if not use_criu:
+        return Snapshot(tag)
+
+    checkpoint_dir = _checkpoint_dir(image_tag)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    try:
+        await _docker(
+            "checkpoint",
+            "create",
+            "--leave-running",
+            "--checkpoint-dir",
+            checkpoint_dir,
+            container.name,
+            CHECKPOINT_NAME,
+        )
+    except RuntimeError as e:
+        logger.warning(f"Failed to checkpoint {container.name}, files only: {e}")
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        return Snapshot(tag)
+
+    logger.info(f"Checkpointed container {container.name} to {checkpoint_dir}")
+    return Snapshot(tag, checkpoint_dir)
+
+
+async def remove_snapshot(snapshot: Snapshot) -> None:
+    """Remove the image and checkpoint of a snapshot."""
+    if snapshot.checkpoint_dir is not None:
+        shutil.rmtree(snapshot.checkpoint_dir, ignore_errors=True)
+    try:
+        await _docker("rmi", snapshot.image)
+    except RuntimeError as e:
+        logger.warning(f"Failed to remove snapshot {snapshot.image}: {e}")
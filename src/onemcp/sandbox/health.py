@@ -0,0 +1,166 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Health of the MCP servers of sandboxes, guarded by a circuit breaker.
+
+A server whose calls keep failing, whose process exited, or which writes
+output that is not JSON-RPC trips its breaker: calls then fail at once
+instead of waiting for a timeout each. Once the breaker has been open for a
+while, a single call is let through to probe the server, and its outcome
+closes or reopens the breaker. Servers that exited stay unavailable until
+their container is restarted.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# Consecutive failed calls that open the breaker.
+BREAKER_FAILURES = int(os.getenv("ONEMCP_BREAKER_FAILURES", "3"))
+
+# Consecutive lines of invalid output that open the breaker.
+BREAKER_GARBAGE_LINES = int(os.getenv("ONEMCP_BREAKER_GARBAGE_LINES", "10"))
+
+# Seconds the breaker stays open before a call probes the server.
+BREAKER_RESET_TIMEOUT = float(os.getenv("ONEMCP_BREAKER_RESET_TIMEOUT", "30"))
+
+# Whether sandboxes whose breaker opened are restarted from their image.
+AUTO_RESTART = os.getenv("ONEMCP_SANDBOX_AUTO_RESTART", "true").lower() == "true"
+
+# Maximum number of restarts of a sandbox.
+MAX_RESTARTS = int(os.getenv("ONEMCP_SANDBOX_MAX_RESTARTS", "3"))
+
+# States of a circuit breaker.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpen(Exception):
+    """Raised when a call is refused because the breaker of its server is open."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class SandboxHealth:
+    """Health of the MCP server of a sandbox, updated from several threads."""
+
+    failure_threshold: int = BREAKER_FAILURES
+    garbage_threshold: int = BREAKER_GARBAGE_LINES
+    reset_timeout: float = BREAKER_RESET_TIMEOUT
+    state: str = CLOSED
+    consecutive_failures: int = 0
+    failures: int = 0
+    # Consecutive lines written by the server that were not JSON-RPC.
+    garbage_lines: int = 0
+    # Whether the server process exited, or closed its output.
+    exited: bool = False
+    restarts: int = 0
+    last_error: Optional[str] = None
+    opened_at: Optional[float] = None
+    # Whether a call probing the server of a half-open breaker is running.
+    _probing: bool = field(default=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def before_call(self) -> None:
+        """
+        Check that a call may be sent to the server.
+
+        Raises:
+            CircuitOpen: If the breaker is open, or another call is probing
+                the server.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            elapsed = time.monotonic() - (self.opened_at or 0)
+            if self.state == OPEN and not self.exited:
+                if elapsed >= self.reset_timeout:
+                    self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpen(
+                f"MCP server is unavailable: {self.last_error}",
+                max(self.reset_timeout - elapsed, 1),
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            if (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self._open()
+            self._probing = False
+
+    def record_abandoned(self) -> None:
+        """Record a call the caller gave up on, which says nothing of the server."""
+        with self._lock:
+            self._probing = False
+
+    def record_exit(self, reason: str) -> None:
+        with self._lock:
+            self.exited = True
+            self.last_error = reason
+            self._open()
+
+    def record_output(self, valid: bool) -> bool:
+        """
+        Record a line of output of the server.
+
+        Returns:
+            Whether the line opened the breaker.
+        """
+        with self._lock:
+            if valid:
+                self.garbage_lines = 0
+                return False
+            self.garbage_lines += 1
+            if self.garbage_lines < self.garbage_threshold or self.state == OPEN:
+                return False
+            self.last_error = "MCP server wrote invalid output"
+            self._open()
+            return True
+
+    def record_restart(self) -> None:
+        """Reset the health of a server restarted in a new container."""
+        with self._lock:
+            self.restarts += 1
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.garbage_lines = 0
+            self.exited = False
+            self.opened_at = None
+            self._probing = False
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.failures,
+                "garbage_lines": self.garbage_lines,
+                "exited": self.exited,
+                "restarts": self.restarts,
+                "last_error": self.last_error,
+            }
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
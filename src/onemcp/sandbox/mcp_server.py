@@ -1,23 +1,29 @@
 # Copyright(c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import json
+import contextlib
 import logging
-import time
-from dataclasses import dataclass
-from typing import Any
+import threading
+import uuid
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, Optional
 
+from src.onemcp.messages import Request, Response
 from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.health import SandboxHealth
+from src.onemcp.sandbox.transport import (
+    DEFAULT_READ_TIMEOUT,
+    RESULT_PREFIX,
+    RequestCancelled,
+    Transport,
+    create_transport,
+)
+from src.onemcp.serialization import loads
 
 # Default protocol version for MCP server communication
 DEFAULT_PROTOCOL_VERSION: str = "2024-11-05"
 
-# Default read delay when reading data from a container.
-DEFAULT_READ_DELAY: float = 0.01
-
-# Default timeout for reading data from a container.
-DEFAULT_READ_TIMEOUT: float = 60.0
-
 logger = logging.getLogger(__name__)
 
 
@@ -27,121 +33,195 @@ class McpServer:
 
     endpoint: str
     status: str = "running"
-
-    def _initialize(
-        self, protocol_version: str = DEFAULT_PROTOCOL_VERSION
-    ) -> dict[str, Any]:
+    # Whether the session with the server was initialized.
+    initialized: bool = field(default=False, compare=False)
+    # Whether the server notified that its tools changed since the last
+    # tools/list.
+    tools_list_changed: bool = field(default=False, compare=False)
+    # How to reach the server: "stdio" or "streamable-http".
+    transport: str = "stdio"
+    # Path of the MCP endpoint of servers speaking HTTP.
+    path: str = "/mcp"
+    # Health of the server, kept across restarts of its container.
+    health: SandboxHealth = field(default_factory=SandboxHealth, compare=False)
+    _transport: Optional[Transport] = field(default=None, compare=False, repr=False)
+    _transport_lock: threading.Lock = field(
+        default_factory=threading.Lock, compare=False, repr=False
+    )
+    _init_lock: threading.Lock = field(
+        default_factory=threading.Lock, compare=False, repr=False
+    )
+    # Callbacks of the tool calls in progress, by progress token.
+    _progress_handlers: dict[Any, Callable[[dict[str, Any]], None]] = field(
+        default_factory=dict, compare=False, repr=False
+    )
+
+    def _initialize(self, protocol_version: str = DEFAULT_PROTOCOL_VERSION) -> Request:
         """
-        Constructs and returns a JSON-RPC 2.0 initialization request payload.
+        Constructs and returns a JSON-RPC 2.0 initialization request.
 
         Args:
             protocol_version (str, optional): The protocol version to use in the request.
                 Defaults to DEFAULT_PROTOCOL_VERSION.
 
         Returns:
-            dict[str, Any]: A dictionary representing the JSON-RPC initialization request,
-                including protocol version, capabilities, and client information.
-        """
-        return {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "initialize",
-            "params": {
+            Request: The JSON-RPC initialization request, including protocol
+                version, capabilities, and client information.
+        """
+        return Request(
+            id=1,
+            method="initialize",
+            params={
                 "protocolVersion": protocol_version,
                 "capabilities": {},
                 "clientInfo": {"name": "cli-mcp", "version": "0.1"},
             },
-        }
+        )
 
-    def _notif_initialized(self) -> dict[str, str]:
+    def _notif_initialized(self) -> Request:
         """
         Creates a JSON-RPC notification message indicating that the server has been initialized.
 
         Returns:
-            dict[str, str]: A dictionary representing the JSON-RPC notification with
-            the "jsonrpc" version set to "2.0" and the "method" set to "notifications/initialized".
+            Request: The JSON-RPC notification with the "method" set to
+            "notifications/initialized".
         """
-        return {"jsonrpc": "2.0", "method": "notifications/initialized"}
+        return Request(method="notifications/initialized")
 
-    def _tools_list(self) -> dict[str, Any]:
+    def _tools_list(self) -> Request:
         """
-        Constructs and returns a JSON-RPC request dictionary for listing available tools.
+        Constructs and returns a JSON-RPC request for listing available tools.
 
         Returns:
-            dict[str, Any]: A dictionary representing a JSON-RPC 2.0 request with the method
-            "tools/list" and empty parameters.
+            Request: A JSON-RPC 2.0 request with the method "tools/list" and
+            empty parameters.
         """
-        return {"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}}
+        return Request(id=2, method="tools/list")
 
-    def send(self, proc: DockerContainer, obj: dict[str, Any]) -> None:
+    def _get_transport(self, container: DockerContainer) -> Transport:
         """
-        Sends a JSON-encoded dictionary object to a DockerContainer process.
+        Returns the transport to the MCP server, creating it on first use.
 
         Args:
-            proc (DockerContainer): The Docker container process to send data to.
-            obj (dict[str, Any]): The dictionary object to be serialized and sent.
+            container (DockerContainer): The Docker container instance where the MCP server is running.
 
         Returns:
-            None
+            Transport: The transport selected for the server.
+        """
+        with self._transport_lock:
+            if self._transport is None:
+                self._transport = create_transport(
+                    self.transport,
+                    container,
+                    self.endpoint,
+                    self._on_notification,
+                    self.path,
+                    self.health,
+                )
+            return self._transport
 
-        Notes:
-            The dictionary is serialized to a compact JSON string and a newline character is
-            appended. The resulting string is written to the DockerContainer process.
+    @contextlib.contextmanager
+    def _guarded(self, container: DockerContainer) -> Iterator[None]:
         """
-        line: str = json.dumps(obj, separators=(",", ":")) + "\n"
-        proc.write(line)
+        Runs an exchange with the MCP server under its circuit breaker.
+
+        Failures to reach the server count against its health, while errors
+        returned by the server and calls that ran out of time do not. Errors
+        returned by the server must be raised outside of this context.
 
-    def _read_until_id(
+        Args:
+            container (DockerContainer): The Docker container instance where the MCP server is running.
+
+        Raises:
+            CircuitOpen: If the breaker of the server is open.
+        """
+        if (
+            self.transport == "stdio"
+            and not self.health.exited
+            and not container.is_running()
+        ):
+            self.health.record_exit("MCP server exited")
+        self.health.before_call()
+        try:
+            yield
+        except (RequestCancelled, TimeoutError):
+            # Slow calls hit the deadline of their caller, and tight
+            # deadlines must not restart servers that are merely busy.
+            self.health.record_abandoned()
+            raise
+        except Exception as e:
+            self.health.record_failure(str(e))
+            raise
+        self.health.record_success()
+
+    def _on_notification(self, msg: dict[str, Any]) -> None:
+        """
+        Handles a notification sent by the MCP server.
+
+        Args:
+            msg (dict[str, Any]): The JSON-RPC notification.
+        """
+        if msg["method"] == "notifications/tools/list_changed":
+            self.tools_list_changed = True
+        elif msg["method"] == "notifications/progress":
+            params = msg.get("params", {})
+            handler = self._progress_handlers.get(params.get("progressToken"))
+            if handler is not None:
+                handler(params)
+
+    def send(self, proc: DockerContainer, obj: Request) -> None:
+        """
+        Sends a JSON-RPC notification to the MCP server running in a DockerContainer.
+
+        Args:
+            proc (DockerContainer): The Docker container process to send data to.
+            obj (Request): The notification to be serialized and sent.
+        """
+        self._get_transport(proc).notify(obj)
+
+    def _request(
         self,
         container: DockerContainer,
-        expect_id: int,
+        message: Request,
         timeout: float = DEFAULT_READ_TIMEOUT,
-    ) -> dict[str, Any]:
+    ) -> Response:
         """
-        Reads lines from the DockerContainer's output until a JSON-RPC response
-        with the specified 'id' is received or a timeout occurs.
+        Sends a JSON-RPC request to the MCP server and waits for its response.
 
         Args:
-            container (DockerContainer): The Docker container process to read from.
-            expect_id (int): The JSON-RPC response 'id' to wait for.
+            container (DockerContainer): The Docker container process to send the request to.
+            message (Request): The JSON-RPC request.
             timeout (float, optional): Maximum time in seconds to wait for the response.
                 Defaults to DEFAULT_READ_TIMEOUT.
 
         Returns:
-            dict[str, Any]: The parsed JSON-RPC response dictionary with the expected 'id'.
+            Response: The JSON-RPC response, with the id of the request.
+        """
+        return self._get_transport(container).request(message, timeout)
+
+    def _ensure_initialized(self, container: DockerContainer) -> None:
+        """
+        Initializes the session with the MCP server, unless already done.
+
+        Args:
+            container (DockerContainer): The Docker container instance where the MCP server is running.
 
         Raises:
-            TimeoutError: If the expected response is not received within the timeout.
-
-        Notes:
-            - Lines that cannot be parsed as JSON are logged as warnings and ignored.
-            - Only responses with a matching 'id' are returned.
-            - Notifications (messages with a "method" but no "id") are ignored.
-        """
-        start = time.time()
-        while True:
-            if time.time() - start > timeout:
-                logger.error(
-                    f"Timeout waiting for response with id={expect_id} after {timeout} seconds"
-                )
-                raise TimeoutError(f"Timed out waiting for response id={expect_id}")
-            line: str = container.read()
-            if not line:
-                time.sleep(DEFAULT_READ_DELAY)
-                continue
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                msg = json.loads(line)
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to decode JSON: {e} - Line: {line}")
-                continue
-            if isinstance(msg, dict) and msg.get("id") == expect_id:
-                return msg
-            if "method" in msg and "id" not in msg:
-                # Notification received; ignore and continue reading.
-                pass
+            RuntimeError: If the server fails to initialize.
+        """
+        with self._init_lock:
+            if self.initialized:
+                return
+
+            # Send the initialization request.
+            init_resp = self._request(container, self._initialize())
+            if init_resp.error is not None:
+                logger.error(f"MCP server initialization failed: {init_resp.error}")
+                raise RuntimeError(f"Initialization error: {init_resp.error}")
+
+            # Send the initialized notification.
+            self.send(container, self._notif_initialized())
+            self.initialized = True
 
     def get_tools(self, container: DockerContainer) -> Any:
         """
@@ -155,68 +235,120 @@ class McpServer:
 
         Raises:
             RuntimeError: If an error occurs during initialization or tool retrieval.
+            CircuitOpen: If the breaker of the server is open.
         """
-        # Send the initialization request.
-        self.send(container, self._initialize())
-        init_resp = self._read_until_id(container, expect_id=1)
-        if "error" in init_resp:
-            logger.error(f"MCP server initialization failed: {init_resp['error']}")
-            raise RuntimeError(f"Initialization error: {init_resp['error']}")
-
-        # Send the initialized notification.
-        self.send(container, self._notif_initialized())
+        with self._guarded(container):
+            self._ensure_initialized(container)
 
-        # Request the list of tools.
-        self.send(container, self._tools_list())
-        tools_resp = self._read_until_id(container, expect_id=2)
+            # Request the list of tools.
+            self.tools_list_changed = False
+            tools_resp = self._request(container, self._tools_list())
 
-        if "error" in tools_resp:
+        if tools_resp.error is not None:
             logger.error(
-                f"Failed to retrieve tools from MCP server: {tools_resp['error']}"
+                f"Failed to retrieve tools from MCP server: {tools_resp.error}"
             )
-            raise RuntimeError(f"Tools retrieval error: {tools_resp['error']}")
+            raise RuntimeError(f"Tools retrieval error: {tools_resp.error}")
 
         logger.debug(f"Tools response: {tools_resp}")
-        result = tools_resp.get("result", {})
-        tools = result.get("tools", [])
+        tools = (tools_resp.result or {}).get("tools", [])
 
         logger.debug(f"Retrieved tools: {tools}")
 
         return tools
 
-    def call_tool(self, container: DockerContainer, body: dict[str, Any]) -> Any:
+    def call_tool(
+        self,
+        container: DockerContainer,
+        body: Request,
+        on_progress: Optional[Callable[[dict[str, Any]], None]] = None,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> dict[str, Any]:
         """
         Queries the MCP server running in the specified Docker container to run a specific tool.
 
         Args:
             container (DockerContainer): The Docker container instance where the MCP server is running.
             body: The body of the tools/call request
+            on_progress: Called from another thread with the parameters of
+                each progress notification of the call
+            timeout: Maximum time in seconds to wait for the response
+            cancelled: Set by the caller to give up on the call
 
         Returns:
-            Any: The response of the tool
+            dict[str, Any]: The JSON-RPC response of the tool
 
         Raises:
             RuntimeError: If an error occurs during initialization or tool execution.
+            TimeoutError: If the tool did not respond within the timeout.
+            RequestCancelled: If `cancelled` was set before the response.
+            CircuitOpen: If the breaker of the server is open.
         """
-        # Send the initialization request.
-        self.send(container, self._initialize())
-        init_resp = self._read_until_id(container, expect_id=1)
-        if "error" in init_resp:
-            logger.error(f"MCP server initialization failed: {init_resp['error']}")
-            raise RuntimeError(f"Initialization error: {init_resp['error']}")
+        token = None
+        if on_progress is not None:
+            # Ask the server to report progress under a token of the call.
+            meta = body.params.get("_meta", {})
+            token = meta.get("progressToken", f"onemcp-{uuid.uuid4()}")
+            body = body.with_meta(progressToken=token)
+            self._progress_handlers[token] = on_progress
+
+        # Call the tool.
+        try:
+            with self._guarded(container):
+                self._ensure_initialized(container)
+                tools_resp = self._get_transport(container).request(
+                    body, timeout, cancelled
+                )
+        finally:
+            if token is not None:
+                self._progress_handlers.pop(token, None)
 
-        # Send the initialized notification.
-        self.send(container, self._notif_initialized())
+        if tools_resp.error is not None:
+            logger.error(f"Failed to call tool from MCP server: {tools_resp.error}")
+            raise RuntimeError(f"Tool execution error: {tools_resp.error}")
 
-        # Request the list of tools.
-        body["id"] = 2
-        self.send(container, body)
-        tools_resp = self._read_until_id(container, expect_id=2)
+        logger.debug(f"Tools resp: {tools_resp}")
 
-        if "error" in tools_resp:
-            logger.error(f"Failed to call tool from MCP server: {tools_resp['error']}")
-            raise RuntimeError(f"Tool execution error: {tools_resp['error']}")
+        return tools_resp.to_dict()
 
-        logger.debug(f"Tools resp: {tools_resp}")
+    def call_tool_raw(
+        self,
+        container: DockerContainer,
+        body: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> bytes:
+        """
+        Runs a tool like `call_tool`, returning the encoded JSON-RPC response.
+
+        Successful responses are forwarded as the bytes the server wrote, with
+        the id of the request, so large results (e.g. base64 images) are never
+        decoded nor re-encoded.
+
+        Args:
+            container (DockerContainer): The Docker container instance where the MCP server is running.
+            body: The body of the tools/call request
+            timeout: Maximum time in seconds to wait for the response
+            cancelled: Set by the caller to give up on the call
+
+        Returns:
+            bytes: The JSON-RPC response of the tool
 
-        return tools_resp
+        Raises:
+            RuntimeError: If an error occurs during initialization or tool execution.
+            TimeoutError: If the tool did not respond within the timeout.
+            RequestCancelled: If `cancelled` was set before the response.
+            CircuitOpen: If the breaker of the server is open.
+        """
+        with self._guarded(container):
+            self._ensure_initialized(container)
+            raw = self._get_transport(container).request_raw(body, timeout, cancelled)
+        if RESULT_PREFIX.match(raw) is None:
+            # Not a plain result, so it may be an error.
+            tools_resp = Response.from_dict(loads(raw))
+            if tools_resp.error is not None:
+                logger.error(f"Failed to call tool from MCP server: {tools_resp.error}")
+                raise RuntimeError(f"Tool execution error: {tools_resp.error}")
+
+        return raw
@@ -0,0 +1,81 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Allocation of the host ports mapped to the containers of sandboxes."""
+
+import logging
+import os
+import socket
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of host ports, from the base port, that sandboxes may be mapped to.
+PORT_RANGE = int(os.getenv("ONEMCP_SANDBOX_PORT_RANGE", "1000"))
+
+
+def is_port_free(port: int) -> bool:
+    """Return whether a host port can be bound, e.g. by Docker."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # Ports released a moment ago may linger in TIME_WAIT, which does not
+        # keep Docker from binding them.
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("0.0.0.0", port))
+        except OSError:
+            return False
+    return True
+
+
+class PortAllocator:
+    """
+    Hands out host ports from a range, in constant time.
+
+    Free ports are kept in a queue, and released ports go to its back, so a
+    port is reused as late as possible. Ports bound by other processes are
+    skipped, and tried again after the other free ports.
+    """
+
+    def __init__(self, base_port: int, count: int = PORT_RANGE) -> None:
+        """
+        Initialize the allocator.
+
+        Args:
+            base_port: First port of the range
+            count: Number of ports in the range
+        """
+        self.base_port = base_port
+        self.count = count
+        self._free: deque[int] = deque(range(base_port, base_port + count))
+        self.used: set[int] = set()
+
+    def allocate(self) -> Optional[int]:
+        """Return a free port, or None if all ports are in use."""
+        for _ in range(len(self._free)):
+            port = self._free.popleft()
+            if is_port_free(port):
+                self.used.add(port)
+                return port
+            logger.debug(f"Port {port} is bound by another process, skipping it")
+            self._free.append(port)
+        return None
+
+    def reserve(self, port: int) -> None:
+        """Mark a port as in use, e.g. by a sandbox that was reattached to."""
+        if port in self.used:
+            return
+        if self.base_port <= port < self.base_port + self.count:
+            self._free.remove(port)
+        self.used.add(port)
+
+    def release(self, port: Optional[int]) -> None:
+        """Return a port to the free ports, if it is in use."""
+        if port is None or port not in self.used:
+            return
+        self.used.remove(port)
+        if self.base_port <= port < self.base_port + self.count:
+            self._free.append(port)
+
+    def __contains__(self, port: int) -> bool:
+        return port in self.used
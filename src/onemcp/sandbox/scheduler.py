@@ -0,0 +1,366 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Scheduler of a fleet of sandbox nodes.
+
+Each node is a sandbox API managing the containers of one Docker host. The
+scheduler speaks the same protocol as a node: it places new sandboxes on the
+node with the most spare capacity, preferring nodes that already have the
+image of the server, and routes the other requests to the node that owns
+their sandbox. Clients such as `SandboxAPI` point at the scheduler instead of
+a node.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from src.onemcp.sandbox.docker.registry import image_tag_from_repo_url
+from src.onemcp.serialization import FastJSONResponse, loads
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated base URLs of the sandbox nodes.
+SANDBOX_NODES = os.getenv("ONEMCP_SANDBOX_NODES", "http://localhost:8080")
+
+# Seconds between two polls of the load of the nodes.
+NODE_REFRESH_INTERVAL = float(os.getenv("ONEMCP_NODE_REFRESH_INTERVAL", "5"))
+
+# Headers of a request forwarded to a node, and of its response forwarded back.
+FORWARDED_REQUEST_HEADERS = (
+    "Accept",
+    "Content-Type",
+    "X-OneMCP-Caller",
+    "X-OneMCP-Deadline",
+    "X-OneMCP-Message-Type",
+)
+FORWARDED_RESPONSE_HEADERS = ("Content-Type", "Retry-After")
+
+# Response codes of a node that has no capacity left.
+NODE_SATURATED = ("429", "503")
+
+
+@dataclass
+class Node:
+    """A sandbox node, as last polled by the scheduler."""
+
+    url: str
+    instances: int = 0
+    max_instances: int = 0
+    images: set[str] = field(default_factory=set)
+    healthy: bool = True
+
+    def load(self) -> float:
+        """Return the fraction of the sandboxes of the node in use."""
+        if self.max_instances <= 0:
+            return 0.0
+        return self.instances / self.max_instances
+
+    def is_full(self) -> bool:
+        return 0 < self.max_instances <= self.instances
+
+
+class Scheduler:
+    """Places sandboxes on nodes and routes requests to their owner."""
+
+    def __init__(
+        self, urls: list[str], client: Optional[httpx.AsyncClient] = None
+    ) -> None:
+        self.nodes: dict[str, Node] = {}
+        for url in urls:
+            self.add_node(url)
+        # Node owning each sandbox, or session, by ID.
+        self.owners: dict[str, str] = {}
+        # Calls may run for long, so only connecting to a node times out.
+        self.client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(None, connect=5.0)
+        )
+
+    def add_node(self, url: str) -> Node:
+        """Add a node to the fleet, if it is not already part of it."""
+        url = url.rstrip("/")
+        if url not in self.nodes:
+            logger.info(f"Added sandbox node {url}")
+            self.nodes[url] = Node(url)
+        return self.nodes[url]
+
+    def candidates(self, image_tag: Optional[str] = None) -> list[Node]:
+        """Return the nodes a sandbox may be placed on, best first.
+
+        Nodes that already have the image come first, and then the least
+        loaded ones.
+        """
+        nodes = [n for n in self.nodes.values() if n.healthy and not n.is_full()]
+        return sorted(nodes, key=lambda n: (image_tag not in n.images, n.load()))
+
+    async def refresh(self) -> None:
+        """Poll the load and the images of all nodes."""
+        await asyncio.gather(*(self.refresh_node(n) for n in self.nodes.values()))
+
+    async def refresh_node(self, node: Node) -> None:
+        """Poll the load and the images of a node."""
+        try:
+            response = await self.client.post(
+                f"{node.url}/sandbox",
+                json={},
+                headers={"X-OneMCP-Message-Type": "GET_STATUS"},
+            )
+            response.raise_for_status()
+            status = loads(response.content)["node"]
+        except Exception as e:
+            if node.healthy:
+                logger.warning(f"Sandbox node {node.url} is unreachable: {e}")
+            node.healthy = False
+            return
+        node.instances = status["instances"]
+        node.max_instances = status["max_instances"]
+        node.images = set(status["images"])
+        node.healthy = True
+
+    async def place(
+        self, message_type: str, body: bytes, headers: dict[str, str]
+    ) -> Response:
+        """Forward a START or DISCOVER request to the best node for it.
+
+        A node that turns out to be saturated is skipped for the next one.
+        """
+        data = loads(body)
+        metadata = data.get("bootstrap_metadata", data)
+        image_tag = metadata.get("container_image_tag")
+        if image_tag is None and metadata.get("repository_url"):
+            image_tag = image_tag_from_repo_url(metadata["repository_url"])
+
+        response: Optional[httpx.Response] = None
+        for node in self.candidates(image_tag):
+            try:
+                response = await self.client.post(
+                    f"{node.url}/sandbox", content=body, headers=headers
+                )
+            except httpx.HTTPError as e:
+                logger.warning(f"Sandbox node {node.url} is unreachable: {e}")
+                node.healthy = False
+                continue
+            result = loads(response.content)
+            if result.get("response_code") in NODE_SATURATED:
+                logger.info(f"Sandbox node {node.url} is saturated")
+                node.instances = max(node.instances, node.max_instances)
+                continue
+            if result.get("response_code") == "200":
+                if message_type == "START":
+                    node.instances += 1
+                if "sandbox_id" in result:
+                    self.owners[result["sandbox_id"]] = node.url
+                tag = result.get("bootstrap_metadata", {}).get("container_image_tag")
+                node.images.update(t for t in (image_tag, tag) if t)
+            break
+
+        if response is None:
+            return FastJSONResponse(
+                {
+                    "response_code": "503",
+                    "error_description": "No sandbox node available",
+                },
+                status_code=503,
+            )
+        return Response(
+            response.content,
+            status_code=response.status_code,
+            headers=_response_headers(response),
+        )
+
+    async def route(
+        self, sandbox_id: str, body: bytes, headers: dict[str, str]
+    ) -> Response:
+        """Forward a request to the node owning `sandbox_id`, streaming its
+        response back as the node writes it."""
+        url = self.owners.get(sandbox_id) or await self._find_owner(sandbox_id)
+        if url is None:
+            return FastJSONResponse(
+                {
+                    "response_code": "404",
+                    "error_description": f"Sandbox {sandbox_id} not found",
+                }
+            )
+
+        node = self.nodes[url]
+        request = self.client.build_request(
+            "POST", f"{node.url}/sandbox", content=body, headers=headers
+        )
+        response = await self.client.send(request, stream=True)
+        if headers.get("X-OneMCP-Message-Type") == "STOP":
+            self.owners.pop(sandbox_id, None)
+        return StreamingResponse(
+            response.aiter_bytes(),
+            status_code=response.status_code,
+            headers=_response_headers(response),
+            background=BackgroundTask(response.aclose),
+        )
+
+    async def _find_owner(self, sandbox_id: str) -> Optional[str]:
+        """Ask the nodes which of them owns `sandbox_id`, e.g. after the
+        scheduler restarted."""
+
+        async def owns(node: Node) -> bool:
+            try:
+                response = await self.client.post(
+                    f"{node.url}/sandbox",
+                    json={"sandbox_id": sandbox_id},
+                    headers={"X-OneMCP-Message-Type": "GET_STATUS"},
+                )
+                return bool(loads(response.content).get("response_code") != "404")
+            except Exception:
+                return False
+
+        nodes = [n for n in self.nodes.values() if n.healthy]
+        for node, found in zip(nodes, await asyncio.gather(*map(owns, nodes))):
+            if found:
+                self.owners[sandbox_id] = node.url
+                return node.url
+        return None
+
+    async def status(self) -> dict[str, Any]:
+        """Return the load and the images of all nodes."""
+        return {
+            "nodes": {
+                node.url: {
+                    "healthy": node.healthy,
+                    "instances": node.instances,
+                    "max_instances": node.max_instances,
+                    "images": sorted(node.images),
+                }
+                for node in self.nodes.values()
+            }
+        }
+
+
+def _response_headers(response: httpx.Response) -> dict[str, str]:
+    return {
+        name: response.headers[name]
+        for name in FORWARDED_RESPONSE_HEADERS
+        if name in response.headers
+    }
+
+
+# Global scheduler instance
+scheduler = Scheduler([url for url in SANDBOX_NODES.split(",") if url])
+
+
+async def _refresh_nodes() -> None:
+    """Poll the nodes periodically, until cancelled."""
+    while True:
+        await scheduler.refresh()
+        await asyncio.sleep(NODE_REFRESH_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Poll the nodes while the scheduler runs."""
+    refresh = asyncio.ensure_future(_refresh_nodes())
+    yield
+    refresh.cancel()
+    await scheduler.client.aclose()
+
+
+app = FastAPI(
+    title="OneMCP Sandbox Scheduler",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+
+
+@app.post("/sandbox", response_model=None)
+async def sandbox_endpoint(
+    request: Request,
+    x_onemcp_message_type: str = Header(..., alias="X-OneMCP-Message-Type"),
+) -> dict[str, Any] | Response:
+    """Endpoint of the fleet, with the message types of a sandbox node.
+
+    START and DISCOVER requests are placed on a node, and GET_TOOLS,
+    CALL_TOOL, STOP and GET_STATUS requests are routed to the node owning
+    their sandbox. GET_STATUS without a sandbox_id returns the status of all
+    nodes, and REGISTER_NODE adds the node at the "url" of its payload.
+    """
+    body = await request.body()
+    headers = {
+        name: request.headers[name]
+        for name in FORWARDED_REQUEST_HEADERS
+        if name in request.headers
+    }
+    if "X-OneMCP-Caller" not in headers and request.client is not None:
+        headers["X-OneMCP-Caller"] = request.client.host
+
+    try:
+        data = loads(body)
+        if x_onemcp_message_type in ("START", "DISCOVER"):
+            return await scheduler.place(x_onemcp_message_type, body, headers)
+        elif x_onemcp_message_type == "REGISTER_NODE":
+            if "url" not in data:
+                return {
+                    "response_code": "400",
+                    "error_description": "Missing required field: url",
+                }
+            node = scheduler.add_node(data["url"])
+            await scheduler.refresh_node(node)
+            return {"response_code": "200"}
+        elif x_onemcp_message_type == "GET_STATUS" and "sandbox_id" not in data:
+            return await scheduler.status()
+        elif x_onemcp_message_type in ("GET_TOOLS", "CALL_TOOL", "STOP", "GET_STATUS"):
+            if "sandbox_id" not in data:
+                return {
+                    "response_code": "400",
+                    "error_description": "Missing required field: sandbox_id",
+                }
+            return await scheduler.route(str(data["sandbox_id"]), body, headers)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported message type: {x_onemcp_message_type}",
+            )
+
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=400, detail="Invalid JSON in request body"
+        ) from e
+    except httpx.HTTPError as e:
+        logger.error(f"Sandbox node error: {e}")
+        raise HTTPException(status_code=502, detail=str(e)) from e
+
+
+@app.get("/health")
+async def health_check() -> dict[str, str]:
+    """Health check endpoint."""
+    return {"status": "healthy", "service": "OneMCP Sandbox Scheduler"}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OneMCP Sandbox Scheduler")
+    parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8070, help="Port to bind to")
+    parser.add_argument(
+        "--node",
+        action="append",
+        default=[],
+        help="Base URL of a sandbox node, instead of ONEMCP_SANDBOX_NODES",
+    )
+    parser.add_argument("--log-level", default="info", help="Log level")
+
+    args = parser.parse_args()
+    if args.node:
+        scheduler.nodes.clear()
+    for url in args.node:
+        scheduler.add_node(url)
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
@@ -0,0 +1,275 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Generation of setup scripts for MCP servers, with caching."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Protocol
+
+from openai import AsyncOpenAI
+
+from src.onemcp.util.env import ONEMCP_SRC_ROOT
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_PROMPT_FILE_PATH = os.path.join(
+    ONEMCP_SRC_ROOT, "sandbox", "discovery-prompt-header.md"
+)
+SETUP_SCRIPT_TEMPLATE_PATH = os.path.join(
+    ONEMCP_SRC_ROOT, "sandbox", "try-install-mcp-server.sh"
+)
+UVX_SETUP_SCRIPT_TEMPLATE_PATH = os.path.join(
+    ONEMCP_SRC_ROOT, "sandbox", "try-uvx-mcp-server.sh"
+)
+SETUP_SCRIPT_CACHE_PATH = os.getenv(
+    "ONEMCP_SETUP_SCRIPT_CACHE",
+    os.path.join(ONEMCP_SRC_ROOT, "sandbox", "setup-scripts.sqlite3"),
+)
+SETUP_SCRIPT_MODEL = os.getenv("ONEMCP_SETUP_SCRIPT_MODEL", "gpt-4o")
+# Either "openai", or "offline" to fill in the heuristic template instead.
+SETUP_SCRIPT_PROVIDER = os.getenv("ONEMCP_SETUP_SCRIPT_PROVIDER", "openai")
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def fill_template(
+    repository_url: str, template_path: str = SETUP_SCRIPT_TEMPLATE_PATH
+) -> str:
+    """Fill in a heuristic setup script template for a repository."""
+    template_file_path = Path(template_path)
+
+    # Add the repository URL to the template
+    if not template_file_path.exists():
+        raise Exception(f"Error: File {template_file_path} does not exist.")
+    template_content = template_file_path.read_text()
+    return template_content.replace(
+        "REPOSITORY_URL=", f"REPOSITORY_URL={repository_url}"
+    )
+
+
+class SetupScriptProvider(Protocol):
+    """Produces the setup script of an MCP server."""
+
+    async def complete(
+        self, repository_url: str, system_prompt: str, prompt: str, model: str
+    ) -> str: ...
+
+
+class OpenAIProvider:
+    """Generates setup scripts with the OpenAI chat completions API."""
+
+    def __init__(self) -> None:
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # A single client keeps its connection pool across discoveries.
+        if self._client is None:
+            self._client = AsyncOpenAI()
+        return self._client
+
+    async def complete(
+        self, repository_url: str, system_prompt: str, prompt: str, model: str
+    ) -> str:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+        )
+        return response.choices[0].message.content or ""
+
+
+class OfflineProvider:
+    """
+    Stand-in provider that fills in the heuristic template, without any
+    network access. Used in tests and when no LLM is available.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def complete(
+        self, repository_url: str, system_prompt: str, prompt: str, model: str
+    ) -> str:
+        self.calls += 1
+        return fill_template(repository_url)
+
+
+def get_provider(name: str = SETUP_SCRIPT_PROVIDER) -> SetupScriptProvider:
+    """Return the setup script provider called `name`."""
+    if name == "openai":
+        return OpenAIProvider()
+    if name == "offline":
+        return OfflineProvider()
+    raise ValueError(f"Unsupported setup script provider: {name}")
+
+
+class SetupScriptCache:
+    """Persistent cache of generated setup scripts backed by SQLite."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS setup_scripts ("
+            " key TEXT PRIMARY KEY,"
+            " repository_url TEXT NOT NULL,"
+            " setup_script TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT setup_script FROM setup_scripts WHERE key = ?", (key,)
+            ).fetchone()
+        return str(row[0]) if row else None
+
+    def put(self, key: str, repository_url: str, setup_script: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO setup_scripts"
+                " (key, repository_url, setup_script, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, repository_url, setup_script, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM setup_scripts WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class SetupScriptGenerator:
+    """
+    Generates the setup scripts of MCP servers, at most once per input.
+
+    Scripts are cached on disk by repository URL, README, system prompt and
+    model, so rediscovering an unchanged repository does not call the model.
+    Concurrent requests for the same input share a single model call.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[SetupScriptProvider] = None,
+        cache_path: Optional[str] = SETUP_SCRIPT_CACHE_PATH,
+        model: str = SETUP_SCRIPT_MODEL,
+        system_prompt_path: str = DISCOVERY_PROMPT_FILE_PATH,
+    ) -> None:
+        """
+        Initialize the generator.
+
+        Args:
+            provider: Produces the scripts (selected by
+                ONEMCP_SETUP_SCRIPT_PROVIDER if None)
+            cache_path: Path to the on-disk cache (None disables it)
+            model: Model asked to write the scripts
+            system_prompt_path: Path to the system prompt given to the model
+        """
+        self.provider = provider or get_provider()
+        self.cache = SetupScriptCache(cache_path) if cache_path else None
+        self.model = model
+        self.system_prompt_path = system_prompt_path
+        self._system_prompt: Optional[str] = None
+        self._in_flight: dict[str, asyncio.Future[str]] = {}
+
+    @property
+    def system_prompt(self) -> str:
+        if self._system_prompt is None:
+            system_prompt_file = Path(self.system_prompt_path)
+            if not system_prompt_file.exists():
+                raise Exception(f"Error: File {system_prompt_file} does not exist.")
+
+            # Read the system prompt from the file.
+            self._system_prompt = system_prompt_file.read_text().strip()
+        return self._system_prompt
+
+    def cache_key(self, repository_url: str, repository_readme: str) -> str:
+        """Identify the inputs a setup script was generated from."""
+        return _sha256(
+            json.dumps(
+                [
+                    repository_url,
+                    _sha256(repository_readme),
+                    _sha256(self.system_prompt),
+                    self.model,
+                ]
+            )
+        )
+
+    async def generate(self, repository_url: str, repository_readme: str) -> str:
+        """
+        Return the setup script of a repository.
+
+        Args:
+            repository_url: URL of the repository
+            repository_readme: Contents of the repository's README
+
+        Returns:
+            The setup script
+        """
+        key = self.cache_key(repository_url, repository_readme)
+        if self.cache is not None:
+            setup_script = self.cache.get(key)
+            if setup_script is not None:
+                logger.info(f"Using cached setup script for {repository_url}")
+                return setup_script
+
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._generate(key, repository_url, repository_readme)
+            )
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            logger.info(f"Waiting for in-flight setup script of {repository_url}")
+
+        # Shielded, so that a cancelled caller does not cancel the others.
+        return await asyncio.shield(future)
+
+    def invalidate(self, repository_url: str, repository_readme: str) -> None:
+        """Forget the cached setup script of a repository, e.g. if it failed."""
+        if self.cache is not None:
+            self.cache.delete(self.cache_key(repository_url, repository_readme))
+
+    async def _generate(
+        self, key: str, repository_url: str, repository_readme: str
+    ) -> str:
+        prompt = f"The GitHub URL for the MCP server is {repository_url}. Here "
+        prompt += f"is the README:\n{repository_readme}"
+
+        setup_script = await self.provider.complete(
+            repository_url, self.system_prompt, prompt, self.model
+        )
+
+        # Catch if the model returns a markdown blob, even if instructed to not
+        # do so.
+        setup_script = setup_script.strip()
+        if setup_script.startswith("```") and setup_script.endswith("```"):
+            setup_script = "\n".join(setup_script.split("\n")[1:-1])
+
+        if setup_script and self.cache is not None:
+            self.cache.put(key, repository_url, setup_script)
+        return setup_script
@@ -0,0 +1,139 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Durable state of the sandboxes of a sandbox API.
+
+Sandboxes and the sessions opened on shared sandboxes are recorded in SQLite,
+so that a restarted sandbox API reattaches to the containers still running
+instead of starting them again.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from src.onemcp.serialization import dumps, loads
+
+# State directory of the user, as in the XDG base directory specification.
+STATE_HOME = os.getenv("XDG_STATE_HOME") or os.path.join(
+    os.path.expanduser("~"), ".local", "state"
+)
+
+SANDBOX_STORE_PATH = os.getenv(
+    "ONEMCP_SANDBOX_STORE",
+    os.path.join(STATE_HOME, "onemcp", "sandboxes.sqlite3"),
+)
+
+# Whether sandboxes outlive the sandbox API, or are removed when it stops.
+PERSIST_SANDBOXES = os.getenv("ONEMCP_SANDBOX_PERSIST", "false").lower() == "true"
+
+# Label of the containers of sandboxes, set to the sandbox ID.
+CONTAINER_LABEL = "onemcp.sandbox"
+
+
+@dataclass(frozen=True)
+class SandboxRecord:
+    """What it takes to reattach to the container of a sandbox."""
+
+    sandbox_id: str
+    # Host port mapped to the container, None for servers speaking STDIO.
+    port: Optional[int]
+    transport: str
+    path: str
+    bootstrap_metadata: dict[str, Any]
+
+
+class SandboxStore:
+    """Persistent store of sandboxes and sessions backed by SQLite."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Open (or create) the store.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sandboxes ("
+            " sandbox_id TEXT PRIMARY KEY,"
+            " port INTEGER,"
+            " transport TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " bootstrap_metadata TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " sandbox_id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, record: SandboxRecord) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sandboxes"
+                " (sandbox_id, port, transport, path, bootstrap_metadata, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    record.sandbox_id,
+                    record.port,
+                    record.transport,
+                    record.path,
+                    dumps(record.bootstrap_metadata).decode(),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def delete(self, sandbox_id: str) -> None:
+        """Delete a sandbox, and the sessions opened on it."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sandboxes WHERE sandbox_id = ?", (sandbox_id,)
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE sandbox_id = ?", (sandbox_id,)
+            )
+            self._conn.commit()
+
+    def sandboxes(self) -> list[SandboxRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sandbox_id, port, transport, path, bootstrap_metadata"
+                " FROM sandboxes ORDER BY created_at"
+            ).fetchall()
+        return [
+            SandboxRecord(row[0], row[1], row[2], row[3], loads(row[4])) for row in rows
+        ]
+
+    def put_session(self, session_id: str, sandbox_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, sandbox_id)"
+                " VALUES (?, ?)",
+                (session_id, sandbox_id),
+            )
+            self._conn.commit()
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+            self._conn.commit()
+
+    def sessions(self) -> dict[str, str]:
+        """Return the sandbox of each session, by session ID."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, sandbox_id FROM sessions"
+            ).fetchall()
+        return {str(row[0]): str(row[1]) for row in rows}
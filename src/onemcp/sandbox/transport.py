@@ -0,0 +1,511 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Transports carrying JSON-RPC messages between the sandbox and MCP servers."""
+
+import concurrent.futures
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from typing import Any, Optional, Protocol
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.onemcp.messages import Request, Response
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.health import SandboxHealth
+from src.onemcp.serialization import dumps, loads
+
+# Default read delay when reading data from a container.
+DEFAULT_READ_DELAY: float = 0.01
+
+# Default timeout for reading data from a container.
+DEFAULT_READ_TIMEOUT: float = 60.0
+
+# Maximum number of pooled connections to an MCP server over HTTP.
+DEFAULT_HTTP_POOL_SIZE: int = 32
+
+# Transports selectable with the "transport" field of the bootstrap metadata.
+TRANSPORTS = ("stdio", "streamable-http")
+
+# Interval in seconds at which a pending request checks if it was cancelled.
+CANCEL_POLL_INTERVAL: float = 0.05
+
+logger = logging.getLogger(__name__)
+
+NotificationHandler = Callable[[dict[str, Any]], None]
+
+# Prefix of successful responses as serialized by the MCP SDKs. Responses
+# starting with it are forwarded as raw bytes, without decoding their result.
+RESULT_PREFIX = re.compile(
+    rb'\{"jsonrpc":"2\.0","id":(-?\d+|"(?:[^"\\]|\\.)*"),"result":'
+)
+
+
+class RequestCancelled(Exception):
+    """Raised when the caller of a pending request cancelled it."""
+
+
+def wait_for_response(
+    future: "Future[Any]", timeout: float, cancelled: Optional[threading.Event]
+) -> Any:
+    """
+    Wait for the result of `future`, until the timeout or a cancellation.
+
+    Raises:
+        TimeoutError: If the result is not set within the timeout.
+        RequestCancelled: If `cancelled` is set first.
+    """
+    # Before Python 3.11, futures raise their own TimeoutError, which is not
+    # the builtin one.
+    deadline = time.monotonic() + timeout
+    while cancelled is None or not cancelled.is_set():
+        remaining = deadline - time.monotonic()
+        if cancelled is not None:
+            remaining = min(remaining, CANCEL_POLL_INTERVAL)
+        try:
+            return future.result(max(remaining, 0))
+        except concurrent.futures.TimeoutError:
+            if deadline - time.monotonic() <= 0:
+                raise TimeoutError(f"No response after {timeout} seconds") from None
+    raise RequestCancelled()
+
+
+def cancel_request(transport: "Transport", request_id: int, reason: str) -> None:
+    """Tell the MCP server to stop working on a request the caller gave up on."""
+    try:
+        transport.notify(
+            Request(
+                method="notifications/cancelled",
+                params={"requestId": request_id, "reason": reason},
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Failed to cancel request id={request_id}: {e}")
+
+
+def with_id(raw: bytes, request_id: Any) -> bytes:
+    """Replace the id of a raw JSON-RPC response, copying its result once."""
+    match = RESULT_PREFIX.match(raw)
+    if match is None:
+        return dumps({**loads(raw), "id": request_id})
+    return b'{"jsonrpc":"2.0","id":' + dumps(request_id) + raw[match.end(1) :]
+
+
+class Transport(Protocol):
+    """Carries the JSON-RPC messages of one MCP session."""
+
+    def request(
+        self,
+        message: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Response:
+        """
+        Send a request and return its response, with the request's id.
+
+        If the response does not arrive within the timeout, or `cancelled` is
+        set first, the server is sent notifications/cancelled for the request.
+        """
+        ...
+
+    def request_raw(
+        self,
+        message: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> bytes:
+        """Send a request and return its encoded response, with the request's id."""
+        ...
+
+    def notify(self, message: Request) -> None:
+        """Send a notification."""
+        ...
+
+
+class StdioTransport:
+    """
+    Speaks to an MCP server over the STDIO of its container.
+
+    Requests of all callers share the pipe, so each one is sent under an id of
+    its own and the response is routed back to the caller by a reader thread,
+    with the caller's id restored. The reader reports the exit of the server
+    and invalid output to the health of the server, and fails the pending
+    requests once either opens its breaker.
+    """
+
+    def __init__(
+        self,
+        container: DockerContainer,
+        on_notification: NotificationHandler,
+        health: Optional[SandboxHealth] = None,
+    ) -> None:
+        self.container = container
+        self.on_notification = on_notification
+        self.health = health if health is not None else SandboxHealth()
+        self._ids: Iterator[int] = itertools.count(1)
+        self._pending: dict[int, Future[Any]] = {}
+        # Requests whose response is wanted as raw bytes.
+        self._raw: set[int] = set()
+        self._reader: Optional[threading.Thread] = None
+        self._reader_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def request(
+        self,
+        message: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Response:
+        """
+        Send a request and wait for its response.
+
+        Raises:
+            TimeoutError: If the response is not received within the timeout.
+            RequestCancelled: If `cancelled` was set before the response.
+            RuntimeError: If the MCP server exited before responding.
+        """
+        response: Response = self._exchange(message, timeout, False, cancelled)
+        if message.id is not None:
+            response = response.with_id(message.id)
+        return response
+
+    def request_raw(
+        self,
+        message: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> bytes:
+        """
+        Send a request and wait for its encoded response.
+
+        Raises:
+            TimeoutError: If the response is not received within the timeout.
+            RequestCancelled: If `cancelled` was set before the response.
+            RuntimeError: If the MCP server exited before responding.
+        """
+        response: bytes = self._exchange(message, timeout, True, cancelled)
+        if message.id is not None:
+            response = with_id(response, message.id)
+        return response
+
+    def _exchange(
+        self,
+        message: Request,
+        timeout: float,
+        raw: bool,
+        cancelled: Optional[threading.Event],
+    ) -> Any:
+        request_id = next(self._ids)
+        future: Future[Any] = Future()
+        self._pending[request_id] = future
+        if raw:
+            self._raw.add(request_id)
+        try:
+            self._ensure_reader()
+            self.notify(message.with_id(request_id))
+            try:
+                return wait_for_response(future, timeout, cancelled)
+            except (TimeoutError, concurrent.futures.TimeoutError):
+                logger.error(
+                    f"Timeout waiting for response with id={request_id} after {timeout} seconds"
+                )
+                cancel_request(self, request_id, "Request timed out")
+                raise TimeoutError(
+                    f"Timed out waiting for response id={request_id}"
+                ) from None
+            except RequestCancelled:
+                cancel_request(self, request_id, "Request cancelled by the caller")
+                raise
+        finally:
+            self._pending.pop(request_id, None)
+            self._raw.discard(request_id)
+
+    def notify(self, message: Request) -> None:
+        # The message is serialized to a compact JSON string and a newline
+        # character is appended.
+        with self._write_lock:
+            self.container.write(dumps(message.to_dict()).decode() + "\n")
+
+    def _ensure_reader(self) -> None:
+        """Start the thread dispatching the output of the container, if needed."""
+        with self._reader_lock:
+            if self._reader is None or not self._reader.is_alive():
+                self._reader = threading.Thread(target=self._read_loop, daemon=True)
+                self._reader.start()
+
+    def _read_loop(self) -> None:
+        """
+        Read lines from the container's output and dispatch them, until the
+        MCP server exits.
+
+        Lines that cannot be parsed as JSON are logged as warnings and
+        ignored, responses are routed to the pending request with the same
+        id, and notifications are passed to the notification handler. The
+        exit of the server and its invalid output are recorded in its health.
+        """
+        while True:
+            try:
+                line: str = self.container.read()
+            except TimeoutError:
+                continue
+            except Exception as e:
+                self.health.record_exit(f"Failed to read from MCP server: {e}")
+                self._fail_pending(e)
+                return
+            if not line:
+                # End of the output, or nothing to read yet.
+                if not self.container.is_running():
+                    self.health.record_exit("MCP server exited")
+                    self._fail_pending(RuntimeError("MCP server exited"))
+                    return
+                time.sleep(DEFAULT_READ_DELAY)
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            if self._raw:
+                raw = line.encode()
+                match = RESULT_PREFIX.match(raw)
+                if (
+                    match is not None
+                    and match[1].isdigit()
+                    and int(match[1]) in self._raw
+                ):
+                    self.health.record_output(True)
+                    self._resolve(int(match[1]), raw)
+                    continue
+            try:
+                msg = loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Failed to decode JSON: {e} - Line: {line}")
+                msg = None
+            if not isinstance(msg, dict):
+                if self.health.record_output(False):
+                    self._fail_pending(RuntimeError("MCP server wrote invalid output"))
+                continue
+            self.health.record_output(True)
+            if "method" in msg and "id" not in msg:
+                self.on_notification(msg)
+                continue
+            msg_id = msg.get("id")
+            if isinstance(msg_id, int):
+                self._resolve(
+                    msg_id,
+                    dumps(msg) if msg_id in self._raw else Response.from_dict(msg),
+                )
+
+    def _resolve(self, request_id: int, response: Any) -> None:
+        future = self._pending.get(request_id)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def _fail_pending(self, error: Exception) -> None:
+        """Fail all pending requests, e.g. because the MCP server exited."""
+        for future in list(self._pending.values()):
+            if not future.done():
+                future.set_exception(error)
+
+
+class HttpTransport:
+    """
+    Speaks streamable HTTP to an MCP server listening on the mapped port of
+    its container.
+
+    Connections are pooled and kept alive, and each request is its own HTTP
+    exchange, so requests run concurrently. Responses may be plain JSON or a
+    stream of server-sent events carrying notifications before the response.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        on_notification: NotificationHandler,
+        pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+    ) -> None:
+        self.url = url
+        self.on_notification = on_notification
+        self.session_id: Optional[str] = None
+        self._ids: Iterator[int] = itertools.count(1)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _post(self, message: Request, timeout: float) -> requests.Response:
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/event-stream",
+        }
+        if self.session_id is not None:
+            headers["Mcp-Session-Id"] = self.session_id
+
+        # The server may still be starting to listen right after the
+        # container is up.
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                response = self._session.post(
+                    self.url,
+                    data=dumps(message.to_dict()),
+                    headers=headers,
+                    timeout=timeout,
+                    stream=True,
+                )
+                break
+            except requests.ConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(DEFAULT_READ_DELAY * 10)
+
+        response.raise_for_status()
+        session_id = response.headers.get("Mcp-Session-Id")
+        if session_id:
+            self.session_id = session_id
+        return response
+
+    def request(
+        self,
+        message: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Response:
+        """
+        Send a request and wait for its response.
+
+        Raises:
+            TimeoutError: If the response is not received within the timeout.
+            RequestCancelled: If `cancelled` was set before the response.
+            RuntimeError: If the server answered without a response.
+        """
+        response: Response = self._exchange(message, timeout, False, cancelled)
+        if message.id is not None:
+            response = response.with_id(message.id)
+        return response
+
+    def request_raw(
+        self,
+        message: Request,
+        timeout: float = DEFAULT_READ_TIMEOUT,
+        cancelled: Optional[threading.Event] = None,
+    ) -> bytes:
+        """
+        Send a request and wait for its encoded response.
+
+        Raises:
+            TimeoutError: If the response is not received within the timeout.
+            RequestCancelled: If `cancelled` was set before the response.
+            RuntimeError: If the server answered without a response.
+        """
+        response: bytes = self._exchange(message, timeout, True, cancelled)
+        if message.id is not None:
+            response = with_id(response, message.id)
+        return response
+
+    def notify(self, message: Request) -> None:
+        with self._post(message, DEFAULT_READ_TIMEOUT):
+            pass
+
+    def _exchange(
+        self,
+        message: Request,
+        timeout: float,
+        raw: bool,
+        cancelled: Optional[threading.Event],
+    ) -> Any:
+        request_id = next(self._ids)
+        deadline = time.monotonic() + timeout
+        try:
+            with self._post(message.with_id(request_id), timeout) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if content_type.startswith("text/event-stream"):
+                    payloads = self._read_events(response)
+                else:
+                    payloads = iter([response.content])
+                for payload in payloads:
+                    if cancelled is not None and cancelled.is_set():
+                        raise RequestCancelled()
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(
+                            f"Timed out waiting for response id={request_id}"
+                        )
+                    if raw:
+                        match = RESULT_PREFIX.match(payload)
+                        if match is not None and match[1] == str(request_id).encode():
+                            return payload
+                    try:
+                        msg = loads(payload)
+                    except json.JSONDecodeError as e:
+                        logger.warning(
+                            f"Failed to decode JSON: {e} - Payload: {payload!r}"
+                        )
+                        continue
+                    if not isinstance(msg, dict):
+                        continue
+                    if "method" in msg and "id" not in msg:
+                        self.on_notification(msg)
+                    elif msg.get("id") == request_id:
+                        return dumps(msg) if raw else Response.from_dict(msg)
+        except (TimeoutError, requests.Timeout):
+            logger.error(f"Timeout waiting for response with id={request_id}")
+            cancel_request(self, request_id, "Request timed out")
+            raise TimeoutError(
+                f"Timed out waiting for response id={request_id}"
+            ) from None
+        except RequestCancelled:
+            cancel_request(self, request_id, "Request cancelled by the caller")
+            raise
+
+        raise RuntimeError(f"MCP server sent no response to id={request_id}")
+
+    def _read_events(self, response: requests.Response) -> Iterator[bytes]:
+        """Yield the data of each event of a stream of server-sent events."""
+        data: list[bytes] = []
+        for line in response.iter_lines():
+            if line:
+                if line.startswith(b"data:"):
+                    data.append(line[5:].lstrip())
+                continue
+
+            # A blank line ends an event.
+            if data:
+                yield b"\n".join(data)
+                data = []
+        if data:
+            yield b"\n".join(data)
+
+
+def create_transport(
+    name: str,
+    container: DockerContainer,
+    endpoint: str,
+    on_notification: NotificationHandler,
+    path: str = "/mcp",
+    health: Optional[SandboxHealth] = None,
+) -> Transport:
+    """
+    Create the transport called `name` to an MCP server.
+
+    Args:
+        name: One of TRANSPORTS
+        container: Container running the server
+        endpoint: Host and port the container's port 8000 is mapped to
+        on_notification: Called with the notifications sent by the server
+        path: Path of the MCP endpoint of servers speaking HTTP
+        health: Health of the server, updated from the output of servers
+            speaking over STDIO
+
+    Returns:
+        The transport
+    """
+    if name == "stdio":
+        return StdioTransport(container, on_notification, health)
+    if name == "streamable-http":
+        return HttpTransport(f"http://{endpoint}{path}", on_notification)
+    raise ValueError(f"Unsupported MCP transport: {name}")
@@ -8,20 +8,17 @@ if [ -z "${REPOSITORY_URL}" ]; then
 fi
 REPOSITORY_NAME=$(basename "${REPOSITORY_URL}" .git)
 
-# Install necessary packages
-apt update
-apt install -y git python3 python3-pip python3-venv curl
-
+# git, python3 and uv come with the base image
 # Clone the repository
-git clone ${REPOSITORY_URL}
+git clone --depth 1 ${REPOSITORY_URL}
 cd "${REPOSITORY_NAME}"
 
-# Create and activate a virtual environment
-python3 -m venv venv
-source venv/bin/activate
+# Activate the virtual environment of the base image, which already has
+# fastmcp and mcp installed
+source "${ONEMCP_VENV}/bin/activate"
 
-# Install the MCP server using pip inside the virtual environment
-pip install .
+# Install the MCP server inside the virtual environment
+uv pip install .
 
 # Final fallback: try to extract from pyproject.toml or setup.py
 if [ -f "pyproject.toml" ]; then
@@ -38,6 +35,6 @@ if [ -z "${PACKAGE_NAME}" ]; then
 fi
 # Generate a script to run the MCP server
 echo "#!/bin/bash
-source $(pwd)/venv/bin/activate
+source ${ONEMCP_VENV}/bin/activate
 python3 -m ${PACKAGE_NAME}" > /run_mcp.sh
 chmod +x /run_mcp.sh
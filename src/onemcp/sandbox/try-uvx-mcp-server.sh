@@ -0,0 +1,30 @@
+#!/bin/bash
+
+REPOSITORY_URL=
+
+if [ -z "${REPOSITORY_URL}" ]; then
+    echo "Error: REPOSITORY_URL is not set. Please provide a valid repository URL." >&2
+    exit 1
+fi
+REPOSITORY_NAME=$(basename "${REPOSITORY_URL}" .git)
+
+# git, uv and uvx come with the base image
+# Install the MCP server as a uv tool, in its own environment
+uv tool install "git+${REPOSITORY_URL}"
+
+# Pick the executable named after the repository, or the first one installed
+BIN_DIR=$(uv tool dir --bin)
+EXECUTABLE=$(ls "${BIN_DIR}" | grep -i "${REPOSITORY_NAME}" | head -n 1)
+if [ -z "${EXECUTABLE}" ]; then
+    EXECUTABLE=$(ls "${BIN_DIR}" | head -n 1)
+fi
+
+if [ -z "${EXECUTABLE}" ]; then
+    echo "Error: the package of ${REPOSITORY_URL} installs no executable." >&2
+    exit 1
+fi
+
+# Generate a script to run the MCP server
+echo "#!/bin/bash
+exec ${BIN_DIR}/${EXECUTABLE}" > /run_mcp.sh
+chmod +x /run_mcp.sh
@@ -0,0 +1,43 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Fast JSON encoding and decoding, with a fallback to the standard library.
+
+orjson is used when installed (``pip install onemcp[fast]``); otherwise the
+standard ``json`` module is used, with the same compact output.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover - depends on the environment
+    HAS_ORJSON = False
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode `obj` as compact UTF-8 JSON."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    """Decode JSON from bytes or text."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response of the FastAPI apps, encoded with `dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
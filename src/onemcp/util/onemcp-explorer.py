@@ -1,21 +1,34 @@
 # Copyright(c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import hashlib
 import json
+import os
 import sys
-from typing import Any
+from typing import Any, Optional
 
 import requests
 
 
 def post_discover_request(
-    repository_url: str, repository_readme: str, endpoint: str
+    repository_url: str,
+    repository_readme: str,
+    endpoint: str,
+    setup_script: Optional[str] = None,
+    revision: Optional[str] = None,
 ) -> dict[str, Any]:
     """
     Constructs and sends a POST request to the sandbox API to discover an MCP server.
+
+    If `setup_script` is given, the sandbox reuses it instead of generating a
+    new one, and only lists the tools of the server again.
     """
     headers = {"Content-Type": "application/json", "X-OneMCP-Message-Type": "DISCOVER"}
     payload = {"repository_url": repository_url, "repository_readme": repository_readme}
+    if setup_script:
+        payload["setup_script"] = setup_script
+    if revision:
+        payload["revision"] = revision
     response = requests.post(endpoint, headers=headers, json=payload)
     print(f"POST {endpoint} with repository_url={repository_url}")
     print(f"Status code: {response.status_code}")
@@ -53,9 +66,80 @@ def post_discover_request(
     return discovered_info
 
 
+def readme_hash(readme: str) -> str:
+    """Hash the contents of a README."""
+    return hashlib.sha256(readme.encode("utf-8")).hexdigest()
+
+
+def load_explored_servers(path: str) -> dict[str, dict[str, Any]]:
+    """
+    Load the servers explored by a previous run, by repository URL.
+
+    The file holds one JSON object after another, as appended by
+    parse_mcp_servers().
+    """
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    servers: dict[str, dict[str, Any]] = {}
+    decoder = json.JSONDecoder()
+    idx = 0
+    while idx < len(text):
+        if text[idx].isspace():
+            idx += 1
+            continue
+        server, idx = decoder.raw_decode(text, idx)
+        servers[server["repository_url"]] = server
+    return servers
+
+
+def classify_change(
+    previous: Optional[dict[str, Any]], server: dict[str, Any], repo_readme: str
+) -> str:
+    """
+    Tell how much of the discovery of a server must be re-run.
+
+    Returns:
+        "new" if the server was never explored, "unchanged" if neither its
+        commit nor its README changed, "minor" if its install files did not
+        change (only the tools are listed again), and "install" otherwise
+        (full discovery)
+    """
+    if previous is None:
+        return "new"
+    same_readme = previous.get("readme_hash") == readme_hash(repo_readme)
+    commit_sha = server.get("commit_sha")
+    if commit_sha and previous.get("commit_sha") == commit_sha and same_readme:
+        return "unchanged"
+    install_hash = server.get("install_files_hash")
+    if (
+        install_hash
+        and previous.get("install_files_hash") == install_hash
+        and previous.get("bootstrap_metadata", {}).get("setup_script")
+    ):
+        return "minor"
+    return "install"
+
+
 def parse_mcp_servers(json_path: str, output_path: str) -> None:
     with open(json_path, encoding="utf-8") as f:
         servers = json.load(f)
+
+    # Servers explored by a previous run are only re-discovered if their
+    # repository changed since then.
+    explored = load_explored_servers(output_path)
+    tmp_output_path = f"{output_path}.tmp"
+    with open(tmp_output_path, "w", encoding="utf-8"):
+        pass
+
+    def append(record: dict[str, Any]) -> None:
+        # Append JSON object to file (in a new line).
+        with open(tmp_output_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, indent=2))
+            f.write("\n")
+
     for server in servers:
         name = server.get("name")
         description = server.get("description")
@@ -68,14 +152,25 @@ def parse_mcp_servers(json_path: str, output_path: str) -> None:
         if repo_readme == "":
             continue
 
+        previous = explored.pop(repo_url, None)
+        change = classify_change(previous, server, repo_readme)
+        if previous is not None and change == "unchanged":
+            print(f"Unchanged: {repo_url}")
+            append(previous)
+            continue
+
         print(
-            f"Name: {name}\nDescription: {description}\nRepository URL: {repo_url}\nLanguage: {language}\n"
+            f"Name: {name}\nDescription: {description}\nRepository URL: {repo_url}\nLanguage: {language}\nChange: {change}\n"
         )
 
         response = post_discover_request(
             repository_url=repo_url,
             repository_readme=repo_readme,
             endpoint="http://localhost:8080/sandbox",
+            setup_script=previous["bootstrap_metadata"]["setup_script"]
+            if previous is not None and change == "minor"
+            else None,
+            revision=server.get("commit_sha"),
         )
 
         # Check if response is not empty
@@ -83,12 +178,19 @@ def parse_mcp_servers(json_path: str, output_path: str) -> None:
             response["language"] = language
             response["description"] = description
             response["name"] = name
-
-            # Append JSON object to file (in a new line).
-            with open(output_path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(response, ensure_ascii=False, indent=2))
-                f.write("\n")
+            response["commit_sha"] = server.get("commit_sha")
+            response["readme_hash"] = readme_hash(repo_readme)
+            response["install_files_hash"] = server.get("install_files_hash")
+            append(response)
             print(f"Response appended to {output_path}")
+        elif previous is not None:
+            # Keep the last working record if the refresh failed.
+            append(previous)
+
+    # Keep the servers that are no longer in the input file.
+    for previous in explored.values():
+        append(previous)
+    os.replace(tmp_output_path, output_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Shared fixtures for the OneMCP test suite."""
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+
+class CountingEmbeddingFunction:
+    """Deterministic embedding function that counts embedded documents."""
+
+    def __init__(self) -> None:
+        self.embedded: list[str] = []
+        self.calls = 0
+
+    def __call__(self, input: Any) -> Any:
+        self.embedded.extend(input)
+        self.calls += 1
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in input]
+
+    @staticmethod
+    def name() -> str:
+        return "counting"
+
+    def get_config(self) -> dict[str, Any]:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict[str, Any]) -> "CountingEmbeddingFunction":
+        return CountingEmbeddingFunction()
+
+
+@pytest.fixture
+def collection(tmp_path: Path) -> Any:
+    """In-memory ChromaDB collection embedding documents without a model."""
+    chromadb = pytest.importorskip("chromadb")
+    embedding_function = type(
+        "ChromaCountingEmbeddingFunction",
+        (CountingEmbeddingFunction, chromadb.EmbeddingFunction),
+        {},
+    )()
+    return chromadb.EphemeralClient().create_collection(
+        f"test-{tmp_path.name}", embedding_function=embedding_function
+    )
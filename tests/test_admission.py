@@ -0,0 +1,116 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the admission control of the sandbox API."""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.onemcp.sandbox import __main__ as sandbox_api
+from src.onemcp.sandbox.admission import AdmissionController, Overloaded
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestAdmission:
+    """Test the queues of the admission controller."""
+
+    @pytest.mark.asyncio
+    async def test_callers_are_served_in_turn(self) -> None:
+        admission = AdmissionController(per_sandbox=1)
+        running = await admission.acquire("sandbox-1", "busy")
+        admitted: list[str] = []
+
+        async def call(caller: str) -> None:
+            ticket = await admission.acquire("sandbox-1", caller)
+            admitted.append(caller)
+            admission.release(ticket)
+
+        tasks = [
+            asyncio.create_task(call(caller))
+            for caller in ("busy", "busy", "busy", "other")
+        ]
+        await settle()
+        admission.release(running)
+        await asyncio.gather(*tasks)
+
+        assert admitted == ["busy", "other", "busy", "busy"]
+        assert admission.active == admission.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_global_limit_is_shared_by_lanes(self) -> None:
+        admission = AdmissionController(max_concurrent=1)
+        running = await admission.acquire("sandbox-1", "a")
+        waiting = asyncio.create_task(admission.acquire("sandbox-2", "b"))
+        await settle()
+
+        assert not waiting.done()
+        admission.release(running)
+        ticket = await waiting
+        assert ticket.lane == "sandbox-2"
+
+    @pytest.mark.asyncio
+    async def test_full_queues_are_rejected(self) -> None:
+        admission = AdmissionController(
+            max_queued=1, per_sandbox=1, per_sandbox_queued=1
+        )
+        await admission.acquire("sandbox-1", "a")
+        await admission.acquire("sandbox-2", "a")
+        queued = asyncio.create_task(admission.acquire("sandbox-1", "a"))
+        await settle()
+
+        with pytest.raises(Overloaded) as sandbox_full:
+            await admission.acquire("sandbox-1", "b")
+        with pytest.raises(Overloaded) as api_full:
+            await admission.acquire("sandbox-2", "b")
+
+        assert sandbox_full.value.status == 429
+        assert api_full.value.status == 503
+        assert api_full.value.retry_after >= 1
+        queued.cancel()
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self) -> None:
+        admission = AdmissionController(per_sandbox=1, queue_timeout=0.05)
+        running = await admission.acquire("sandbox-1", "a")
+        admission._lanes["sandbox-1"].service_time = 0.01
+
+        with pytest.raises(Overloaded, match="Timed out") as rejected:
+            await admission.acquire("sandbox-1", "b")
+
+        assert rejected.value.status == 503
+        assert admission.queued == 0
+        admission.release(running)
+        assert not admission._lanes
+
+    @pytest.mark.asyncio
+    async def test_deadline_too_close(self) -> None:
+        admission = AdmissionController(per_sandbox=1)
+        await admission.acquire("sandbox-1", "a")
+
+        with pytest.raises(Overloaded, match="in time"):
+            await admission.acquire("sandbox-1", "b", deadline=time.monotonic())
+
+    def test_retry_after_header(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            sandbox_api,
+            "admission",
+            AdmissionController(per_sandbox=0, per_sandbox_queued=0),
+        )
+        client = TestClient(sandbox_api.app)
+
+        response = client.post(
+            "/sandbox",
+            json={"sandbox_id": "sandbox-1", "method": "tools/call"},
+            headers={"X-OneMCP-Message-Type": "CALL_TOOL"},
+        )
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        assert response.json()["response_code"] == "429"
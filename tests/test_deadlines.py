@@ -0,0 +1,197 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the deadlines and the cancellation of tool calls."""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox import __main__ as sandbox_api
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.mcp_server import McpServer
+from src.onemcp.sandbox.transport import RequestCancelled
+from tests.test_tool_cache import REPOSITORY_URL, FakeContainer, FakeRegistry
+
+CALL = Request(id=7, method="tools/call", params={"name": "forecast"})
+
+
+class HangingContainer(FakeContainer):
+    """Fake container whose tools never answer."""
+
+    def write(self, data: str) -> None:
+        if json.loads(data).get("method") == "tools/call":
+            self.requests.append(json.loads(data))
+            return
+        super().write(data)
+
+    def cancellations(self) -> list[dict[str, Any]]:
+        """Return the parameters of the cancellations, and of the calls."""
+        calls = [r for r in self.requests if r["method"] == "tools/call"]
+        return [
+            {**r["params"], "call": calls[0]["id"]}
+            for r in self.requests
+            if r["method"] == "notifications/cancelled"
+        ]
+
+
+class SlowContainer(FakeContainer):
+    """Fake container whose tools answer after a while."""
+
+    def write(self, data: str) -> None:
+        if json.loads(data).get("method") == "tools/call":
+            threading.Timer(0.2, super().write, (data,)).start()
+            return
+        super().write(data)
+
+
+class HangingRegistry(FakeRegistry):
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        container = HangingContainer()
+        container.name = sandbox_id
+        container.port = port
+        return container
+
+
+async def start(registry: FakeRegistry) -> tuple[str, HangingContainer]:
+    response = await registry.start(
+        {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}
+    )
+    sandbox_id = str(response["sandbox_id"])
+    container = registry.instances[sandbox_id][0]
+    assert isinstance(container, HangingContainer)
+    return sandbox_id, container
+
+
+class TestCancellation:
+    """Test that the server is told about the calls given up on."""
+
+    def test_timeout_cancels_the_call(self) -> None:
+        container = HangingContainer()
+        server = McpServer(endpoint="localhost:9000")
+
+        with pytest.raises(TimeoutError):
+            server.call_tool(container, CALL, timeout=0.1)
+
+        [cancellation] = container.cancellations()
+        assert cancellation["requestId"] == cancellation["call"]
+        assert cancellation["reason"] == "Request timed out"
+
+    def test_caller_cancels_the_call(self) -> None:
+        container = HangingContainer()
+        server = McpServer(endpoint="localhost:9000")
+        cancelled = threading.Event()
+        threading.Timer(0.1, cancelled.set).start()
+
+        with pytest.raises(RequestCancelled):
+            server.call_tool_raw(container, CALL, timeout=10, cancelled=cancelled)
+
+        [cancellation] = container.cancellations()
+        assert cancellation["requestId"] == cancellation["call"]
+
+
+class TestDeadlines:
+    """Test the deadlines of the tool calls of the sandbox registry."""
+
+    @pytest.mark.asyncio
+    async def test_deadline_exceeded(self) -> None:
+        registry = HangingRegistry()
+        sandbox_id, container = await start(registry)
+
+        response = await registry.call_tool_raw(
+            sandbox_id, CALL, deadline=time.monotonic() + 0.1
+        )
+
+        assert isinstance(response, dict)
+        assert response["response_code"] == "504"
+        assert len(container.cancellations()) == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_call_outlives_cancel_polls(self) -> None:
+        registry = HangingRegistry()
+        sandbox_id, _ = await start(registry)
+        container = SlowContainer()
+        registry.instances[sandbox_id] = (container, registry.instances[sandbox_id][1])
+
+        response = await registry.call_tool(
+            sandbox_id, CALL, deadline=time.monotonic() + 5
+        )
+
+        assert response["response"]["result"] == {"content": []}
+        assert not any(
+            r["method"] == "notifications/cancelled" for r in container.requests
+        )
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_is_not_called(self) -> None:
+        registry = HangingRegistry()
+        sandbox_id, container = await start(registry)
+
+        response = await registry.call_tool(
+            sandbox_id, CALL, deadline=time.monotonic() - 1
+        )
+
+        assert response["response_code"] == "504"
+        assert not any(r["method"] == "tools/call" for r in container.requests)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_task_cancels_the_call(self) -> None:
+        registry = HangingRegistry()
+        sandbox_id, container = await start(registry)
+        call = asyncio.create_task(registry.call_tool(sandbox_id, CALL))
+        await asyncio.sleep(0.1)
+
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        for _ in range(20):
+            if container.cancellations():
+                break
+            await asyncio.sleep(0.05)
+
+        assert container.cancellations()[0]["reason"] == (
+            "Request cancelled by the caller"
+        )
+
+    def test_deadline_header(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        registry = HangingRegistry()
+        monkeypatch.setattr(sandbox_api, "sandbox", registry)
+        client = TestClient(sandbox_api.app)
+        sandbox_id = client.post(
+            "/sandbox",
+            json={
+                "bootstrap_metadata": {
+                    "repository_url": REPOSITORY_URL,
+                    "setup_script": "# setup",
+                }
+            },
+            headers={"X-OneMCP-Message-Type": "START"},
+        ).json()["sandbox_id"]
+        headers = {"X-OneMCP-Message-Type": "CALL_TOOL"}
+
+        invalid = client.post(
+            "/sandbox",
+            json={"sandbox_id": sandbox_id, **CALL.to_dict()},
+            headers={**headers, "X-OneMCP-Deadline": "tomorrow"},
+        )
+        expired = client.post(
+            "/sandbox",
+            json={"sandbox_id": sandbox_id, **CALL.to_dict()},
+            headers={**headers, "X-OneMCP-Deadline": str(time.time() + 0.1)},
+        )
+
+        assert invalid.json()["response_code"] == "400"
+        assert expired.json()["response_code"] == "504"
@@ -0,0 +1,223 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for racing discovery strategies in the Docker sandbox registry."""
+
+import asyncio
+import time
+from typing import Any, Optional
+
+import pytest
+
+from src.onemcp.sandbox.docker import registry as registry_module
+from src.onemcp.sandbox.docker import snapshot as snapshot_module
+from src.onemcp.sandbox.docker.registry import DockerSandboxRegistry
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.docker.snapshot import Snapshot
+from src.onemcp.sandbox.mcp_server import McpServer
+from tests.test_tool_cache import TOOLS, FakeContainer
+from tests.test_tool_cache import FakeRegistry as ContainerRegistry
+
+REPOSITORY_URL = "https://github.com/example/weather-mcp"
+
+
+class FakeRegistry(DockerSandboxRegistry):
+    """Registry whose candidates take a given time, then succeed or fail."""
+
+    def __init__(self, outcomes: dict[str, tuple[float, bool]]) -> None:
+        super().__init__()
+        self.outcomes = outcomes
+        self.cancelled: list[str] = []
+        self.docker_commands: list[tuple[str, ...]] = []
+
+    async def _try_candidate(
+        self,
+        strategy: str,
+        repository_url: str,
+        repository_readme: str,
+        revision: str,
+        setup_script: Optional[str] = None,
+    ) -> dict[str, Any]:
+        delay, succeeds = self.outcomes[strategy]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(strategy)
+            raise
+        if not succeeds:
+            raise RuntimeError("MCP server listed no tools")
+        return {
+            "strategy": strategy,
+            "setup_script": setup_script or f"# {strategy}",
+            "tools": [{"name": f"{strategy}_tool"}],
+            "image_tag": f"image-{strategy}",
+        }
+
+    async def _docker(self, *args: str) -> None:
+        self.docker_commands.append(args)
+
+
+@pytest.fixture(autouse=True)
+def strategies(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(registry_module, "DISCOVERY_STRATEGIES", ["pip", "uvx", "llm"])
+
+
+class TestDiscoveryRace:
+    """Test that discovery keeps the first candidate that lists its tools."""
+
+    @pytest.mark.asyncio
+    async def test_first_working_candidate_wins(self) -> None:
+        registry = FakeRegistry(
+            {"pip": (0.0, False), "uvx": (0.01, True), "llm": (10.0, True)}
+        )
+
+        result = await registry.discover(REPOSITORY_URL, "# Weather")
+
+        assert result["response_code"] == "200"
+        assert result["tools"] == [{"name": "uvx_tool"}]
+        assert result["bootstrap_metadata"]["setup_script"] == "# uvx"
+        assert registry.cancelled == ["llm"]
+        canonical_tag = registry.get_image_tag_from_repo_url(REPOSITORY_URL)
+        assert ("tag", "image-uvx", canonical_tag) in registry.docker_commands
+
+    @pytest.mark.asyncio
+    async def test_all_candidates_failing(self) -> None:
+        registry = FakeRegistry(
+            {"pip": (0.0, False), "uvx": (0.0, False), "llm": (0.01, False)}
+        )
+
+        result = await registry.discover(REPOSITORY_URL, "# Weather")
+
+        assert result["response_code"] == "500"
+        assert "llm: MCP server listed no tools" in result["error_description"]
+        assert registry.docker_commands == []
+
+    @pytest.mark.asyncio
+    async def test_known_setup_script_skips_strategies(self) -> None:
+        registry = FakeRegistry({"known": (0.0, True)})
+
+        result = await registry.discover(
+            REPOSITORY_URL, "# Weather", setup_script="# previous"
+        )
+
+        assert result["bootstrap_metadata"]["setup_script"] == "# previous"
+
+    @pytest.mark.asyncio
+    async def test_rediscovery_drops_snapshot(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        removed: list[Snapshot] = []
+
+        async def remove_snapshot(snapshot: Snapshot) -> None:
+            removed.append(snapshot)
+
+        monkeypatch.setattr(snapshot_module, "SNAPSHOT_MODE", "fs")
+        monkeypatch.setattr(snapshot_module, "remove_snapshot", remove_snapshot)
+        registry = FakeRegistry({"pip": (0.0, True), "uvx": (0.0, False)})
+        canonical_tag = registry.get_image_tag_from_repo_url(REPOSITORY_URL)
+        stale = Snapshot(f"{canonical_tag}-snapshot")
+        registry.snapshots[canonical_tag] = stale
+
+        result = await registry.discover(REPOSITORY_URL, "# Weather")
+
+        assert result["response_code"] == "200"
+        assert removed == [stale]
+        assert canonical_tag not in registry.snapshots
+
+
+class RemovableContainer(FakeContainer):
+    """Fake container that records being removed, with its image."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.removed: list[str] = []
+
+    async def stop(self) -> None:
+        pass
+
+    async def remove(self) -> None:
+        self.removed.append("container")
+
+    async def remove_image(self) -> None:
+        self.removed.append("image")
+
+
+class CandidateRegistry(ContainerRegistry):
+    """Fake registry running the candidates in removable containers."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.containers: list[RemovableContainer] = []
+
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        container = RemovableContainer()
+        container.name = sandbox_id
+        container.image = bootstrap_metadata["container_image_tag"]
+        container.port = port
+        self.containers.append(container)
+        return container
+
+
+class TestCandidates:
+    """Test that only failing LLM candidates drop their cached setup script."""
+
+    @pytest.fixture
+    def invalidated(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> tuple[CandidateRegistry, list[tuple[str, ...]]]:
+        registry = CandidateRegistry()
+        invalidated: list[tuple[str, ...]] = []
+        monkeypatch.setattr(
+            registry.setup_scripts, "invalidate", lambda *args: invalidated.append(args)
+        )
+        return registry, invalidated
+
+    @pytest.mark.asyncio
+    async def test_failing_candidate_drops_setup_script(
+        self,
+        invalidated: tuple[CandidateRegistry, list[tuple[str, ...]]],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        registry, calls = invalidated
+        monkeypatch.setattr(McpServer, "get_tools", lambda self, _: [])
+
+        with pytest.raises(registry_module.DockerSandboxError):
+            await registry._try_candidate(
+                "llm", REPOSITORY_URL, "# Weather", "abc123", "# llm"
+            )
+
+        assert calls == [(REPOSITORY_URL, "# Weather")]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_candidate_keeps_setup_script(
+        self,
+        invalidated: tuple[CandidateRegistry, list[tuple[str, ...]]],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        registry, calls = invalidated
+
+        def slow_get_tools(self: McpServer, container: Any) -> Any:
+            time.sleep(0.2)
+            return TOOLS
+
+        monkeypatch.setattr(McpServer, "get_tools", slow_get_tools)
+        task = asyncio.create_task(
+            registry._try_candidate(
+                "llm", REPOSITORY_URL, "# Weather", "abc123", "# llm"
+            )
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert calls == []
+        assert registry.instances == {}
+        assert registry.containers[0].removed == ["container", "image"]
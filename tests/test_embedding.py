@@ -0,0 +1,69 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the cached embedding function."""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+import numpy as np  # noqa: E402
+
+from onemcp.discovery.embedding import (  # noqa: E402
+    CachedEmbeddingFunction,
+    EmbeddingConfig,
+)
+
+
+class FakeModel:
+    """Embedding model that records every batch it is asked to embed."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def __call__(self, documents: list[str]) -> list[np.ndarray]:
+        self.batches.append(list(documents))
+        return [np.array([len(doc), 1.0, 0.0, 2.0]) for doc in documents]
+
+
+class TestCachedEmbeddingFunction:
+    """Test batching and caching of embeddings."""
+
+    def test_cached_vectors_survive_a_new_instance(self, tmp_path: Path) -> None:
+        config = EmbeddingConfig(
+            model_name="fake", batch_size=2, cache_path=str(tmp_path / "cache.db")
+        )
+        model = FakeModel()
+        embeddings = CachedEmbeddingFunction(config, model=model)(["a", "bb", "ccc"])
+
+        assert model.batches == [["a", "bb"], ["ccc"]]
+        assert [float(v[0]) for v in embeddings] == [1.0, 2.0, 3.0]
+
+        # A rebuild with the same model only embeds the new document.
+        model = FakeModel()
+        CachedEmbeddingFunction(config, model=model)(["ccc", "dddd", "a"])
+        assert model.batches == [["dddd"]]
+
+    def test_model_swap_does_not_reuse_other_model_vectors(
+        self, tmp_path: Path
+    ) -> None:
+        cache_path = str(tmp_path / "cache.db")
+        CachedEmbeddingFunction(
+            EmbeddingConfig(model_name="fake", cache_path=cache_path),
+            model=FakeModel(),
+        )(["a"])
+
+        model = FakeModel()
+        CachedEmbeddingFunction(
+            EmbeddingConfig(model_name="other", cache_path=cache_path), model=model
+        )(["a"])
+        assert model.batches == [["a"]]
+
+    def test_dimension_truncates_and_normalizes(self) -> None:
+        config = EmbeddingConfig(model_name="fake", dimension=2)
+        (vector,) = CachedEmbeddingFunction(config, model=FakeModel())(["abc"])
+
+        assert len(vector) == 2
+        assert np.isclose(np.linalg.norm(vector), 1.0)
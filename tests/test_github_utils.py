@@ -0,0 +1,294 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the GitHub crawler of the awesome MCP servers list."""
+
+import base64
+import json
+import os
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+import pytest
+
+# The crawler reads its token when imported.
+os.environ.setdefault("GITHUB_TOKEN", "test-token")
+
+from onemcp.discovery.github_extraction.awesome_mcp_servers import (  # noqa: E402
+    github_utils,
+)
+from onemcp.discovery.github_extraction.awesome_mcp_servers.github_utils import (  # noqa: E402
+    AsyncGitHubClient,
+    CrawlCheckpoint,
+    RateLimiter,
+)
+
+REPOSITORY_URL = "https://github.com/example/weather-mcp"
+API_URL = "https://api.github.com/repos/example/weather-mcp"
+
+
+class FakeGitHub:
+    """GitHub API serving one repository, with ETags and queued responses."""
+
+    def __init__(self, readme: Optional[str] = "# Weather MCP\n") -> None:
+        self.bodies: dict[str, Any] = {
+            API_URL: {
+                "name": "weather-mcp",
+                "description": "Weather forecasts",
+                "language": "Python",
+                "default_branch": "main",
+            },
+            f"{API_URL}/languages": {"Python": 100},
+            f"{API_URL}/commits/HEAD": {
+                "sha": "abc123",
+                "commit": {"tree": {"sha": "t1"}},
+            },
+            f"{API_URL}/git/trees/t1": {
+                "tree": [{"path": "pyproject.toml", "sha": "p1", "type": "blob"}]
+            },
+        }
+        if readme is not None:
+            self.bodies[f"{API_URL}/readme"] = {
+                "content": base64.b64encode(readme.encode()).decode(),
+                "encoding": "base64",
+                "download_url": f"{REPOSITORY_URL}/README.md",
+            }
+        # Responses sent before the regular ones, by URL.
+        self.queued: dict[str, list[httpx.Response]] = {}
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        url = str(request.url)
+        if self.queued.get(url):
+            return self.queued[url].pop(0)
+        if url not in self.bodies:
+            return httpx.Response(404, json={"message": "Not Found"})
+        etag = f'"{hash(url)}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, json=self.bodies[url], headers={"etag": etag})
+
+    def client(self, tmp_path: Path) -> AsyncGitHubClient:
+        transport = httpx.MockTransport(self.handle)
+        return AsyncGitHubClient(
+            str(tmp_path / "cache"), client=httpx.AsyncClient(transport=transport)
+        )
+
+
+@pytest.fixture
+def sleeps(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Record the pauses of the rate limiter instead of sleeping."""
+    delays: list[float] = []
+
+    async def sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr(github_utils.asyncio, "sleep", sleep)
+    return delays
+
+
+class TestAsyncGitHubClient:
+    """Test caching and rate limiting of the GitHub API client."""
+
+    @pytest.mark.asyncio
+    async def test_explore_repo(self, tmp_path: Path) -> None:
+        github = FakeGitHub()
+
+        async with github.client(tmp_path) as client:
+            record = await client.explore_repo(REPOSITORY_URL)
+
+        assert record["readme_title"] == "Weather MCP"
+        assert record["commit_sha"] == "abc123"
+        assert record["install_files_hash"] is not None
+
+    @pytest.mark.asyncio
+    async def test_not_modified_reuses_cached_body(self, tmp_path: Path) -> None:
+        github = FakeGitHub()
+        async with github.client(tmp_path) as client:
+            first = await client.explore_repo(REPOSITORY_URL)
+
+        github.requests.clear()
+        async with github.client(tmp_path) as client:
+            second = await client.explore_repo(REPOSITORY_URL)
+
+        assert second == first
+        assert all("If-None-Match" in r.headers for r in github.requests)
+
+    @pytest.mark.asyncio
+    async def test_missing_readme(self, tmp_path: Path) -> None:
+        github = FakeGitHub(readme=None)
+
+        async with github.client(tmp_path) as client:
+            record = await client.explore_repo(REPOSITORY_URL)
+
+        assert record["readme_content"] == ""
+        assert record["readme_url"] == ""
+
+    @pytest.mark.asyncio
+    async def test_pauses_until_rate_limit_reset(
+        self, tmp_path: Path, sleeps: list[float]
+    ) -> None:
+        github = FakeGitHub()
+        reset = time.time() + 30
+        github.queued[API_URL] = [
+            httpx.Response(
+                403,
+                headers={
+                    "x-ratelimit-remaining": "0",
+                    "x-ratelimit-reset": str(int(reset)),
+                },
+            )
+        ]
+
+        async with github.client(tmp_path) as client:
+            information = await client.get_json(API_URL)
+
+        assert information["name"] == "weather-mcp"
+        assert len(sleeps) == 1 and 25 < sleeps[0] <= 31
+
+    @pytest.mark.asyncio
+    async def test_pauses_on_retry_after(
+        self, tmp_path: Path, sleeps: list[float]
+    ) -> None:
+        github = FakeGitHub()
+        github.queued[API_URL] = [httpx.Response(429, headers={"retry-after": "10"})]
+
+        async with github.client(tmp_path) as client:
+            information = await client.get_json(API_URL)
+
+        assert information["name"] == "weather-mcp"
+        assert len(sleeps) == 1 and 9 < sleeps[0] <= 10
+
+
+class TestRateLimiter:
+    """Test that rate limited responses always pause the crawl."""
+
+    def test_limit_without_reset_backs_off(self) -> None:
+        limiter = RateLimiter()
+        response = httpx.Response(403, headers={"x-ratelimit-remaining": "0"})
+
+        assert limiter.update(response)
+        assert limiter.resume_at >= time.time() + github_utils.RATE_LIMIT_BACKOFF - 1
+
+    def test_reserve_pauses_before_the_limit(self) -> None:
+        limiter = RateLimiter(reserve=5)
+        reset = time.time() + 30
+        response = httpx.Response(
+            200,
+            headers={"x-ratelimit-remaining": "3", "x-ratelimit-reset": str(reset)},
+        )
+
+        assert not limiter.update(response)
+        assert limiter.resume_at == reset + 1
+
+
+def record(name: str, readme: str = "# Title") -> dict[str, Any]:
+    return {
+        "repository_url": f"https://github.com/example/{name}",
+        "readme_content": readme,
+        "readme_title": readme.lstrip("# "),
+    }
+
+
+class TestCrawlCheckpoint:
+    """Test resuming crawls from the JSON Lines checkpoint."""
+
+    def test_resume_after_interruption(self, tmp_path: Path) -> None:
+        results = tmp_path / "explored.json"
+        checkpoint = CrawlCheckpoint(str(results))
+        checkpoint.append(record("alpha"))
+        checkpoint.append(record("bravo", readme=""))
+        # An interrupted write leaves half a line behind.
+        with open(checkpoint.path, "a") as file:
+            file.write('{"repository_url": "https://github.com/exa')
+
+        resumed = CrawlCheckpoint(str(results))
+
+        assert len(resumed) == 2
+        assert "https://github.com/example/alpha" in resumed
+        assert (resumed.empty_readme, resumed.empty_title) == (1, 1)
+        resumed.append(record("charlie"))
+        with open(resumed.path) as file:
+            lines = [json.loads(line) for line in file]
+        assert [r["repository_url"].rsplit("/", 1)[1] for r in lines] == [
+            "alpha",
+            "bravo",
+            "charlie",
+        ]
+
+    def test_compact_keeps_last_record(self, tmp_path: Path) -> None:
+        results = tmp_path / "explored.json"
+        results.write_text(json.dumps([record("alpha", readme="# Old")]))
+        checkpoint = CrawlCheckpoint(str(results))
+        checkpoint.append(record("alpha", readme="# New"))
+        checkpoint.append(record("bravo"))
+
+        checkpoint.compact()
+
+        compacted = json.loads(results.read_text())
+        assert [r["readme_title"] for r in compacted] == ["New", "Title"]
+        assert not os.path.exists(checkpoint.path)
+        assert len(CrawlCheckpoint(str(results))) == 2
+
+    def test_checkpointed_since_compaction(self, tmp_path: Path) -> None:
+        results = tmp_path / "explored.json"
+        results.write_text(json.dumps([record("alpha"), record("bravo")]))
+        checkpoint = CrawlCheckpoint(str(results))
+        checkpoint.append(record("alpha", readme="# New"))
+
+        resumed = CrawlCheckpoint(str(results))
+
+        assert len(resumed) == 2
+        assert resumed.checkpointed == {"https://github.com/example/alpha"}
+
+
+class TestBatchExtract:
+    """Test which repositories a crawl explores."""
+
+    @pytest.fixture
+    def crawled(self, monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+        """Record the URLs of each crawl instead of exploring them."""
+        crawls: list[list[str]] = []
+
+        async def crawl_repos(
+            urls: list[str], on_result: Callable[[dict[str, Any]], None], *args: Any
+        ) -> int:
+            crawls.append(urls)
+            for url in urls:
+                on_result(record(url.rsplit("/", 1)[1], readme="# Fresh"))
+            return len(urls)
+
+        monkeypatch.setattr(github_utils, "crawl_repos", crawl_repos)
+        return crawls
+
+    def test_skips_known_repositories(
+        self, tmp_path: Path, crawled: list[list[str]]
+    ) -> None:
+        results = tmp_path / "explored.json"
+        results.write_text(json.dumps([record("alpha")]))
+        urls = [record(name)["repository_url"] for name in ("alpha", "bravo")]
+
+        github_utils.batch_extract_mcp_urls(urls, str(results))
+
+        assert crawled == [urls[1:]]
+        compacted = json.loads(results.read_text())
+        assert [r["readme_title"] for r in compacted] == ["Title", "Fresh"]
+
+    def test_refresh_explores_known_repositories(
+        self, tmp_path: Path, crawled: list[list[str]]
+    ) -> None:
+        results = tmp_path / "explored.json"
+        results.write_text(json.dumps([record("alpha"), record("bravo")]))
+        urls = [record(name)["repository_url"] for name in ("alpha", "bravo")]
+        # A refresh interrupted after alpha was explored again.
+        CrawlCheckpoint(str(results)).append(record("alpha", readme="# Fresh"))
+
+        github_utils.batch_extract_mcp_urls(urls, str(results), refresh=True)
+
+        assert crawled == [urls[1:]]
+        compacted = json.loads(results.read_text())
+        assert [r["readme_title"] for r in compacted] == ["Fresh", "Fresh"]
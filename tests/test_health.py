@@ -0,0 +1,193 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the health of MCP servers and their circuit breakers."""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox import __main__ as sandbox_api
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.health import CLOSED, OPEN, CircuitOpen, SandboxHealth
+from src.onemcp.sandbox.mcp_server import McpServer
+from tests.test_tool_cache import REPOSITORY_URL, FakeContainer, FakeRegistry
+
+CALL = Request(id=7, method="tools/call", params={"name": "forecast"})
+
+
+class FailingContainer(FakeContainer):
+    """Fake container whose tools cannot be reached."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.failing = True
+
+    def write(self, data: str) -> None:
+        if self.failing and json.loads(data).get("method") == "tools/call":
+            raise BrokenPipeError("Broken pipe")
+        super().write(data)
+
+
+class GarbageContainer(FakeContainer):
+    """Fake container whose tools answer with lines that are not JSON-RPC."""
+
+    def write(self, data: str) -> None:
+        if json.loads(data).get("method") == "tools/call":
+            self.lines.extend(["Traceback (most recent call last):\n"] * 3)
+            return
+        super().write(data)
+
+
+class SilentContainer(FakeContainer):
+    """Fake container whose tools never answer."""
+
+    def write(self, data: str) -> None:
+        if json.loads(data).get("method") != "tools/call":
+            super().write(data)
+
+
+class ExitedContainer(FakeContainer):
+    def is_running(self) -> bool:
+        return False
+
+
+class CrashingRegistry(FakeRegistry):
+    """Registry whose first container has exited."""
+
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        if self.instances:
+            return super()._start_docker_container(
+                sandbox_id, bootstrap_metadata, port, image, checkpoint
+            )
+        container = ExitedContainer()
+        container.name = sandbox_id
+        container.port = port
+        return container
+
+
+class TestCircuitBreaker:
+    """Test that servers that keep failing are failed fast."""
+
+    def test_failures_open_the_breaker(self) -> None:
+        container = FailingContainer()
+        server = McpServer(
+            endpoint="localhost:9000", health=SandboxHealth(failure_threshold=2)
+        )
+
+        for _ in range(2):
+            with pytest.raises(BrokenPipeError):
+                server.call_tool(container, CALL)
+        calls = len(container.requests)
+
+        with pytest.raises(CircuitOpen):
+            server.call_tool(container, CALL)
+        assert server.health.state == OPEN
+        assert len(container.requests) == calls
+
+    def test_probe_closes_the_breaker(self) -> None:
+        container = FailingContainer()
+        server = McpServer(
+            endpoint="localhost:9000",
+            health=SandboxHealth(failure_threshold=1, reset_timeout=0),
+        )
+        with pytest.raises(BrokenPipeError):
+            server.call_tool(container, CALL)
+
+        container.failing = False
+        response = server.call_tool(container, CALL)
+
+        assert response["result"] == {"content": []}
+        assert server.health.state == CLOSED
+
+    def test_invalid_output_fails_pending_calls(self) -> None:
+        container = GarbageContainer()
+        server = McpServer(
+            endpoint="localhost:9000", health=SandboxHealth(garbage_threshold=3)
+        )
+
+        with pytest.raises(RuntimeError, match="invalid output"):
+            server.call_tool(container, CALL, timeout=5)
+
+        assert server.health.state == OPEN
+
+    def test_timeouts_do_not_open_the_breaker(self) -> None:
+        container = SilentContainer()
+        server = McpServer(
+            endpoint="localhost:9000", health=SandboxHealth(failure_threshold=1)
+        )
+
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                server.call_tool(container, CALL, timeout=0.05)
+
+        assert server.health.state == CLOSED
+        assert server.health.failures == 0
+
+    def test_exited_server_is_not_called(self) -> None:
+        container = ExitedContainer()
+        server = McpServer(endpoint="localhost:9000")
+
+        with pytest.raises(CircuitOpen):
+            server.call_tool(container, CALL)
+
+        assert server.health.exited
+        assert container.requests == []
+
+
+class TestAutoRestart:
+    """Test that sandboxes whose breaker opened are restarted."""
+
+    @pytest.mark.asyncio
+    async def test_exited_sandbox_is_restarted(self) -> None:
+        registry = CrashingRegistry()
+        response = await registry.start(
+            {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}
+        )
+        sandbox_id = str(response["sandbox_id"])
+
+        failed = await registry.call_tool(sandbox_id, CALL)
+        while sandbox_id in registry._restarts:
+            await asyncio.sleep(0.01)
+        called = await registry.call_tool(sandbox_id, CALL)
+        status = await registry.get_status(sandbox_id)
+
+        assert failed["response_code"] == "503"
+        assert called["response"]["result"] == {"content": []}
+        assert status["running"]
+        assert status["health"]["state"] == CLOSED
+        assert status["health"]["restarts"] == 1
+
+    def test_get_status(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(sandbox_api, "sandbox", FakeRegistry())
+        client = TestClient(sandbox_api.app)
+        sandbox_id = client.post(
+            "/sandbox",
+            json={
+                "bootstrap_metadata": {
+                    "repository_url": REPOSITORY_URL,
+                    "setup_script": "# setup",
+                }
+            },
+            headers={"X-OneMCP-Message-Type": "START"},
+        ).json()["sandbox_id"]
+        headers = {"X-OneMCP-Message-Type": "GET_STATUS"}
+
+        one = client.post("/sandbox", json={"sandbox_id": sandbox_id}, headers=headers)
+        every = client.post("/sandbox", json={}, headers=headers)
+        missing = client.post("/sandbox", json={"sandbox_id": "x"}, headers=headers)
+
+        assert one.json()["health"]["state"] == CLOSED
+        assert list(every.json()["sandboxes"]) == [sandbox_id]
+        assert missing.json()["response_code"] == "404"
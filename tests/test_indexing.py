@@ -0,0 +1,121 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the ChromaDB indexing of MCP server tools."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from onemcp.discovery.embedding import EmbeddingConfig  # noqa: E402
+from onemcp.discovery.indexing import Indexing  # noqa: E402
+from onemcp.discovery.quantization import QuantizedIndex  # noqa: E402
+
+
+@pytest.fixture
+def indexing(tmp_path: Path, collection: Any) -> Indexing:
+    indexing = Indexing(servers_dir=str(tmp_path))
+    indexing.collection = collection
+    return indexing
+
+
+def write_server(path: Path, tools: list[dict[str, str]]) -> str:
+    path.write_text(
+        json.dumps(
+            {
+                "repository_url": "https://github.com/example/weather-mcp",
+                "description": "Weather server",
+                "tools": tools,
+            }
+        )
+    )
+    return str(path)
+
+
+class TestIncrementalIndexing:
+    """Test that re-registering a server only applies what changed."""
+
+    def test_reregistration_only_embeds_changed_tools(
+        self, indexing: Indexing, tmp_path: Path
+    ) -> None:
+        json_file = tmp_path / "weather-mcp-server.json"
+        tools = [
+            {"name": "forecast", "description": "Get the forecast"},
+            {"name": "alerts", "description": "Get weather alerts"},
+            {"name": "current", "description": "Get current conditions"},
+        ]
+
+        changes = indexing.add_tools_from_json(write_server(json_file, tools))
+        assert changes == {"added": 3, "updated": 0, "removed": 0, "unchanged": 0}
+
+        embedding_function = indexing.collection._embedding_function
+        embedding_function.embedded.clear()
+
+        tools[0]["description"] = "Get the seven day forecast"
+        tools[2] = {"name": "radar", "description": "Get radar images"}
+        changes = indexing.add_tools_from_json(write_server(json_file, tools))
+
+        assert changes == {"added": 1, "updated": 1, "removed": 1, "unchanged": 1}
+        assert len(embedding_function.embedded) == 2
+        assert indexing.collection.count() == 3
+
+    def test_unchanged_server_is_not_reembedded(
+        self, indexing: Indexing, tmp_path: Path
+    ) -> None:
+        json_file = tmp_path / "weather-mcp-server.json"
+        tools = [{"name": "forecast", "description": "Get the forecast"}]
+        indexing.add_tools_from_json(write_server(json_file, tools))
+
+        embedding_function = indexing.collection._embedding_function
+        embedding_function.embedded.clear()
+        changes = indexing.add_tools_from_json(write_server(json_file, tools))
+
+        assert changes == {"added": 0, "updated": 0, "removed": 0, "unchanged": 1}
+        assert embedding_function.embedded == []
+
+
+class TestQuantizedSearch:
+    """Test that registrations update the quantized index incrementally."""
+
+    def test_changed_tools_are_encoded_without_training(
+        self, indexing: Indexing, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        builds: list[int] = []
+        build = QuantizedIndex.build
+
+        def counting_build(index: QuantizedIndex, ids: list[str], vectors: Any) -> None:
+            builds.append(len(ids))
+            build(index, ids, vectors)
+
+        monkeypatch.setattr(QuantizedIndex, "build", counting_build)
+        indexing.embedding_function = indexing.collection._embedding_function
+        indexing.quantized_index = QuantizedIndex(method="int8", rerank_factor=10)
+        json_file = tmp_path / "weather-mcp-server.json"
+        tools = [
+            {"name": "forecast", "description": "Get the forecast"},
+            {"name": "alerts", "description": "Get weather alerts"},
+        ]
+        indexing.add_tools_from_json(write_server(json_file, tools))
+        indexing.find_similar_tools("forecast", k=5)
+
+        tools[1] = {"name": "radar", "description": "Get radar images"}
+        indexing.add_tools_from_json(write_server(json_file, tools))
+        results = indexing.find_similar_tools("radar", k=5)
+
+        assert builds == [2]
+        assert sorted(r["tool-name"] for r in results) == ["forecast", "radar"]
+        # ChromaDB only keeps placeholders, the vectors come from the cache.
+        stored = indexing.collection.get(include=["embeddings"])["embeddings"]
+        assert [len(vector) for vector in stored] == [1, 1]
+
+    def test_quantization_requires_embedding_cache(self, tmp_path: Path) -> None:
+        indexing = Indexing(servers_dir=str(tmp_path))
+
+        with pytest.raises(ValueError, match="ONEMCP_EMBEDDING_CACHE"):
+            indexing.init_db_server(
+                embedding_config=EmbeddingConfig(cache_path=None), quantization="pq"
+            )
@@ -0,0 +1,250 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the OneMCP Indexing API."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from onemcp.discovery import registry as registry_module  # noqa: E402
+from onemcp.discovery.indexing_api import IndexingAPI  # noqa: E402
+from onemcp.discovery.registry import Registry  # noqa: E402
+from onemcp.discovery.registry_api import ServerEntry  # noqa: E402
+
+
+def server(name: str, tools: int = 1) -> dict[str, Any]:
+    return {
+        "repository_url": f"https://github.com/example/{name}",
+        "description": f"The {name} server",
+        "tools": [
+            {"name": f"{name}_tool_{i}", "description": f"Tool {i} of {name}"}
+            for i in range(tools)
+        ],
+    }
+
+
+@pytest.fixture
+def client(tmp_path: Path, collection: Any) -> TestClient:
+    api = IndexingAPI(servers_dir=str(tmp_path))
+    api.indexing.collection = collection
+    client = TestClient(api.app)
+    for name in ("alpha", "bravo", "charlie", "delta", "echo"):
+        response = client.post("/register_server", json=server(name))
+        assert response.status_code == 200
+    return client
+
+
+class TestRegisterServer:
+    """Test re-registration of an existing server."""
+
+    def test_reregistration_overwrites_server_file(
+        self, client: TestClient, tmp_path: Path
+    ) -> None:
+        response = client.post("/register_server", json=server("alpha", tools=2))
+        body = response.json()
+
+        assert body["server_file"] == "alpha-server.json"
+        assert (body["tools_added"], body["tools_unchanged"]) == (1, 1)
+        assert not list(tmp_path.glob("alpha-server-*.json"))
+
+        response = client.post("/register_server", json=server("alpha", tools=2))
+        assert response.json()["message"] == "Server unchanged"
+
+
+class TestRegistryClient:
+    """Test that servers registered through the client can be read back."""
+
+    def test_register_server_round_trip(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def route(method: str) -> Any:
+            def send(url: str, **kwargs: Any) -> Any:
+                if "data" in kwargs:
+                    kwargs["content"] = kwargs.pop("data")
+                path = url.removeprefix("http://testserver")
+                return getattr(client, method)(path, **kwargs)
+
+            return send
+
+        monkeypatch.setattr(registry_module.requests, "post", route("post"))
+        monkeypatch.setattr(registry_module.requests, "get", route("get"))
+        registry = Registry("http://testserver")
+        entry = ServerEntry.from_dict(server("foxtrot", tools=2))
+
+        status_code, body = registry.register_server(entry)
+        fetched = registry.get_server(entry.url)
+
+        assert status_code == 200
+        assert body["tools_count"] == 2
+        assert fetched == entry
+        assert fetched.description == "The foxtrot server"
+
+
+class TestBulkRegistration:
+    """Test bulk registration and unregistration of servers."""
+
+    def test_register_servers_ndjson(
+        self, client: TestClient, collection: Any, tmp_path: Path
+    ) -> None:
+        collection._embedding_function.calls = 0
+        records = [server("foxtrot", tools=3), server("golf"), server("alpha", 2)]
+        body = "\n".join(json.dumps(record) for record in records)
+        body += '\n{"description": "no url"}\nnot json\n'
+
+        response = client.post(
+            "/register_servers",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        result = response.json()
+
+        assert result["status"] == "partial"
+        assert result["counts"] == {"registered": 2, "updated": 1, "error": 2}
+        assert [r["status"] for r in result["results"]] == [
+            "registered",
+            "registered",
+            "updated",
+            "error",
+            "error",
+        ]
+        assert result["results"][2]["tools_added"] == 1
+        # All new tools are embedded in a single call.
+        assert collection._embedding_function.calls == 1
+        assert (tmp_path / "foxtrot-server.json").exists()
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_atomic_request_rejects_invalid_records(
+        self, client: TestClient, tmp_path: Path
+    ) -> None:
+        response = client.post(
+            "/register_servers",
+            params={"atomic": "true"},
+            json=[server("foxtrot"), {"repository_url": "https://example.com/x"}],
+        )
+
+        assert response.status_code == 422
+        assert not (tmp_path / "foxtrot-server.json").exists()
+        assert client.get("/servers").json()["total_count"] == 5
+
+    def test_replace_catalog(self, client: TestClient, collection: Any) -> None:
+        response = client.post(
+            "/register_servers",
+            params={"replace": "true"},
+            json=[server("alpha"), server("foxtrot")],
+        )
+        result = response.json()
+
+        assert result["counts"] == {"unchanged": 1, "registered": 1}
+        assert len(result["removed"]) == 4
+        urls = [s["repository_url"] for s in client.get("/servers").json()["servers"]]
+        assert urls == [
+            "https://github.com/example/alpha",
+            "https://github.com/example/foxtrot",
+        ]
+        assert collection.count() == 2
+
+    def test_replace_rejects_invalid_records(
+        self, client: TestClient, collection: Any
+    ) -> None:
+        invalid = {"repository_url": "https://github.com/example/bravo"}
+
+        response = client.post(
+            "/register_servers",
+            params={"replace": "true"},
+            json=[server("alpha"), invalid],
+        )
+
+        assert response.status_code == 422
+        assert client.get("/servers").json()["total_count"] == 5
+        assert collection.count() == 5
+
+    def test_unregister_servers(self, client: TestClient, collection: Any) -> None:
+        body = "\n".join(
+            json.dumps({"repository_url": f"https://github.com/example/{name}"})
+            for name in ("alpha", "bravo", "zulu")
+        )
+
+        response = client.post(
+            "/unregister_servers",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+        statuses = [r["status"] for r in response.json()["results"]]
+        assert statuses == ["removed", "removed", "not_found"]
+        assert client.get("/servers").json()["total_count"] == 3
+        assert collection.count() == 3
+
+
+class TestListServers:
+    """Test pagination, projection and streaming of the server catalog."""
+
+    def test_without_parameters_lists_everything(self, client: TestClient) -> None:
+        body = client.get("/servers").json()
+
+        assert body["total_count"] == 5
+        assert body["next_cursor"] is None
+        assert body["servers"][0] == {
+            "filename": "alpha-server.json",
+            "repository_url": "https://github.com/example/alpha",
+            "description": "The alpha server",
+            "tools_count": 1,
+        }
+
+    def test_cursor_pagination_with_projection(self, client: TestClient) -> None:
+        urls, cursor = [], None
+        while True:
+            params = {"limit": 2, "fields": "repository_url"}
+            if cursor:
+                params["cursor"] = cursor
+            body = client.get("/servers", params=params).json()
+            assert all(list(s) == ["repository_url"] for s in body["servers"])
+            urls += [s["repository_url"] for s in body["servers"]]
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        assert len(urls) == 5
+        assert urls == sorted(urls)
+
+    def test_ndjson_stream(self, client: TestClient) -> None:
+        response = client.get(
+            "/servers",
+            params={"fields": "filename", "limit": 3},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["filename"] for line in lines] == [
+            "alpha-server.json",
+            "bravo-server.json",
+            "charlie-server.json",
+        ]
+        assert response.headers["X-OneMCP-Next-Cursor"]
+
+    def test_unknown_field_is_rejected(self, client: TestClient) -> None:
+        assert client.get("/servers", params={"fields": "secret"}).status_code == 422
+
+
+class TestServerExists:
+    """Test membership checks of the server catalog."""
+
+    def test_head_and_get(self, client: TestClient) -> None:
+        url = "https://github.com/example/bravo"
+        assert client.head("/server_exists", params={"repository_url": url}).is_success
+        assert client.get("/server_exists", params={"repository_url": url}).json()[
+            "exists"
+        ]
+
+        client.request("DELETE", "/unregister_server", json={"repository_url": url})
+        response = client.head("/server_exists", params={"repository_url": url})
+        assert response.status_code == 404
+        assert client.get("/servers").json()["total_count"] == 4
@@ -0,0 +1,92 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the typed messages of the JSON-RPC path and of the registry."""
+
+import dataclasses
+
+import pytest
+
+from onemcp.discovery.registry_api import ServerEntry, ToolEntry
+from src.onemcp.messages import Request, Response
+from src.onemcp.sandbox.mcp_server import McpServer
+from tests.test_tool_cache import FakeContainer
+
+
+class TestMessages:
+    """Test building and converting JSON-RPC messages."""
+
+    def test_request_ignores_unknown_fields(self) -> None:
+        body = {
+            "sandbox_id": "sandbox-1",
+            "jsonrpc": "2.0",
+            "id": 7,
+            "method": "tools/call",
+            "params": {"name": "forecast"},
+        }
+
+        request = Request.from_dict(body)
+
+        assert request.to_dict() == {
+            "jsonrpc": "2.0",
+            "id": 7,
+            "method": "tools/call",
+            "params": {"name": "forecast"},
+        }
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            request.id = 8  # type: ignore[misc]
+
+    def test_notification_has_no_id_nor_params(self) -> None:
+        assert Request(method="notifications/initialized").to_dict() == {
+            "jsonrpc": "2.0",
+            "method": "notifications/initialized",
+        }
+
+    def test_response_round_trip(self) -> None:
+        error = {"jsonrpc": "2.0", "id": 1, "error": {"code": -32601}}
+
+        assert Response.from_dict(error).to_dict() == error
+        assert Response(id=2).to_dict() == {"jsonrpc": "2.0", "id": 2, "result": {}}
+
+    def test_progress_token_leaves_body_untouched(self) -> None:
+        params = {"name": "forecast", "_meta": {"trace": "t-1"}}
+        request = Request(id=3, method="tools/call", params=params)
+        server = McpServer(endpoint="localhost:9000")
+
+        server.call_tool(FakeContainer(), request, on_progress=lambda _: None)
+
+        assert params == {"name": "forecast", "_meta": {"trace": "t-1"}}
+        assert request.params is params
+
+
+class TestRegistryEntries:
+    """Test the entries returned by the registry client."""
+
+    def test_tool_entries_are_hashable_values(self) -> None:
+        result = {
+            "tool_name": "forecast",
+            "tool_description": "Get the forecast",
+            "server_name": "weather",
+            "server_url": "https://github.com/example/weather",
+            "distance": 0.25,
+        }
+
+        entries = {ToolEntry.from_dict(result), ToolEntry.from_dict(dict(result))}
+
+        assert len(entries) == 1
+
+    def test_server_entry_round_trip(self) -> None:
+        record = {
+            "name": "weather",
+            "repository_url": "https://github.com/example/weather",
+            "description": "Weather forecasts",
+            "bootstrap_metadata": {"setup_script": "# setup"},
+            "tools": [
+                {"name": "forecast", "description": "", "inputSchema": {}},
+            ],
+        }
+
+        entry = ServerEntry.from_dict(record)
+
+        assert [tool.name for tool in entry.tools] == ["forecast"]
+        assert entry.to_dict() == record
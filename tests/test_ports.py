@@ -0,0 +1,107 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the allocation of the host ports of sandboxes."""
+
+import socket
+
+import pytest
+
+from src.onemcp.sandbox.ports import PortAllocator
+from tests.test_discovery import CandidateRegistry
+from tests.test_shared_sandboxes import SharingRegistry
+from tests.test_tool_cache import REPOSITORY_URL
+
+
+def free_base_port(count: int) -> int:
+    """Return the first of `count` ports that are likely free."""
+    with socket.socket() as sock:
+        sock.bind(("0.0.0.0", 0))
+        port: int = sock.getsockname()[1]
+    return min(port, 65535 - count)
+
+
+class TestPortAllocator:
+    """Test the free list of host ports."""
+
+    def test_released_ports_are_reused_last(self) -> None:
+        ports = PortAllocator(free_base_port(3), count=3)
+
+        first, second, third = (ports.allocate() for _ in range(3))
+        assert ports.allocate() is None
+        ports.release(first)
+        ports.release(first)
+
+        assert ports.allocate() == first
+        assert ports.allocate() is None
+        assert {first, second, third} == ports.used
+
+    def test_bound_ports_are_skipped(self) -> None:
+        base_port = free_base_port(2)
+        ports = PortAllocator(base_port, count=2)
+
+        with socket.socket() as sock:
+            sock.bind(("0.0.0.0", base_port))
+            sock.listen()
+            assert ports.allocate() == base_port + 1
+            assert ports.allocate() is None
+
+        assert ports.allocate() == base_port
+
+    def test_reserved_ports_are_not_allocated(self) -> None:
+        base_port = free_base_port(2)
+        ports = PortAllocator(base_port, count=2)
+
+        ports.reserve(base_port)
+
+        assert ports.allocate() == base_port + 1
+        assert ports.allocate() is None
+
+
+class TestSandboxPorts:
+    """Test that only sandboxes reached over HTTP are given a port."""
+
+    @pytest.mark.asyncio
+    async def test_ports_of_sandboxes(self) -> None:
+        registry = SharingRegistry()
+        registry.ports = PortAllocator(free_base_port(10), count=10)
+
+        stdio = await registry.start(
+            {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}
+        )
+        http = await registry.start(
+            {
+                "repository_url": REPOSITORY_URL,
+                "setup_script": "# setup",
+                "transport": "streamable-http",
+            }
+        )
+        port = registry.instances[http["sandbox_id"]][0].port
+
+        assert stdio["endpoint"] == "stdio"
+        assert http["endpoint"] == f"localhost:{port}"
+        assert registry.ports.used == {port}
+
+        await registry.stop(http["sandbox_id"])
+
+        assert registry.ports.used == set()
+
+    @pytest.mark.asyncio
+    async def test_port_is_released_once(self) -> None:
+        registry = CandidateRegistry()
+        registry.ports = PortAllocator(free_base_port(1), count=1)
+        metadata = {
+            "repository_url": REPOSITORY_URL,
+            "setup_script": "# setup",
+            "transport": "streamable-http",
+            "stateful": True,
+        }
+        first = await registry.start(metadata)
+
+        await registry.stop(first["sandbox_id"])
+        second = await registry.start(metadata)
+        await registry.cleanup(first["sandbox_id"], remove_image=False)
+
+        port = registry.instances[second["sandbox_id"]][0].port
+        assert port is not None
+        assert registry.ports.used == {port}
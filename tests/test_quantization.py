@@ -0,0 +1,83 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the quantized tool embedding index."""
+
+import numpy as np
+import pytest
+
+from onemcp.discovery.quantization import QuantizedIndex, recall_at_k
+
+
+@pytest.fixture
+def vectors() -> np.ndarray:
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(20, 64))
+    return np.repeat(centers, 25, axis=0) + 0.3 * rng.normal(size=(500, 64))
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> list[str]:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [str(i) for i in np.argsort(-(normalized @ query))[:k]]
+
+
+class TestQuantizedIndex:
+    """Test recall of quantized search against exact search."""
+
+    @pytest.mark.parametrize("method", ["int8", "pq"])
+    def test_rerank_recovers_exact_results(
+        self, vectors: np.ndarray, method: str
+    ) -> None:
+        index = QuantizedIndex(method=method, rerank_factor=10)
+        ids = [str(i) for i in range(len(vectors))]
+        index.build(ids, vectors)
+
+        def fetch(selected: list[str]) -> np.ndarray:
+            return vectors[[int(i) for i in selected]]
+
+        queries = vectors[::50]
+        exact = [exact_top_k(vectors, q / np.linalg.norm(q), 5) for q in queries]
+        approximate = [[i for i, _ in index.search(q, 5, fetch)] for q in queries]
+
+        assert recall_at_k(exact, approximate, 5) >= 0.95
+        assert index.nbytes < vectors.astype(np.float32).nbytes
+
+    def test_distances_are_sorted(self, vectors: np.ndarray) -> None:
+        index = QuantizedIndex(method="int8")
+        index.build([str(i) for i in range(len(vectors))], vectors)
+
+        distances = [d for _, d in index.search(vectors[0], 10)]
+        assert distances == sorted(distances)
+
+    def test_added_vectors_keep_codebooks(self, vectors: np.ndarray) -> None:
+        index = QuantizedIndex(method="pq")
+        index.build([str(i) for i in range(400)], vectors[:400])
+        codebooks = index.quantizer.codebooks
+
+        index.add([str(i) for i in range(400, 500)], vectors[400:])
+        index.remove(["0", "450"])
+
+        assert index.quantizer.codebooks is codebooks
+        assert (index.trained_on, len(index.ids)) == (400, 498)
+        assert not index.needs_training
+        results = [i for i, _ in index.search(vectors[451], 5)]
+        assert results[0] == "451"
+        assert "450" not in results
+
+    def test_growth_needs_training(self, vectors: np.ndarray) -> None:
+        index = QuantizedIndex(method="int8")
+        index.build([str(i) for i in range(100)], vectors[:100])
+
+        index.add([str(i) for i in range(100, 250)], vectors[100:250])
+
+        assert index.needs_training
+
+    def test_pq_falls_back_to_divisor_of_dimension(self, vectors: np.ndarray) -> None:
+        index = QuantizedIndex(method="pq", num_subspaces=8)
+        index.build([str(i) for i in range(len(vectors))], vectors[:, :60])
+
+        assert index.quantizer.num_subspaces == 6
+        assert index.search(vectors[0, :60], 1)[0][0] == "0"
+
+    def test_empty_index(self) -> None:
+        assert QuantizedIndex().search(np.ones(4), 3) == []
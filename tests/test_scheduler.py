@@ -0,0 +1,185 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the scheduler of a fleet of sandbox nodes."""
+
+import json
+import uuid
+from typing import Any
+
+import httpx
+import pytest
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.onemcp.sandbox import scheduler as scheduler_api
+from src.onemcp.sandbox.docker.registry import image_tag_from_repo_url
+from src.onemcp.sandbox.scheduler import Scheduler
+from tests.test_tool_cache import REPOSITORY_URL
+
+IMAGE_TAG = image_tag_from_repo_url(REPOSITORY_URL)
+START = {"bootstrap_metadata": {"repository_url": REPOSITORY_URL, "setup_script": "#"}}
+
+
+class FakeNode:
+    """Sandbox node answering the requests forwarded by the scheduler."""
+
+    def __init__(self, max_instances: int = 10, images: tuple[str, ...] = ()):
+        self.max_instances = max_instances
+        self.images = set(images)
+        self.sandboxes: set[str] = set()
+        self.received: list[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        message_type = request.headers["X-OneMCP-Message-Type"]
+        body = json.loads(request.content)
+        self.received.append(message_type)
+        if message_type == "GET_STATUS" and "sandbox_id" not in body:
+            return httpx.Response(
+                200,
+                json={
+                    "node": {
+                        "instances": len(self.sandboxes),
+                        "max_instances": self.max_instances,
+                        "images": sorted(self.images),
+                    }
+                },
+            )
+        if message_type == "START":
+            if len(self.sandboxes) >= self.max_instances:
+                return httpx.Response(200, json={"response_code": "429"})
+            sandbox_id = str(uuid.uuid4())
+            self.sandboxes.add(sandbox_id)
+            return httpx.Response(
+                200, json={"response_code": "200", "sandbox_id": sandbox_id}
+            )
+        if body["sandbox_id"] not in self.sandboxes:
+            return httpx.Response(200, json={"response_code": "404"})
+        return httpx.Response(200, json={"response": {"handled": message_type}})
+
+
+def fleet(**nodes: FakeNode) -> Scheduler:
+    """Return a scheduler of nodes reached at http://<name>."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return nodes[request.url.host].handle(request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return Scheduler([f"http://{name}" for name in nodes], client)
+
+
+async def start(scheduler: Scheduler) -> str:
+    response = await scheduler.place(
+        "START", json.dumps(START).encode(), {"X-OneMCP-Message-Type": "START"}
+    )
+    return str(json.loads(response.body)["sandbox_id"])
+
+
+async def call(scheduler: Scheduler, sandbox_id: str) -> Any:
+    body = json.dumps({"sandbox_id": sandbox_id, "method": "tools/call"})
+    response = await scheduler.route(
+        sandbox_id, body.encode(), {"X-OneMCP-Message-Type": "CALL_TOOL"}
+    )
+    if not isinstance(response, StreamingResponse):
+        return json.loads(response.body)
+    return json.loads(b"".join([chunk async for chunk in response.body_iterator]))
+
+
+class TestPlacement:
+    """Test that sandboxes are placed by image locality and load."""
+
+    @pytest.mark.asyncio
+    async def test_prefers_node_with_image(self) -> None:
+        cold, warm = FakeNode(), FakeNode(images=(IMAGE_TAG,))
+        warm.sandboxes = {"busy"}
+        scheduler = fleet(cold=cold, warm=warm)
+        await scheduler.refresh()
+
+        sandbox_id = await start(scheduler)
+
+        assert sandbox_id in warm.sandboxes
+
+    @pytest.mark.asyncio
+    async def test_prefers_least_loaded_node(self) -> None:
+        busy, idle = FakeNode(), FakeNode()
+        busy.sandboxes = {"a", "b"}
+        scheduler = fleet(busy=busy, idle=idle)
+        await scheduler.refresh()
+
+        first = await start(scheduler)
+        second = await start(scheduler)
+
+        assert first in idle.sandboxes
+        assert second in idle.sandboxes
+        assert scheduler.nodes["http://idle"].images == {IMAGE_TAG}
+
+    @pytest.mark.asyncio
+    async def test_saturated_node_is_skipped(self) -> None:
+        # Both nodes look idle until polled, and the first one is full.
+        full, free = FakeNode(max_instances=0, images=(IMAGE_TAG,)), FakeNode()
+        scheduler = fleet(full=full, free=free)
+
+        sandbox_id = await start(scheduler)
+
+        assert sandbox_id in free.sandboxes
+        assert full.received == ["START"]
+
+    @pytest.mark.asyncio
+    async def test_unreachable_node_is_skipped(self) -> None:
+        node = FakeNode()
+        scheduler = fleet(node=node)
+        scheduler.add_node("http://gone")
+        await scheduler.refresh()
+
+        assert not scheduler.nodes["http://gone"].healthy
+        assert await start(scheduler) in node.sandboxes
+
+
+class TestRouting:
+    """Test that requests are routed to the node owning their sandbox."""
+
+    @pytest.mark.asyncio
+    async def test_call_is_routed_to_owner(self) -> None:
+        first, second = FakeNode(), FakeNode()
+        second.sandboxes = {"a", "b"}
+        scheduler = fleet(first=first, second=second)
+        await scheduler.refresh()
+        sandbox_id = await start(scheduler)
+
+        response = await call(scheduler, sandbox_id)
+
+        assert response == {"response": {"handled": "CALL_TOOL"}}
+        assert "CALL_TOOL" not in second.received
+
+    @pytest.mark.asyncio
+    async def test_owner_is_found_after_restart(self) -> None:
+        first, second = FakeNode(), FakeNode()
+        second.sandboxes = {"sandbox"}
+        scheduler = fleet(first=first, second=second)
+
+        response = await call(scheduler, "sandbox")
+        missing = await call(scheduler, "missing")
+
+        assert response == {"response": {"handled": "CALL_TOOL"}}
+        assert scheduler.owners["sandbox"] == "http://second"
+        assert missing["response_code"] == "404"
+
+    def test_endpoint(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        node = FakeNode()
+        monkeypatch.setattr(scheduler_api, "scheduler", fleet(node=node))
+        client = TestClient(scheduler_api.app)
+
+        sandbox_id = client.post(
+            "/sandbox", json=START, headers={"X-OneMCP-Message-Type": "START"}
+        ).json()["sandbox_id"]
+        tools = client.post(
+            "/sandbox",
+            json={"sandbox_id": sandbox_id},
+            headers={"X-OneMCP-Message-Type": "GET_TOOLS"},
+        )
+        status = client.post(
+            "/sandbox", json={}, headers={"X-OneMCP-Message-Type": "GET_STATUS"}
+        )
+
+        assert tools.json() == {"response": {"handled": "GET_TOOLS"}}
+        assert status.json()["nodes"]["http://node"]["instances"] == 1
@@ -0,0 +1,28 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the JSON encoding shared by the APIs."""
+
+import json
+
+import pytest
+
+from src.onemcp import serialization
+
+MESSAGE = {"jsonrpc": "2.0", "id": 1, "result": {"text": "température", "n": [1.5]}}
+
+
+@pytest.mark.parametrize("has_orjson", [serialization.HAS_ORJSON, False])
+def test_round_trip(monkeypatch: pytest.MonkeyPatch, has_orjson: bool) -> None:
+    monkeypatch.setattr(serialization, "HAS_ORJSON", has_orjson)
+
+    encoded = serialization.dumps(MESSAGE)
+
+    assert (
+        encoded
+        == json.dumps(MESSAGE, separators=(",", ":"), ensure_ascii=False).encode()
+    )
+    assert serialization.loads(encoded) == MESSAGE
+    assert serialization.loads(memoryview(encoded)) == MESSAGE
+    with pytest.raises(json.JSONDecodeError):
+        serialization.loads(b"{")
@@ -0,0 +1,88 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the cached generation of setup scripts."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.onemcp.sandbox.setup_script import OfflineProvider, SetupScriptGenerator
+
+REPOSITORY_URL = "https://github.com/example/weather-mcp"
+
+
+class SlowProvider(OfflineProvider):
+    """Offline provider that takes a while to answer, like a model would."""
+
+    async def complete(
+        self, repository_url: str, system_prompt: str, prompt: str, model: str
+    ) -> str:
+        await asyncio.sleep(0.05)
+        return (
+            "```bash\n"
+            + await super().complete(repository_url, system_prompt, prompt, model)
+            + "\n```"
+        )
+
+
+@pytest.fixture
+def provider() -> SlowProvider:
+    return SlowProvider()
+
+
+@pytest.fixture
+def generator(provider: SlowProvider, tmp_path: Path) -> SetupScriptGenerator:
+    return SetupScriptGenerator(
+        provider=provider, cache_path=str(tmp_path / "setup-scripts.sqlite3")
+    )
+
+
+class TestSetupScriptGenerator:
+    """Test caching and deduplication of setup script generation."""
+
+    @pytest.mark.asyncio
+    async def test_script_is_cached_across_generators(
+        self, generator: SetupScriptGenerator, provider: SlowProvider, tmp_path: Path
+    ) -> None:
+        setup_script = await generator.generate(REPOSITORY_URL, "# Weather")
+
+        assert f"REPOSITORY_URL={REPOSITORY_URL}" in setup_script
+        assert not setup_script.startswith("```")
+
+        restarted = SetupScriptGenerator(
+            provider=provider, cache_path=str(tmp_path / "setup-scripts.sqlite3")
+        )
+        assert await restarted.generate(REPOSITORY_URL, "# Weather") == setup_script
+        assert provider.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_readme_change_misses_the_cache(
+        self, generator: SetupScriptGenerator, provider: SlowProvider
+    ) -> None:
+        await generator.generate(REPOSITORY_URL, "# Weather")
+        await generator.generate(REPOSITORY_URL, "# Weather v2")
+
+        assert provider.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_call(
+        self, generator: SetupScriptGenerator, provider: SlowProvider
+    ) -> None:
+        scripts = await asyncio.gather(
+            *(generator.generate(REPOSITORY_URL, "# Weather") for _ in range(5))
+        )
+
+        assert len(set(scripts)) == 1
+        assert provider.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate(
+        self, generator: SetupScriptGenerator, provider: SlowProvider
+    ) -> None:
+        await generator.generate(REPOSITORY_URL, "# Weather")
+        generator.invalidate(REPOSITORY_URL, "# Weather")
+        await generator.generate(REPOSITORY_URL, "# Weather")
+
+        assert provider.calls == 2
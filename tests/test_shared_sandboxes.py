@@ -0,0 +1,176 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for sharing sandboxes across callers."""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+import pytest
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox.docker import registry as registry_module
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.mcp_server import McpServer
+from tests.test_tool_cache import REPOSITORY_URL, FakeContainer, FakeRegistry
+
+
+class StoppableContainer(FakeContainer):
+    """Fake container that records being stopped."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.stopped = False
+
+    async def stop(self) -> None:
+        self.stopped = True
+
+
+class SharingRegistry(FakeRegistry):
+    """Fake registry counting the containers it starts."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.containers: list[StoppableContainer] = []
+
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        container = StoppableContainer()
+        container.name = sandbox_id
+        container.image = bootstrap_metadata["container_image_tag"]
+        container.port = port
+        self.containers.append(container)
+        return container
+
+
+class SlowSharingRegistry(SharingRegistry):
+    """Fake registry whose containers take a while to start."""
+
+    async def _start_container(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        await asyncio.sleep(0.05)
+        return await super()._start_container(*args, **kwargs)
+
+
+class ReorderingContainer(FakeContainer):
+    """Fake container answering two tool calls in reverse order."""
+
+    def write(self, data: str) -> None:
+        request = json.loads(data)
+        if request.get("method") != "tools/call":
+            super().write(data)
+            return
+        self.requests.append(request)
+        calls = [r for r in self.requests if r.get("method") == "tools/call"]
+        if len(calls) == 2:
+            for call in reversed(calls):
+                result = {"content": [{"type": "text", "text": call["params"]["name"]}]}
+                self.lines.append(json.dumps({"id": call["id"], "result": result}))
+
+
+@pytest.fixture(autouse=True)
+def shared(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(registry_module, "SHARED_SANDBOXES", True)
+
+
+async def start(registry: SharingRegistry, **bootstrap_metadata: Any) -> str:
+    response = await registry.start(
+        {
+            "repository_url": REPOSITORY_URL,
+            "setup_script": "# setup",
+            **bootstrap_metadata,
+        }
+    )
+    assert response["response_code"] == "200"
+    return str(response["sandbox_id"])
+
+
+class TestSharedSandboxes:
+    """Test that callers of a server share its container."""
+
+    @pytest.mark.asyncio
+    async def test_sessions_share_one_container(self) -> None:
+        registry = SharingRegistry()
+
+        first, second = await asyncio.gather(start(registry), start(registry))
+
+        assert first != second
+        assert len(registry.containers) == 1
+        assert (await registry.get_tools(first))["tools"]
+
+        await registry.stop(first)
+        assert not registry.containers[0].stopped
+        assert (await registry.get_tools(second))["tools"]
+
+        await registry.stop(second)
+        assert registry.containers[0].stopped
+        assert (await registry.get_tools(second))["response_code"] == "404"
+
+    @pytest.mark.asyncio
+    async def test_unused_container_is_stopped(self) -> None:
+        registry = SlowSharingRegistry()
+        waiters = [asyncio.ensure_future(start(registry)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.1)
+
+        assert registry.containers[0].stopped
+        assert registry._shared == {}
+        await start(registry)
+        assert len(registry.containers) == 2
+
+    @pytest.mark.asyncio
+    async def test_container_outlives_cancelled_session(self) -> None:
+        registry = SlowSharingRegistry()
+        cancelled = asyncio.ensure_future(start(registry))
+        waiting = asyncio.ensure_future(start(registry))
+        await asyncio.sleep(0.01)
+
+        cancelled.cancel()
+        session_id = await waiting
+        await asyncio.sleep(0)
+
+        assert not registry.containers[0].stopped
+        assert (await registry.get_tools(session_id))["tools"]
+
+    @pytest.mark.asyncio
+    async def test_stateful_servers_are_isolated(self) -> None:
+        registry = SharingRegistry()
+
+        await start(registry, stateful=True)
+        await start(registry, stateful=True)
+
+        assert len(registry.containers) == 2
+
+
+class TestMultiplexing:
+    """Test that concurrent requests to one server are routed back."""
+
+    @pytest.mark.asyncio
+    async def test_responses_are_routed_by_id(self) -> None:
+        container = ReorderingContainer()
+        server = McpServer(endpoint="localhost:9000")
+
+        responses = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    server.call_tool,
+                    container,
+                    Request(id=name, method="tools/call", params={"name": name}),
+                )
+                for name in ("forecast", "alerts")
+            )
+        )
+
+        for name, response in zip(("forecast", "alerts"), responses):
+            assert response["id"] == name
+            assert response["result"]["content"][0]["text"] == name
@@ -0,0 +1,152 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for starting sandboxes from snapshots of initialized servers."""
+
+import asyncio
+from typing import Any, Optional
+
+import pytest
+
+from src.onemcp.sandbox.docker import snapshot as snapshot_module
+from src.onemcp.sandbox.docker.registry import DockerSandboxRegistry
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.docker.snapshot import Snapshot
+from src.onemcp.sandbox.mcp_server import McpServer
+
+REPOSITORY_URL = "https://github.com/example/weather-mcp"
+
+
+class FakeRegistry(DockerSandboxRegistry):
+    """Registry that records containers instead of running them."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.images: set[str] = set()
+        self.builds: list[str] = []
+        self.started: list[tuple[Optional[str], Optional[tuple[str, str]]]] = []
+        self.broken_checkpoints = False
+
+    async def _build_image(
+        self, setup_script: str, image_tag: str, revision: str = ""
+    ) -> None:
+        self.builds.append(image_tag)
+        self.images.add(image_tag)
+
+    def _check_if_docker_image_exists(self, tag: str) -> bool:
+        return tag in self.images
+
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        if checkpoint and self.broken_checkpoints:
+            raise RuntimeError("Failed to restore checkpoint")
+        self.started.append((image, checkpoint))
+        container = DockerContainer()
+        container.name = sandbox_id
+        container.image = bootstrap_metadata["container_image_tag"]
+        container.port = port
+        return container
+
+
+@pytest.fixture
+def snapshots_taken(monkeypatch: pytest.MonkeyPatch) -> list[Snapshot]:
+    taken: list[Snapshot] = []
+    removed: list[Snapshot] = []
+
+    async def take_snapshot(
+        container: DockerContainer, image_tag: str, mode: str = "fs"
+    ) -> Snapshot:
+        checkpoint_dir = "/checkpoints" if mode == "criu" else None
+        taken.append(Snapshot(f"{image_tag}-snapshot", checkpoint_dir))
+        return taken[-1]
+
+    async def remove_snapshot(snapshot: Snapshot) -> None:
+        removed.append(snapshot)
+        taken.remove(snapshot)
+
+    monkeypatch.setattr(snapshot_module, "SNAPSHOT_MODE", "fs")
+    monkeypatch.setattr(snapshot_module, "take_snapshot", take_snapshot)
+    monkeypatch.setattr(snapshot_module, "remove_snapshot", remove_snapshot)
+    monkeypatch.setattr(snapshot_module, "find_snapshot", lambda *_: None)
+    monkeypatch.setattr(McpServer, "get_tools", lambda self, _: [{"name": "forecast"}])
+    return taken
+
+
+async def start_and_list_tools(registry: FakeRegistry, **kwargs: Any) -> str:
+    response = await registry.start(
+        {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}, **kwargs
+    )
+    assert response["response_code"] == "200"
+    await registry.get_tools(response["sandbox_id"])
+    await asyncio.gather(*registry._snapshot_tasks.values())
+    return str(response["sandbox_id"])
+
+
+class TestSnapshots:
+    """Test that initialized servers are snapshotted and restored."""
+
+    @pytest.mark.asyncio
+    async def test_later_sandboxes_start_from_snapshot(
+        self, snapshots_taken: list[Snapshot]
+    ) -> None:
+        registry = FakeRegistry()
+
+        await start_and_list_tools(registry)
+        await start_and_list_tools(registry)
+
+        image_tag = registry.get_image_tag_from_repo_url(REPOSITORY_URL)
+        assert [snapshot.image for snapshot in snapshots_taken] == [
+            f"{image_tag}-snapshot"
+        ]
+        assert registry.started == [(None, None), (f"{image_tag}-snapshot", None)]
+
+    @pytest.mark.asyncio
+    async def test_rebuilding_drops_snapshot(
+        self, snapshots_taken: list[Snapshot]
+    ) -> None:
+        registry = FakeRegistry()
+
+        await start_and_list_tools(registry)
+        await start_and_list_tools(registry, revision="abc123")
+
+        assert len(registry.builds) == 2
+        assert registry.started == [(None, None), (None, None)]
+        # The sandbox of the new revision took a new snapshot.
+        assert len(snapshots_taken) == 1
+
+    @pytest.mark.asyncio
+    async def test_cached_tools_do_not_snapshot(
+        self, snapshots_taken: list[Snapshot], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        registry = FakeRegistry()
+
+        async def image_digest(image_tag: str) -> str:
+            return "sha256:weather"
+
+        monkeypatch.setattr(registry, "_image_digest", image_digest)
+        registry.tool_lists["sha256:weather"] = [{"name": "forecast"}]
+
+        await start_and_list_tools(registry)
+
+        # The server was never initialized, so it is not worth restoring.
+        assert snapshots_taken == []
+
+    @pytest.mark.asyncio
+    async def test_failed_restore_falls_back_to_files(
+        self, snapshots_taken: list[Snapshot], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(snapshot_module, "SNAPSHOT_MODE", "criu")
+        registry = FakeRegistry()
+        registry.broken_checkpoints = True
+
+        await start_and_list_tools(registry)
+        await start_and_list_tools(registry)
+
+        image_tag = registry.get_image_tag_from_repo_url(REPOSITORY_URL)
+        assert registry.started[-1] == (f"{image_tag}-snapshot", None)
@@ -0,0 +1,157 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for reattaching to sandboxes after the sandbox API restarts."""
+
+from pathlib import Path
+from typing import Any, Optional
+
+import pytest
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox.docker import registry as registry_module
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.store import SandboxRecord, SandboxStore
+from tests.test_tool_cache import REPOSITORY_URL, FakeContainer, FakeRegistry
+
+CALL = Request(id=7, method="tools/call", params={"name": "forecast"})
+
+
+class DetachableContainer(FakeContainer):
+    """Fake container that records being detached from, and never stops."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.detached = False
+
+    def detach(self) -> None:
+        self.detached = True
+
+    async def stop(self) -> None:
+        pass
+
+
+class PersistentRegistry(FakeRegistry):
+    """Fake registry whose containers outlive it, in `containers`."""
+
+    def __init__(self, store: SandboxStore, containers: dict[str, bool]) -> None:
+        super().__init__()
+        self.store = store
+        self.containers = containers
+        self.removed: list[str] = []
+
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        self.containers[sandbox_id] = True
+        container = DetachableContainer()
+        container.name = sandbox_id
+        container.image = bootstrap_metadata["container_image_tag"]
+        container.port = port
+        return container
+
+    def _attach_docker_container(self, record: SandboxRecord) -> DockerContainer:
+        return self._start_docker_container(
+            record.sandbox_id, record.bootstrap_metadata, record.port
+        )
+
+    async def _labeled_containers(self) -> dict[str, bool]:
+        return dict(self.containers)
+
+    async def _docker(self, *args: str) -> str:
+        if args[:2] == ("rm", "-f"):
+            self.removed.append(args[2])
+            self.containers.pop(args[2], None)
+        return ""
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> SandboxStore:
+    return SandboxStore(str(tmp_path / "sandboxes.sqlite3"))
+
+
+async def start(registry: FakeRegistry) -> str:
+    response = await registry.start(
+        {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}
+    )
+    assert response["response_code"] == "200"
+    return str(response["sandbox_id"])
+
+
+class TestReattach:
+    """Test that a restarted registry reattaches to its sandboxes."""
+
+    @pytest.mark.asyncio
+    async def test_sandboxes_survive_restart(self, store: SandboxStore) -> None:
+        containers: dict[str, bool] = {}
+        registry = PersistentRegistry(store, containers)
+        sandbox_id = await start(registry)
+
+        await registry.shutdown()
+        restarted = PersistentRegistry(store, containers)
+
+        assert await restarted.reattach() == 1
+        assert restarted.ports.used == registry.ports.used
+        assert restarted.images == registry.images
+        response = await restarted.call_tool(sandbox_id, CALL)
+        assert response["response"]["result"] == {"content": []}
+        container = registry.instances[sandbox_id][0]
+        assert isinstance(container, DetachableContainer)
+        assert container.detached
+
+    @pytest.mark.asyncio
+    async def test_sessions_survive_restart(
+        self, store: SandboxStore, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(registry_module, "SHARED_SANDBOXES", True)
+        containers: dict[str, bool] = {}
+        registry = PersistentRegistry(store, containers)
+        first, second = await start(registry), await start(registry)
+
+        restarted = PersistentRegistry(store, containers)
+        await restarted.reattach()
+        await restarted.stop(first)
+
+        assert restarted.sessions == {second: registry.sessions[second]}
+        assert await start(restarted) in restarted.sessions
+        assert len(restarted.instances) == 1
+
+    @pytest.mark.asyncio
+    async def test_gone_and_orphaned_containers(self, store: SandboxStore) -> None:
+        containers: dict[str, bool] = {}
+        registry = PersistentRegistry(store, containers)
+        exited, gone = await start(registry), await start(registry)
+        containers[exited] = False
+        del containers[gone]
+        containers["orphan"] = True
+
+        restarted = PersistentRegistry(store, containers)
+
+        assert await restarted.reattach() == 0
+        assert store.sandboxes() == []
+        assert sorted(restarted.removed) == sorted([exited, "orphan"])
+
+    @pytest.mark.asyncio
+    async def test_stopped_sandboxes_are_forgotten(self, store: SandboxStore) -> None:
+        registry = PersistentRegistry(store, {})
+        sandbox_id = await start(registry)
+
+        await registry.stop(sandbox_id)
+
+        assert store.sandboxes() == []
+
+
+class TestSandboxStore:
+    """Test where the sandbox store keeps its database."""
+
+    def test_creates_missing_directory(self, tmp_path: Path) -> None:
+        path = tmp_path / "state" / "onemcp" / "sandboxes.sqlite3"
+
+        SandboxStore(str(path))
+
+        assert path.is_file()
@@ -0,0 +1,124 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for streaming the progress of tool calls from sandboxes."""
+
+import json
+from typing import Any, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox import __main__ as sandbox_api
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from tests.test_tool_cache import REPOSITORY_URL, FakeContainer, FakeRegistry
+
+
+class ProgressContainer(FakeContainer):
+    """Fake container whose tool reports progress twice before answering."""
+
+    def write(self, data: str) -> None:
+        request = json.loads(data)
+        if request.get("method") == "tools/call":
+            token = request["params"]["_meta"]["progressToken"]
+            for progress in (1, 2):
+                notification = {
+                    "jsonrpc": "2.0",
+                    "method": "notifications/progress",
+                    "params": {
+                        "progressToken": token,
+                        "progress": progress,
+                        "total": 2,
+                        "message": f"step {progress}",
+                    },
+                }
+                self.lines.append(json.dumps(notification))
+        super().write(data)
+
+
+class ProgressRegistry(FakeRegistry):
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        container = ProgressContainer()
+        container.name = sandbox_id
+        container.image = bootstrap_metadata["container_image_tag"]
+        container.port = port
+        return container
+
+
+CALL = Request(id=7, method="tools/call", params={"name": "forecast", "arguments": {}})
+
+
+async def start(registry: ProgressRegistry) -> str:
+    response = await registry.start(
+        {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}
+    )
+    return str(response["sandbox_id"])
+
+
+class TestStreaming:
+    """Test that progress notifications reach the caller before the result."""
+
+    @pytest.mark.asyncio
+    async def test_progress_then_response(self) -> None:
+        registry = ProgressRegistry()
+        sandbox_id = await start(registry)
+
+        events = [e async for e in registry.call_tool_stream(sandbox_id, CALL)]
+
+        assert [e["type"] for e in events] == ["progress", "progress", "response"]
+        assert events[0] == {
+            "type": "progress",
+            "progress": 1,
+            "total": 2,
+            "message": "step 1",
+        }
+        assert events[-1]["response"]["id"] == 7
+
+    @pytest.mark.asyncio
+    async def test_unknown_sandbox(self) -> None:
+        events = [e async for e in ProgressRegistry().call_tool_stream("missing", CALL)]
+
+        assert events == [
+            {
+                "type": "response",
+                "response_code": "404",
+                "error_description": "Sandbox missing not found",
+            }
+        ]
+
+    def test_ndjson_endpoint(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        registry = ProgressRegistry()
+        monkeypatch.setattr(sandbox_api, "sandbox", registry)
+        client = TestClient(sandbox_api.app)
+        headers = {"X-OneMCP-Message-Type": "START"}
+        sandbox_id = client.post(
+            "/sandbox",
+            json={
+                "bootstrap_metadata": {
+                    "repository_url": REPOSITORY_URL,
+                    "setup_script": "# setup",
+                }
+            },
+            headers=headers,
+        ).json()["sandbox_id"]
+
+        response = client.post(
+            "/sandbox",
+            json={"sandbox_id": sandbox_id, **CALL.to_dict()},
+            headers={
+                "X-OneMCP-Message-Type": "CALL_TOOL",
+                "Accept": "application/x-ndjson",
+            },
+        )
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [e["type"] for e in events] == ["progress", "progress", "response"]
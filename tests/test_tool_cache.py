@@ -0,0 +1,150 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for caching the tools of MCP servers per container image."""
+
+import json
+from typing import Any, Optional
+
+import pytest
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox.docker.registry import DockerSandboxRegistry
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.mcp_server import McpServer
+
+REPOSITORY_URL = "https://github.com/example/weather-mcp"
+TOOLS = [{"name": "forecast"}]
+
+
+class FakeContainer(DockerContainer):
+    """Container whose MCP server answers requests from memory."""
+
+    def __init__(self, notifications: Optional[list[dict[str, Any]]] = None) -> None:
+        self.requests: list[dict[str, Any]] = []
+        self.notifications = notifications or []
+        self.lines: list[str] = []
+
+    def write(self, data: str) -> None:
+        request = json.loads(data)
+        self.requests.append(request)
+        if "id" not in request:
+            return
+        result: dict[str, Any] = {"tools": TOOLS}
+        if request["method"] == "tools/call":
+            result = {"content": []}
+        self.lines.extend(json.dumps(n) + "\n" for n in self.notifications)
+        self.lines.append(json.dumps({"id": request["id"], "result": result}) + "\n")
+
+    def read(self, timeout: int = 5) -> Any:
+        return self.lines.pop(0) if self.lines else ""
+
+    def is_running(self) -> bool:
+        return True
+
+
+class FakeRegistry(DockerSandboxRegistry):
+    """Registry whose sandboxes all run the same image."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.listed = 0
+
+    async def _build_image(
+        self, setup_script: str, image_tag: str, revision: str = ""
+    ) -> None:
+        pass
+
+    def _check_if_docker_image_exists(self, tag: str) -> bool:
+        return True
+
+    async def _image_digest(self, image_tag: str) -> Optional[str]:
+        return "sha256:weather"
+
+    def _start_docker_container(
+        self,
+        sandbox_id: str,
+        bootstrap_metadata: dict[str, Any],
+        port: int,
+        image: Optional[str] = None,
+        checkpoint: Optional[tuple[str, str]] = None,
+    ) -> DockerContainer:
+        container = FakeContainer()
+        container.name = sandbox_id
+        container.image = bootstrap_metadata["container_image_tag"]
+        container.port = port
+        return container
+
+
+@pytest.fixture
+def registry(monkeypatch: pytest.MonkeyPatch) -> FakeRegistry:
+    registry = FakeRegistry()
+    get_tools = McpServer.get_tools
+
+    def counting_get_tools(self: McpServer, container: DockerContainer) -> Any:
+        registry.listed += 1
+        return get_tools(self, container)
+
+    monkeypatch.setattr(McpServer, "get_tools", counting_get_tools)
+    return registry
+
+
+async def start(registry: FakeRegistry) -> str:
+    response = await registry.start(
+        {"repository_url": REPOSITORY_URL, "setup_script": "# setup"}
+    )
+    assert response["response_code"] == "200"
+    return str(response["sandbox_id"])
+
+
+class TestToolCache:
+    """Test that tools are listed once per image."""
+
+    @pytest.mark.asyncio
+    async def test_sandboxes_of_an_image_share_tools(
+        self, registry: FakeRegistry
+    ) -> None:
+        first = await registry.get_tools(await start(registry))
+        second = await registry.get_tools(await start(registry))
+
+        assert first == second == {"tools": TOOLS}
+        assert registry.listed == 1
+
+    @pytest.mark.asyncio
+    async def test_list_changed_refreshes_tools(self, registry: FakeRegistry) -> None:
+        sandbox_id = await start(registry)
+        await registry.get_tools(sandbox_id)
+        container, instance = registry.instances[sandbox_id]
+        assert isinstance(container, FakeContainer)
+        container.notifications = [
+            {"jsonrpc": "2.0", "method": "notifications/tools/list_changed"}
+        ]
+
+        await registry.call_tool(
+            sandbox_id, Request(method="tools/call", params={"name": "forecast"})
+        )
+        assert instance.tools_list_changed
+
+        container.notifications = []
+        await registry.get_tools(sandbox_id)
+        assert registry.listed == 2
+        assert not instance.tools_list_changed
+
+
+class TestSession:
+    """Test that the session with a server is initialized once."""
+
+    def test_initialize_once(self) -> None:
+        container = FakeContainer()
+        server = McpServer(endpoint="localhost:9000")
+
+        server.get_tools(container)
+        server.call_tool(container, Request(method="tools/call"))
+
+        methods = [request["method"] for request in container.requests]
+        assert methods == [
+            "initialize",
+            "notifications/initialized",
+            "tools/list",
+            "tools/call",
+        ]
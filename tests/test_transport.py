@@ -0,0 +1,125 @@
+# Copyright(c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Tests for the transports to MCP servers."""
+
+import json
+from typing import Any
+
+import pytest
+import requests_mock
+
+from src.onemcp.messages import Request
+from src.onemcp.sandbox.docker.sandbox import DockerContainer
+from src.onemcp.sandbox.mcp_server import McpServer
+from src.onemcp.sandbox.transport import with_id
+from tests.test_tool_cache import FakeContainer
+
+MCP_URL = "http://localhost:9000/mcp"
+TOOLS = [{"name": "forecast"}]
+
+
+def sse(*messages: dict[str, Any]) -> str:
+    return "".join(f"event: message\ndata: {json.dumps(m)}\n\n" for m in messages)
+
+
+def respond(request: Any, context: Any) -> str:
+    message = request.json()
+    if "id" not in message:
+        context.status_code = 202
+        return ""
+    if message["method"] == "initialize":
+        context.headers["Mcp-Session-Id"] = "session-1"
+        context.headers["Content-Type"] = "application/json"
+        return json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+
+    assert request.headers["Mcp-Session-Id"] == "session-1"
+    context.headers["Content-Type"] = "text/event-stream"
+    return sse(
+        {"jsonrpc": "2.0", "method": "notifications/tools/list_changed"},
+        {"jsonrpc": "2.0", "id": message["id"], "result": {"tools": TOOLS}},
+    )
+
+
+@pytest.fixture
+def server(requests_mock: requests_mock.Mocker) -> McpServer:
+    requests_mock.post(MCP_URL, text=respond)
+    return McpServer(endpoint="localhost:9000", transport="streamable-http")
+
+
+class TestHttpTransport:
+    """Test speaking streamable HTTP to an MCP server."""
+
+    def test_session_over_json_and_events(
+        self, server: McpServer, requests_mock: requests_mock.Mocker
+    ) -> None:
+        tools = server.get_tools(DockerContainer())
+
+        assert tools == TOOLS
+        assert server.tools_list_changed
+        methods = [r.json()["method"] for r in requests_mock.request_history]
+        assert methods == ["initialize", "notifications/initialized", "tools/list"]
+
+    def test_caller_id_is_restored(self, server: McpServer) -> None:
+        response = server.call_tool(
+            DockerContainer(),
+            Request(id="call-7", method="tools/call"),
+        )
+
+        assert response["id"] == "call-7"
+
+
+class SdkContainer(FakeContainer):
+    """Fake container answering tool calls the way the MCP SDKs serialize them."""
+
+    IMAGE = {"type": "image", "data": "iVBORw0KGgo" * 1000, "mimeType": "image/png"}
+
+    def write(self, data: str) -> None:
+        request = json.loads(data)
+        if request.get("method") != "tools/call":
+            super().write(data)
+            return
+        self.requests.append(request)
+        result = json.dumps({"content": [self.IMAGE]}, separators=(",", ":"))
+        self.lines.append(
+            f'{{"jsonrpc":"2.0","id":{request["id"]},"result":{result}}}\n'
+        )
+
+
+class TestRawResponses:
+    """Test forwarding tool responses without decoding them."""
+
+    def test_with_id(self) -> None:
+        raw = b'{"jsonrpc":"2.0","id":3,"result":{"content":[]}}'
+
+        assert with_id(raw, "call-7") == (
+            b'{"jsonrpc":"2.0","id":"call-7","result":{"content":[]}}'
+        )
+        assert json.loads(with_id(b'{"id":3,"error":{"code":1}}', 7)) == {
+            "id": 7,
+            "error": {"code": 1},
+        }
+
+    def test_stdio_result_is_forwarded(self) -> None:
+        container = SdkContainer()
+        server = McpServer(endpoint="localhost:9000")
+
+        raw = server.call_tool_raw(container, Request(id=42, method="tools/call"))
+
+        assert raw.startswith(b'{"jsonrpc":"2.0","id":42,"result":')
+        assert json.loads(raw)["result"]["content"] == [SdkContainer.IMAGE]
+
+    def test_error_is_raised(self) -> None:
+        class ErrorContainer(FakeContainer):
+            def write(self, data: str) -> None:
+                request = json.loads(data)
+                if request.get("method") != "tools/call":
+                    super().write(data)
+                    return
+                error = {"id": request["id"], "error": {"code": -32602}}
+                self.lines.append(json.dumps(error))
+
+        server = McpServer(endpoint="localhost:9000")
+
+        with pytest.raises(RuntimeError, match="Tool execution error"):
+            server.call_tool_raw(ErrorContainer(), Request(id=1, method="tools/call"))